@@ -0,0 +1,116 @@
+'''
+Measures how fast and how well CommunityDetector recovers the communities
+of planted-partition graphs as the number of players, communities and
+iterations vary.
+
+python -m benchmarks.accuracy --players 500 2000 --communities 5 20 --iterations 10 50 100
+
+Every (players, communities) graph gets one run of the largest number of
+iterations; for each number of iterations the wall time to get there and
+the adjusted Rand index against the planted labels of the partition picked
+from the second half of the draws so far are recorded.  The results are
+written as JSON.
+'''
+from __future__ import division, print_function
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import numpy.random as npr
+
+from benchmarks.report import benchmark_settings, write_report
+from benchmarks.synthetic import planted_graph
+from chess_social.bayes_community_detection import CommunityDetector
+from chess_social.partitions import adjusted_rand_index, normalized_mutual_information
+
+
+def community_sizes(number_of_players, communities):
+    '''communities sizes as equal as possible adding up to number_of_players'''
+    sizes = np.zeros(communities, dtype=np.int64) + number_of_players // communities
+    sizes[:number_of_players % communities] += 1
+    return sizes
+
+
+def evaluate(graph, labels, iteration_counts, seed=0, **detector_args):
+    '''
+    Runs a CommunityDetector for max(iteration_counts) iterations and
+    scores the partition picked at each count; returns a list of dicts
+    '''
+    npr.seed(seed)
+    finished = {}
+    def record(metrics):
+        finished[metrics.iteration] = metrics.time
+
+    start = time.time()
+    samples = CommunityDetector(**detector_args).run(graph, iterations=max(iteration_counts),
+                                                     callbacks=[record])
+
+    results = []
+    for iterations in sorted(iteration_counts):
+        estimate_start = time.time()
+        _, partition = CommunityDetector.estimate_partitions(samples[:iterations + 1],
+                                                             burnin=iterations // 2)
+        results.append({'iterations': iterations,
+                        'seconds': finished[iterations] - start,
+                        'estimate_seconds': time.time() - estimate_start,
+                        'ari': adjusted_rand_index(labels, partition),
+                        'nmi': normalized_mutual_information(labels, partition),
+                        'last_sample_ari': adjusted_rand_index(labels, samples[iterations]),
+                        'communities_found': len(np.unique(partition))})
+    return results
+
+
+def main(player_counts, community_counts, iteration_counts, p_in, p_out, seed, output):
+    settings = benchmark_settings(p_in=p_in, p_out=p_out, seed=seed)
+
+    results = []
+    for number_of_players in player_counts:
+        for communities in community_counts:
+            graph, labels = planted_graph(community_sizes(number_of_players, communities),
+                                          p_in, p_out, seed=seed)
+            for result in evaluate(graph, labels, iteration_counts, seed=seed):
+                result.update({'players': number_of_players,
+                               'communities': communities,
+                               'edges': graph.number_of_edges})
+                print('{0} players, {1} communities, {2} iterations: {3:.2f}s; ARI {4:.3f}'.format(
+                    number_of_players, communities, result['iterations'], result['seconds'],
+                    result['ari']))
+                results.append(result)
+
+    write_report(settings, results, output)
+
+    return 0
+
+
+if __name__ == '__main__':
+    cmdline_parser = argparse.ArgumentParser()
+    cmdline_parser.add_argument('--players', action='store', type=int, nargs='+',
+                                default=[200, 1000])
+    cmdline_parser.add_argument('--communities', action='store', type=int, nargs='+',
+                                default=[4, 10])
+    cmdline_parser.add_argument('--iterations', action='store', type=int, nargs='+',
+                                default=[10, 50, 100])
+    cmdline_parser.add_argument('--p_in', action='store', type=float, default=0.3)
+    cmdline_parser.add_argument('--p_out', action='store', type=float, default=0.01)
+    cmdline_parser.add_argument('--seed', action='store', type=int, default=0)
+    cmdline_parser.add_argument('--output', action='store', default=None)
+
+    parsed_args = cmdline_parser.parse_args()
+
+    if min(parsed_args.iterations) < 1:
+        print('Invalid number of iterations: {0}'.format(min(parsed_args.iterations)))
+        sys.exit(1)
+
+    if parsed_args.p_out >= parsed_args.p_in:
+        print('Invalid edge probabilities: {0}, {1}'.format(parsed_args.p_in, parsed_args.p_out))
+        sys.exit(1)
+
+    sys.exit(main(parsed_args.players,
+                  parsed_args.communities,
+                  parsed_args.iterations,
+                  parsed_args.p_in,
+                  parsed_args.p_out,
+                  parsed_args.seed,
+                  parsed_args.output))
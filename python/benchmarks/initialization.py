@@ -0,0 +1,146 @@
+'''
+Compares how quickly CommunityDetector converges from the starting
+partitions of the chess_social.initialization initializers.
+
+python -m benchmarks.initialization --players 5000 --communities 50 --init singletons spectral
+python -m benchmarks.initialization --graph twic.npz --min_elo 2500 --iterations 100
+
+Every initializer gets one chain from the same seed on the same graph,
+either a planted-partition graph or a saved graph or pgn file.  The number
+of communities of the last quarter of every chain is pooled, and a chain
+has converged at the first iteration whose number of communities is
+between the 5th and 95th percentiles of the pool; the time to converge
+includes the time taken by the initializer.  On planted graphs the
+adjusted Rand index against the planted communities is recorded at every
+iteration too.  The results are written as JSON.
+'''
+from __future__ import division, print_function
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import numpy.random as npr
+
+from benchmarks.accuracy import community_sizes
+from benchmarks.report import benchmark_settings, load_graph, write_report
+from benchmarks.synthetic import planted_graph
+from chess_social.bayes_community_detection import CommunityDetector
+from chess_social.initialization import INITIALIZERS, initial_labels
+from chess_social.partitions import adjusted_rand_index
+
+
+def evaluate(graph, labels, init, iterations, seed=0, **detector_args):
+    '''
+    Times the init initializer and a CommunityDetector run from its
+    starting partition; returns a dict
+    '''
+    npr.seed(seed)
+    start = time.time()
+    start_labels = initial_labels(graph, init)
+    init_seconds = time.time() - start
+
+    collected = []
+    detector = CommunityDetector(**detector_args)
+    samples = detector.run(graph, start_labels=start_labels, iterations=iterations,
+                           callbacks=[collected.append])
+
+    seconds = [metrics.seconds for metrics in collected]
+    result = {'init': init,
+              'iterations': iterations,
+              'init_seconds': init_seconds,
+              'initial_communities': int(detector.number_of_communities[0]),
+              'first_sweep_seconds': collected[0].phase_seconds['sweep'],
+              'seconds': init_seconds + sum(seconds),
+              'iteration_seconds': seconds,
+              'number_of_communities': detector.number_of_communities.tolist()}
+    if labels is not None:
+        result['ari'] = [adjusted_rand_index(labels, sample) for sample in samples]
+    return result
+
+
+def add_convergence(results):
+    '''
+    Sets the iteration and time at which every result's number of
+    communities first reaches the band of the pooled last quarters
+    '''
+    tails = np.concatenate([result['number_of_communities'][-(result['iterations'] // 4 or 1):]
+                            for result in results])
+    low, high = np.percentile(tails, [5, 95])
+    for result in results:
+        result['converged_band'] = [float(low), float(high)]
+        communities = np.array(result['number_of_communities'])
+        inside = np.flatnonzero((communities >= low) & (communities <= high))
+        if len(inside):
+            iteration = int(inside[0])
+            result['converged_iteration'] = iteration
+            result['seconds_to_converge'] = (result['init_seconds'] +
+                                             sum(result['iteration_seconds'][:iteration]))
+        else:
+            result['converged_iteration'] = None
+            result['seconds_to_converge'] = None
+
+
+def main(graph_file_name, min_elo, number_of_players, communities, p_in, p_out, iterations,
+         inits, seed, output):
+    settings = benchmark_settings(iterations=iterations, seed=seed)
+
+    if graph_file_name:
+        graph = load_graph(graph_file_name, min_elo)
+        labels = None
+        settings.update({'graph': graph_file_name, 'min_elo': min_elo})
+    else:
+        graph, labels = planted_graph(community_sizes(number_of_players, communities),
+                                      p_in, p_out, seed=seed)
+        settings.update({'players': number_of_players, 'communities': communities,
+                         'p_in': p_in, 'p_out': p_out})
+    settings.update({'graph_nodes': graph.number_of_nodes,
+                     'graph_edges': graph.number_of_edges})
+
+    results = [evaluate(graph, labels, init, iterations, seed=seed) for init in inits]
+    add_convergence(results)
+    for result in results:
+        converged = 'did not converge'
+        if result['converged_iteration'] is not None:
+            converged = 'converged after {0} iterations in {1:.2f}s'.format(
+                result['converged_iteration'], result['seconds_to_converge'])
+        print('{0}: {1} starting communities in {2:.2f}s; first sweep {3:.2f}s; {4}'.format(
+            result['init'], result['initial_communities'], result['init_seconds'],
+            result['first_sweep_seconds'], converged))
+
+    write_report(settings, results, output)
+
+    return 0
+
+
+if __name__ == '__main__':
+    cmdline_parser = argparse.ArgumentParser()
+    cmdline_parser.add_argument('--graph', action='store', default=None)
+    cmdline_parser.add_argument('--min_elo', action='store', type=int, default=2500)
+    cmdline_parser.add_argument('--players', action='store', type=int, default=2000)
+    cmdline_parser.add_argument('--communities', action='store', type=int, default=20)
+    cmdline_parser.add_argument('--p_in', action='store', type=float, default=0.3)
+    cmdline_parser.add_argument('--p_out', action='store', type=float, default=0.005)
+    cmdline_parser.add_argument('--iterations', action='store', type=int, default=60)
+    cmdline_parser.add_argument('--init', action='store', nargs='+',
+                                choices=sorted(INITIALIZERS), default=sorted(INITIALIZERS))
+    cmdline_parser.add_argument('--seed', action='store', type=int, default=0)
+    cmdline_parser.add_argument('--output', action='store', default=None)
+
+    parsed_args = cmdline_parser.parse_args()
+
+    if parsed_args.iterations < 4:
+        print('Invalid number of iterations: {0}'.format(parsed_args.iterations))
+        sys.exit(1)
+
+    sys.exit(main(parsed_args.graph,
+                  parsed_args.min_elo,
+                  parsed_args.players,
+                  parsed_args.communities,
+                  parsed_args.p_in,
+                  parsed_args.p_out,
+                  parsed_args.iterations,
+                  parsed_args.init,
+                  parsed_args.seed,
+                  parsed_args.output))
@@ -0,0 +1,134 @@
+'''
+Compares how well CommunityDetector mixes with different numbers of
+split-merge moves per iteration.
+
+python -m benchmarks.mixing --players 2000 --communities 20 --split_merge 0 2 10
+python -m benchmarks.mixing --graph twic.npz --min_elo 2500 --split_merge 0 5
+
+Every setting gets one chain from the same seed on the same graph, either a
+planted-partition graph or a saved graph or pgn file.  The effective sample
+size of the number of communities and of p_in after burn-in is divided by
+the wall time after burn-in to give effective samples per second; on
+planted graphs the adjusted Rand index of the picked partition is recorded
+too.  The results are written as JSON.
+'''
+from __future__ import division, print_function
+
+import argparse
+import sys
+
+import numpy as np
+import numpy.random as npr
+
+from benchmarks.accuracy import community_sizes
+from benchmarks.report import benchmark_settings, load_graph, write_report
+from benchmarks.synthetic import planted_graph
+from chess_social.bayes_community_detection import CommunityDetector
+from chess_social.partitions import adjusted_rand_index
+from stats.diagnostics import effective_sample_size
+
+
+def evaluate(graph, labels, iterations, burnin, split_merge, seed=0, **detector_args):
+    '''
+    Runs a CommunityDetector with split_merge moves per iteration and
+    measures its mixing after burnin iterations; returns a dict
+    '''
+    npr.seed(seed)
+    collected = []
+    detector = CommunityDetector(split_merge=split_merge, **detector_args)
+    samples = detector.run(graph, iterations=iterations, callbacks=[collected.append])
+
+    after = collected[burnin:]
+    seconds = sum(metrics.seconds for metrics in after)
+    result = {'split_merge': split_merge,
+              'iterations': iterations,
+              'burnin': burnin,
+              'seconds': sum(metrics.seconds for metrics in collected),
+              'seconds_after_burnin': seconds,
+              'split_merge_seconds': sum(metrics.phase_seconds['split_merge']
+                                         for metrics in collected),
+              'split_merge_accepted': sum(metrics.split_merge_accepted for metrics in collected),
+              'mean_communities': float(np.mean(detector.number_of_communities[burnin + 1:]))}
+
+    for name, draws in (('communities', detector.number_of_communities[burnin + 1:]),
+                        ('p_in', detector.p_in[burnin + 1:])):
+        ess = effective_sample_size(draws)
+        result[name + '_ess'] = ess
+        result[name + '_ess_per_second'] = ess / seconds
+
+    if labels is not None:
+        _, partition = CommunityDetector.estimate_partitions(samples, burnin=burnin)
+        result['ari'] = adjusted_rand_index(labels, partition)
+    return result
+
+
+def main(graph_file_name, min_elo, number_of_players, communities, p_in, p_out, iterations,
+         burnin, split_merge_counts, seed, output):
+    settings = benchmark_settings(iterations=iterations, burnin=burnin, seed=seed)
+
+    if graph_file_name:
+        graph = load_graph(graph_file_name, min_elo)
+        labels = None
+        settings.update({'graph': graph_file_name, 'min_elo': min_elo})
+    else:
+        graph, labels = planted_graph(community_sizes(number_of_players, communities),
+                                      p_in, p_out, seed=seed)
+        settings.update({'players': number_of_players, 'communities': communities,
+                         'p_in': p_in, 'p_out': p_out})
+    settings.update({'graph_nodes': graph.number_of_nodes,
+                     'graph_edges': graph.number_of_edges})
+
+    results = []
+    for split_merge in split_merge_counts:
+        result = evaluate(graph, labels, iterations, burnin, split_merge, seed=seed)
+        print('{0} split-merge moves: {1:.2f}s; {2:.3g} effective samples/s of the number of '
+              'communities; {3:.3g} of p_in'.format(
+                  split_merge, result['seconds'], result['communities_ess_per_second'],
+                  result['p_in_ess_per_second']))
+        results.append(result)
+
+    write_report(settings, results, output)
+
+    return 0
+
+
+if __name__ == '__main__':
+    cmdline_parser = argparse.ArgumentParser()
+    cmdline_parser.add_argument('--graph', action='store', default=None)
+    cmdline_parser.add_argument('--min_elo', action='store', type=int, default=2500)
+    cmdline_parser.add_argument('--players', action='store', type=int, default=1000)
+    cmdline_parser.add_argument('--communities', action='store', type=int, default=10)
+    cmdline_parser.add_argument('--p_in', action='store', type=float, default=0.3)
+    cmdline_parser.add_argument('--p_out', action='store', type=float, default=0.01)
+    cmdline_parser.add_argument('--iterations', action='store', type=int, default=200)
+    cmdline_parser.add_argument('--burnin', action='store', type=int, default=None)
+    cmdline_parser.add_argument('--split_merge', action='store', type=int, nargs='+',
+                                default=[0, 5])
+    cmdline_parser.add_argument('--seed', action='store', type=int, default=0)
+    cmdline_parser.add_argument('--output', action='store', default=None)
+
+    parsed_args = cmdline_parser.parse_args()
+
+    burnin = parsed_args.burnin
+    if burnin is None:
+        burnin = parsed_args.iterations // 2
+
+    if burnin < 0 or parsed_args.iterations - burnin < 4:
+        print('Invalid burn-in: {0} of {1} iterations'.format(burnin, parsed_args.iterations))
+        sys.exit(1)
+
+    if min(parsed_args.split_merge) < 0:
+        print('Invalid number of split-merge moves: {0}'.format(min(parsed_args.split_merge)))
+        sys.exit(1)
+
+    sys.exit(main(parsed_args.graph,
+                  parsed_args.min_elo,
+                  parsed_args.players,
+                  parsed_args.communities,
+                  parsed_args.p_in,
+                  parsed_args.p_out,
+                  parsed_args.iterations,
+                  burnin,
+                  parsed_args.split_merge,
+                  parsed_args.seed,
+                  parsed_args.output))
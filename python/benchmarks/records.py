@@ -0,0 +1,89 @@
+'''
+Times building and looking up the ChessPlayer and ChessGame records of a
+large random graph.
+
+python -m benchmarks.records --players 100000 --edges 1000000
+'''
+from __future__ import division, print_function
+
+import argparse
+import resource
+import sys
+import time
+
+import numpy as np
+import numpy.random as npr
+
+from chess_social.graph import ChessGame, ChessGraph
+
+
+def random_graph(number_of_players, number_of_edges, seed=0):
+    '''A graph with number_of_edges distinct edges between uniformly random players'''
+    npr.seed(seed)
+    keys = np.zeros(0, dtype=np.int64)
+    while len(keys) < number_of_edges:
+        one = npr.randint(0, number_of_players, size=number_of_edges)
+        two = npr.randint(0, number_of_players, size=number_of_edges)
+        one, two = np.minimum(one, two), np.maximum(one, two)
+        new_keys = one[one != two].astype(np.int64) * number_of_players + two[one != two]
+        keys = np.union1d(keys, new_keys)
+    keys = npr.permutation(keys)[:number_of_edges]
+    fide_ids = [str(1000000 + i) for i in xrange(number_of_players)]
+    return ChessGraph.from_arrays(fide_ids,
+                                  ['player {0}'.format(i) for i in xrange(number_of_players)],
+                                  npr.choice(['GM', 'IM', 'FM', 'None'], size=number_of_players),
+                                  npr.randint(2000, 2800, size=number_of_players),
+                                  keys // number_of_players,
+                                  keys % number_of_players,
+                                  npr.randint(1, 10, size=number_of_edges))
+
+
+def object_size(record):
+    size = sys.getsizeof(record)
+    if hasattr(record, '__dict__'):
+        size += sys.getsizeof(record.__dict__)
+    return size
+
+
+def timed(label, function):
+    start = time.time()
+    result = function()
+    print('{0}: {1:.2f}s'.format(label, time.time() - start))
+    return result
+
+
+def main(number_of_players, number_of_edges, seed):
+    graph = random_graph(number_of_players, number_of_edges, seed)
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    players = timed('Create {0} players'.format(graph.number_of_nodes), lambda: graph.nodes)
+    adjacency = timed('Create {0} games'.format(graph.number_of_edges),
+                      lambda: graph.adjacency_matrix)
+    print('Peak memory growth: {0:.0f}MB'.format(
+        (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024))
+    print('Bytes per player: {0}; bytes per game: {1}'.format(object_size(players[0]),
+                                                              object_size(next(iter(adjacency)))))
+
+    fide_ids = graph.fide_ids
+    edge_one, edge_two, _ = graph.edges
+    queries = [ChessGame(fide_ids[one], fide_ids[two])
+               for one, two in zip(edge_one.tolist(), edge_two.tolist())]
+    games = timed('Look up {0} games'.format(len(queries)),
+                  lambda: sum(adjacency[query] for query in queries))
+    player_set = timed('Hash {0} players'.format(len(players)), lambda: set(players))
+    timed('Look up {0} players'.format(len(players)),
+          lambda: sum(player in player_set for player in players))
+    assert games == int(graph.weights.sum()) // 2
+
+    return 0
+
+
+if __name__ == '__main__':
+    cmdline_parser = argparse.ArgumentParser()
+    cmdline_parser.add_argument('--players', action='store', type=int, default=100000)
+    cmdline_parser.add_argument('--edges', action='store', type=int, default=1000000)
+    cmdline_parser.add_argument('--seed', action='store', type=int, default=0)
+
+    parsed_args = cmdline_parser.parse_args()
+
+    sys.exit(main(parsed_args.players, parsed_args.edges, parsed_args.seed))
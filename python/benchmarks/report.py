@@ -0,0 +1,40 @@
+'''
+Pieces shared by the benchmarks: the settings every report records, writing
+the JSON report, and loading a real graph to benchmark on.
+'''
+from __future__ import print_function
+
+import json
+import platform
+import time
+
+import numpy as np
+
+import run_community_detection
+
+__all__ = ['benchmark_settings', 'write_report', 'load_graph']
+
+
+def benchmark_settings(**settings):
+    '''The given settings plus the versions, machine and time of the run'''
+    settings.update({'python': platform.python_version(),
+                     'numpy': np.__version__,
+                     'machine': platform.machine(),
+                     'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')})
+    return settings
+
+
+def write_report(settings, results, output=None):
+    '''Writes the settings and results as JSON to output, or prints them'''
+    report = json.dumps({'settings': settings, 'results': results}, indent=2, sort_keys=True,
+                        separators=(',', ': '))
+    if output:
+        with open(output, 'w') as output_file:
+            output_file.write(report)
+    else:
+        print(report)
+
+
+def load_graph(filename, min_elo):
+    '''A saved graph or a pgn file, loaded as run_community_detection.py does'''
+    return run_community_detection.load_graph(filename, min_elo, 1)
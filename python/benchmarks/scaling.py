@@ -0,0 +1,152 @@
+'''
+Measures how parsing, graph building and community detection scale with
+the number of players, on synthetic pgn files with planted communities.
+
+python -m benchmarks.scaling --players 1000 10000 100000 --output scaling.json
+
+Each size runs in a fresh process so peak memory is measured per size.
+The results are written as JSON: the benchmark settings plus one record
+per size.
+'''
+from __future__ import division, print_function
+
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.report import benchmark_settings, write_report
+from benchmarks.synthetic import write_synthetic_pgn
+from chess_social.bayes_community_detection import CommunityDetector
+from chess_social.graph import ChessGraph
+from chess_social.pgn_file import PgnFile
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _parse_rate(filename, fast):
+    start = time.time()
+    with PgnFile(filename, fast=fast) as pgnfile:
+        games = sum(1 for game in pgnfile if game)
+    return games, games / (time.time() - start)
+
+
+def _graph_bytes(graph):
+    arrays = (graph.elo, graph.elo_sum, graph.elo_count, graph.elo_min, graph.elo_max,
+              graph.elo_last, graph.title_codes, graph.indptr, graph.indices, graph.weights,
+              graph.game_hashes) + graph.edges
+    return sum(array.nbytes for array in arrays)
+
+
+def benchmark_size(number_of_players, games_per_player, moves, communities, p_in_community,
+                   iterations, seed, work_dir):
+    '''Times every stage of the pipeline on one synthetic pgn file; returns a dict of results'''
+    filename = os.path.join(work_dir, 'synthetic_{0}.pgn'.format(number_of_players))
+    start = time.time()
+    write_synthetic_pgn(filename, number_of_players, games_per_player, moves=moves,
+                        communities=communities, p_in_community=p_in_community, seed=seed)
+    result = {'players': number_of_players,
+              'generate_seconds': time.time() - start,
+              'pgn_bytes': os.path.getsize(filename)}
+
+    result['games'], result['parse_games_per_second'] = _parse_rate(filename, fast=False)
+    _, result['fast_parse_games_per_second'] = _parse_rate(filename, fast=True)
+
+    #keep the progress output of the graph and the sampler out of the results
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        rss = _peak_rss_mb()
+        start = time.time()
+        with PgnFile(filename, fast=True) as pgnfile:
+            graph = ChessGraph(pgnfile)
+        result['build_seconds'] = time.time() - start
+        result['build_peak_rss_growth_mb'] = _peak_rss_mb() - rss
+        result['graph_nodes'] = graph.number_of_nodes
+        result['graph_edges'] = graph.number_of_edges
+        result['graph_array_bytes'] = _graph_bytes(graph)
+
+        start = time.time()
+        CommunityDetector().run(graph, iterations=iterations)
+        result['sampler_seconds_per_iteration'] = (time.time() - start) / iterations
+        result['peak_rss_mb'] = _peak_rss_mb()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    os.remove(filename)
+    return result
+
+
+def _benchmark_size(args):
+    return benchmark_size(*args)
+
+
+def main(player_counts, games_per_player, moves, communities, p_in_community, iterations, seed,
+         output, work_dir):
+    settings = benchmark_settings(games_per_player=games_per_player,
+                                  moves=moves,
+                                  communities=communities,
+                                  p_in_community=p_in_community,
+                                  iterations=iterations,
+                                  seed=seed)
+
+    tmp_dir = tempfile.mkdtemp(dir=work_dir)
+    results = []
+    try:
+        for number_of_players in player_counts:
+            pool = multiprocessing.Pool(processes=1)
+            try:
+                result = pool.apply(_benchmark_size, ((number_of_players, games_per_player, moves,
+                                                       communities, p_in_community, iterations,
+                                                       seed, tmp_dir),))
+            finally:
+                pool.close()
+                pool.join()
+            print('{0} players: {1:.0f} games/s parsed; graph built in {2:.2f}s; '
+                  '{3:.3f}s per sampler iteration'.format(
+                      number_of_players, result['fast_parse_games_per_second'],
+                      result['build_seconds'], result['sampler_seconds_per_iteration']))
+            results.append(result)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    write_report(settings, results, output)
+
+    return 0
+
+
+if __name__ == '__main__':
+    cmdline_parser = argparse.ArgumentParser()
+    cmdline_parser.add_argument('--players', action='store', type=int, nargs='+',
+                                default=[1000, 10000])
+    cmdline_parser.add_argument('--games_per_player', action='store', type=int, default=20)
+    cmdline_parser.add_argument('--moves', action='store', type=int, default=40)
+    cmdline_parser.add_argument('--communities', action='store', type=int, default=10)
+    cmdline_parser.add_argument('--p_in_community', action='store', type=float, default=0.9)
+    cmdline_parser.add_argument('--iterations', action='store', type=int, default=5)
+    cmdline_parser.add_argument('--seed', action='store', type=int, default=0)
+    cmdline_parser.add_argument('--output', action='store', default=None)
+    cmdline_parser.add_argument('--work_dir', action='store', default=None)
+
+    parsed_args = cmdline_parser.parse_args()
+
+    if parsed_args.iterations < 1:
+        print('Invalid number of iterations: {0}'.format(parsed_args.iterations))
+        sys.exit(1)
+
+    sys.exit(main(parsed_args.players,
+                  parsed_args.games_per_player,
+                  parsed_args.moves,
+                  parsed_args.communities,
+                  parsed_args.p_in_community,
+                  parsed_args.iterations,
+                  parsed_args.seed,
+                  parsed_args.output,
+                  parsed_args.work_dir))
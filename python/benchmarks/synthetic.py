@@ -0,0 +1,191 @@
+'''
+Deterministic synthetic pgn files and graphs with a planted community
+structure.
+'''
+from __future__ import division
+
+import numpy as np
+
+from chess_social.graph import ChessGraph
+
+__all__ = ['planted_games', 'write_synthetic_pgn', 'planted_graph']
+
+GAME_TEMPLATE = '''[Event "Synthetic {community}"]
+[Site "Nowhere"]
+[Date "2014.01.01"]
+[Round "{round}"]
+[White "{white_name}"]
+[Black "{black_name}"]
+[Result "1/2-1/2"]
+[WhiteTitle "{white_title}"]
+[BlackTitle "{black_title}"]
+[WhiteElo "{white_elo}"]
+[BlackElo "{black_elo}"]
+[WhiteFideId "{white_id}"]
+[BlackFideId "{black_id}"]
+
+{movetext}
+
+'''
+
+TITLES = ('GM', 'IM', 'FM', 'None')
+MOVES = ('e4', 'e5', 'Nf3', 'Nc6', 'Bb5', 'a6', 'Ba4', 'Nf6', 'O-O', 'Be7', 'Re1', 'b5',
+         'Bb3', 'd6', 'c3', 'O-O', 'h3', 'Nb8', 'd4', 'Nbd7', 'c4', 'c6', 'cxb5', 'axb5')
+#same number of digits for every player, so FIDE id order is player order
+FIRST_FIDE_ID = 10000000
+
+
+def planted_games(number_of_players, games_per_player, communities=1, p_in_community=0.9,
+                  seed=0):
+    '''
+    Draws the pairings of number_of_players * games_per_player / 2 games.
+    Player i belongs to community i % communities; white is picked
+    uniformly and black is a random member of white's community with
+    probability p_in_community, or any other player otherwise.  Returns
+    (white, black, labels) arrays of player indices and true communities.
+    '''
+    if not 1 <= communities <= number_of_players // 2:
+        raise ValueError('Need at least two players per community')
+    random_state = np.random.RandomState(seed)
+    labels = np.arange(number_of_players) % communities
+    number_of_games = number_of_players * games_per_player // 2
+    white = random_state.randint(0, number_of_players, size=number_of_games)
+
+    #members of community c are c, c + communities, c + 2 * communities, ...
+    sizes = np.bincount(labels, minlength=communities)
+    rank = random_state.randint(0, np.iinfo(np.int32).max, size=number_of_games)
+    same = labels[white] + (rank % sizes[labels[white]]) * communities
+    other = random_state.randint(0, number_of_players, size=number_of_games)
+    black = np.where(random_state.rand(number_of_games) < p_in_community, same, other)
+
+    #nobody plays themselves
+    clash = black == white
+    black[clash] = (white[clash] + 1 + random_state.randint(0, number_of_players - 1,
+                                                            size=clash.sum())) % number_of_players
+    return white, black, labels
+
+
+def write_synthetic_pgn(filename, number_of_players, games_per_player, moves=40, communities=1,
+                        p_in_community=0.9, seed=0):
+    '''
+    Writes the games from planted_games as a pgn file laid out like a TWIC
+    issue, with moves full moves of movetext per game wrapped at 80
+    columns.  The same arguments always give the same file.  Returns the
+    true community of each player, in FIDE id order.
+    '''
+    white, black, labels = planted_games(number_of_players, games_per_player, communities,
+                                         p_in_community, seed)
+    random_state = np.random.RandomState(seed + 1)
+    elo = random_state.randint(2000, 2800, size=number_of_players)
+    titles = random_state.randint(0, len(TITLES), size=number_of_players)
+    jitter = random_state.randint(-20, 21, size=(len(white), 2))
+    movetexts = [_movetext(random_state, moves) for _ in xrange(16)]
+
+    with open(filename, 'w') as pgn_file:
+        for game, (one, two) in enumerate(zip(white.tolist(), black.tolist())):
+            pgn_file.write(GAME_TEMPLATE.format(community=labels[one],
+                                                round=game,
+                                                white_name='Player {0}'.format(one),
+                                                black_name='Player {0}'.format(two),
+                                                white_title=TITLES[titles[one]],
+                                                black_title=TITLES[titles[two]],
+                                                white_elo=elo[one] + jitter[game, 0],
+                                                black_elo=elo[two] + jitter[game, 1],
+                                                white_id=FIRST_FIDE_ID + one,
+                                                black_id=FIRST_FIDE_ID + two,
+                                                movetext=movetexts[game % len(movetexts)]))
+    return labels
+
+
+def _movetext(random_state, moves):
+    tokens = []
+    for move in xrange(1, moves + 1):
+        tokens.append('{0}.'.format(move))
+        tokens.extend(MOVES[i] for i in random_state.randint(0, len(MOVES), size=2))
+    tokens.append('1/2-1/2')
+
+    lines = []
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 80:
+            lines.append(line)
+            line = token
+        else:
+            line = '{0} {1}'.format(line, token) if line else token
+    lines.append(line)
+    return '\n'.join(lines)
+
+
+def _pair_keys(one, two, number_of_nodes):
+    one, two = np.minimum(one, two), np.maximum(one, two)
+    return one.astype(np.int64) * number_of_nodes + two
+
+
+def _sample_pairs(random_state, count, candidates, draw, number_of_nodes):
+    '''
+    count distinct pairs, as keys one * number_of_nodes + two, drawn
+    uniformly from the candidates pairs (a number) that draw(size) proposes
+    as (one, two, keep) arrays.  Dense draws enumerate every candidate
+    instead, through draw(None).
+    '''
+    if count > candidates // 4:
+        one, two, keep = draw(None)
+        keys = _pair_keys(one[keep], two[keep], number_of_nodes)
+        return random_state.choice(keys, size=count, replace=False)
+    keys = np.zeros(0, dtype=np.int64)
+    while len(keys) < count:
+        one, two, keep = draw(2 * (count - len(keys)) + 16)
+        keep &= one != two
+        keys = np.union1d(keys, _pair_keys(one[keep], two[keep], number_of_nodes))
+    return random_state.permutation(keys)[:count]
+
+
+def planted_graph(community_sizes, p_in, p_out, seed=0):
+    '''
+    Draws a ChessGraph from a stochastic block model: every pair of players
+    in the same community has played (one game) with probability p_in and
+    every other pair with probability p_out.  Players are numbered
+    community by community and every player is in the graph, played or
+    not.  Returns the graph and the planted community of each player, in
+    node index order.
+
+    Edges are drawn by rejection from random pairs, so this is fast as long
+    as p_out is small; only small graphs can have dense blocks.
+    '''
+    random_state = np.random.RandomState(seed)
+    community_sizes = np.asarray(community_sizes, dtype=np.int64)
+    number_of_nodes = int(community_sizes.sum())
+    labels = np.repeat(np.arange(len(community_sizes)), community_sizes)
+    offsets = np.concatenate([[0], np.cumsum(community_sizes)])
+
+    keys = []
+    for first, size in zip(offsets[:-1].tolist(), community_sizes.tolist()):
+        pairs = size * (size - 1) // 2
+        def draw_inside(draws, first=first, size=size):
+            if draws is None:
+                one, two = np.triu_indices(size, 1)
+            else:
+                one, two = random_state.randint(0, size, size=(2, draws))
+            return one + first, two + first, np.ones(len(one), dtype=bool)
+        keys.append(_sample_pairs(random_state, random_state.binomial(pairs, p_in), pairs,
+                                  draw_inside, number_of_nodes))
+
+    pairs = (number_of_nodes ** 2 - int(np.sum(community_sizes ** 2))) // 2
+    def draw_between(draws):
+        if draws is None:
+            one, two = np.triu_indices(number_of_nodes, 1)
+        else:
+            one, two = random_state.randint(0, number_of_nodes, size=(2, draws))
+        return one, two, labels[one] != labels[two]
+    keys.append(_sample_pairs(random_state, random_state.binomial(pairs, p_out), pairs,
+                              draw_between, number_of_nodes))
+
+    keys = np.sort(np.concatenate(keys))
+    graph = ChessGraph.from_arrays([str(FIRST_FIDE_ID + i) for i in xrange(number_of_nodes)],
+                                   ['Player {0}'.format(i) for i in xrange(number_of_nodes)],
+                                   ['None'] * number_of_nodes,
+                                   random_state.randint(2000, 2800, size=number_of_nodes),
+                                   keys // number_of_nodes,
+                                   keys % number_of_nodes,
+                                   np.ones(len(keys), dtype=np.int32))
+    return graph, labels
@@ -2,15 +2,18 @@
 from __future__ import division, print_function
 
 import math
-import operator
-import datetime
+import time
 
 import numpy as np
 import numpy.random as npr
+import scipy.sparse as sparse
 
-from collections import defaultdict
-
-from chess_social.graph import ChessGame
+from chess_social.components import ComponentSweep
+from chess_social.initialization import initial_labels
+from chess_social.label_sampler import LabelSampler
+from chess_social.monitor import IterationMetrics, PHASES, print_progress
+from chess_social.parallel_sweep import ParallelSweep
+from chess_social.trace import LabelTrace
 
 # CONSTANTS
 A_IN = 'a_in'
@@ -24,6 +27,23 @@ P_IN = 'p_in'
 P_OUT = 'p_out'
 ALPHA = 'alpha'
 
+#split-merge moves per iteration and restricted Gibbs scans per split proposal
+SPLIT_MERGE = 'split_merge'
+SPLIT_MERGE_SCANS = 'split_merge_scans'
+
+#worker processes for the label sweep and most players per parallel batch
+SWEEP_PROCESSES = 'sweep_processes'
+SWEEP_BATCH = 'sweep_batch'
+
+#sweep every connected component of the graph on its own
+COMPONENTS = 'components'
+
+#chess_social.initialization initializer for the starting labels
+INIT = 'init'
+
+#working space used by estimate_partitions, in bytes
+MEMORY_BUDGET = 256 * 1024 * 1024
+
 __all__ = ['CommunityDetector',]
 
 
@@ -41,99 +61,73 @@ class CommunityDetector(object):
         self.__p_out_0 = kw_args.get(P_OUT, 0.2)
         self.__alpha_0 = kw_args.get(ALPHA, 10.0)
 
-    @staticmethod
-    def __edge_count(graph):
-        community_count = defaultdict(int)
-        seen_players = set()
-        edges_in = 0
-        edges_out = 0
-        node_pairs_in = 0
-        node_pairs_out = 0
-        for game in graph.adjacency_matrix.keys():
-            player_one = graph.get_node(game.player_one)
-            player_two = graph.get_node(game.player_two)
-            if player_one.community == player_two.community:
-                edges_in += 1
-            else:
-                edges_out += 1
-            if player_one not in seen_players:
-                community_count[player_one.community] += 1
-                seen_players.add(player_one)
-            if player_two not in seen_players:
-                community_count[player_two.community] += 1
-                seen_players.add(player_two)
-        total_possible_pairs_of_nodes = graph.number_of_nodes * (graph.number_of_nodes - 1) * 0.5
-        total_possible_pairs_inside = 0
-        for count in community_count.itervalues():
-            total_possible_pairs_inside += count * (count -1) * 0.5
-        node_pairs_in = total_possible_pairs_inside - edges_in
-        node_pairs_out = total_possible_pairs_of_nodes - total_possible_pairs_inside - edges_out
-
-        return community_count, edges_in, node_pairs_in, edges_out, node_pairs_out
+        self.__split_merge = kw_args.get(SPLIT_MERGE, 0)
+        self.__split_merge_scans = kw_args.get(SPLIT_MERGE_SCANS, 3)
+
+        self.__sweep_processes = kw_args.get(SWEEP_PROCESSES, 1)
+        self.__sweep_batch = kw_args.get(SWEEP_BATCH, 1024)
+        self.__components = kw_args.get(COMPONENTS, False)
+        self.__init = kw_args.get(INIT, 'singletons')
+
+        self.__p_in = None
+        self.__p_out = None
+        self.__alpha = None
+        self.__number_of_communities = None
+
+    @property
+    def p_in(self):
+        '''p_in at every iteration of the last run'''
+        return self.__p_in
+
+    @property
+    def p_out(self):
+        '''p_out at every iteration of the last run'''
+        return self.__p_out
+
+    @property
+    def alpha(self):
+        '''alpha at every iteration of the last run'''
+        return self.__alpha
+
+    @property
+    def number_of_communities(self):
+        '''Number of communities at every iteration of the last run'''
+        return self.__number_of_communities
 
     def __update_p(self, i, edges_in, node_pairs_in, edges_out, node_pairs_out, p_in, p_out):
+        '''Returns whether the p_in and p_out proposals were accepted'''
         p_in_tmp = npr.beta(edges_in + self.__a_in, node_pairs_in + self.__b_in)
-        if p_in_tmp > p_out[i-1]:
+        p_in_accepted = p_in_tmp > p_out[i-1]
+        if p_in_accepted:
             p_in[i] = p_in_tmp
         else:
             p_in[i] = p_in[i-1]
         #update p_out with constraint that p_out < p_in
         p_out_tmp = npr.beta(edges_out + self.__a_out, node_pairs_out + self.__b_out)
-        if p_out_tmp < p_in[i]:
+        p_out_accepted = p_out_tmp < p_in[i]
+        if p_out_accepted:
             p_out[i] = p_out_tmp
         else:
             p_out[i] = p_out[i-1]
+        return bool(p_in_accepted), bool(p_out_accepted)
 
     @staticmethod
-    def __update_labels_for_node_i(labels, graph, i, community_count, p_in, p_out, alpha):
-        player_communities = labels[i-1].copy()
-        for j, player in enumerate(graph.nodes):
-            c_count = community_count.copy()
-            table_size = c_count[player.community]
-            if table_size <= 1:
-                del c_count[player.community]
-            else:
-                c_count[player.community] = table_size - 1
-            sorted_labels = sorted(c_count.iterkeys())
-            #append extra label to the end
-            sorted_labels.append(labels.max() + 1)
-            _, probabilities = np.array(zip(*sorted(c_count.iteritems(),
-                                                    key=operator.itemgetter(0))),
-                                        dtype=np.float64)
-            #append probability for new label
-            probabilities = np.append(probabilities, alpha[i-1])
-            for k, label in enumerate(sorted_labels):
-                for node in graph.nodes:
-                    if node == player:
-                        continue
-                    p_ij = p_out[i]
-                    if label == node.community:
-                        p_ij = p_in[i]
-                    game = ChessGame(player.fide_id, node.fide_id)
-                    if graph.adjacency_matrix.get(game, 0):
-                        probabilities[k] *= p_ij
-                    else:
-                        probabilities[k] *= (1 - p_ij)
-            # sample new label
-            the_sum = np.sum(probabilities)
-            rnd_unif = npr.uniform()
-            cumulative = np.cumsum(probabilities/the_sum)
-            # print(cumulative)
-            sample_index = np.where(cumulative >= rnd_unif)[0][0]
-            new_label = sorted_labels[sample_index]
-            player_communities[j] = new_label
-
-        #append new labels to our collection of labels from previous iterations
-        labels = np.vstack([labels, player_communities])
+    def __update_labels_for_node_i(trace, coclustering, graph, i, sampler, p_in, p_out, alpha,
+                                   sweep):
+        if sweep is None:
+            player_communities = sampler.sweep(p_in[i], p_out[i], alpha[i-1])
+        else:
+            player_communities = sweep(sampler, p_in[i], p_out[i], alpha[i-1])
+
+        #save new labels to our collection of labels from previous iterations
+        trace.append(i, player_communities)
+        if coclustering is not None:
+            coclustering.append(i, player_communities)
         #update graph with current label set
         graph.communities = player_communities
 
-        return labels
-
-    def __calculate_alpha(self, graph, alpha_prev):
+    def __calculate_alpha(self, num_communities, num_players, alpha_prev):
         '''Picks alpha from a mixture of 2 gamma distributions'''
-        num_communities = graph.number_of_communities
-        num_players = graph.number_of_nodes
         beta_z = npr.beta(alpha_prev + 1, num_players)
         #generate a uniform random number to pick which gamma from the mixture
         rnd_unif = npr.uniform()
@@ -144,14 +138,59 @@ class CommunityDetector(object):
             return npr.gamma(self.__gamma_a + num_communities, mixture_scale)
         return npr.gamma(self.__gamma_a + num_communities - 1, mixture_scale)
 
-    def run(self, graph, start_labels=None, iterations=100):
-        #1. initialize labels in graph
-        if not start_labels:
-            #start every node in its own community
-            start_labels = range(graph.number_of_nodes)
-            print('Initializing labels with {0} different labels'.format(graph.number_of_nodes))
-        graph.communities = start_labels
-
+    def __save_checkpoint(self, checkpoint, i, sampler, trace, coclustering, p_in, p_out,
+                          alpha, number_of_communities):
+        state = {'iteration': i,
+                 'labels': sampler.labels,
+                 'p_in': p_in,
+                 'p_out': p_out,
+                 'alpha': alpha,
+                 'number_of_communities': number_of_communities,
+                 'trace_rows': len(trace)}
+        trace.flush()
+        if trace.filename is None:
+            #file-backed traces already hold every row on disk
+            state['trace_labels'] = trace.labels
+        if coclustering is not None:
+            for key, value in coclustering.state().iteritems():
+                state['coclustering_' + key] = value
+        checkpoint.save(**state)
+
+    def run(self, graph, start_labels=None, iterations=100, trace=None, checkpoint=None,
+            warm_start=False, callbacks=None, coclustering=None):
+        '''
+        Runs the Gibbs sampler and returns the sampled labels, one row per
+        saved iteration.  Labels are kept in an in-memory LabelTrace unless
+        a (possibly memory-mapped or thinned) trace is supplied.
+
+        The starting labels are start_labels if given, or the graph's
+        community labels if warm_start is set and it has any (e.g. the
+        previous partition of a graph that has since had games appended);
+        otherwise they come from the init initializer of
+        chess_social.initialization, by default every player in its own
+        community.
+
+        Every callback is called with the chess_social.monitor.IterationMetrics
+        of each iteration; by default a progress line is printed.
+
+        With sweep_processes above 1 the labels are swept by a
+        chess_social.parallel_sweep.ParallelSweep, an approximation of the
+        sequential sweep whose staleness is bounded by sweep_batch players.
+        With components set every connected component is swept on its own
+        by a chess_social.components.ComponentSweep, by sweep_processes
+        processes, and communities stay within components; split-merge
+        moves then only pair players of the same component.
+
+        Every labelling is also counted by coclustering, if a
+        chess_social.coclustering.CoClustering is supplied, so a partition
+        can be picked from it with a trace that keeps only a few rows.  Its
+        counts are saved with checkpoints.
+
+        If a stats.checkpoint.Checkpoint is supplied the sampler state is
+        saved whenever it is due, and a run that is resuming carries on
+        from the last saved iteration with the same random stream.  A
+        file-backed trace must be reopened with mode='r+' to resume.
+        '''
         p_in = np.zeros(iterations + 1)
         p_out = np.zeros(iterations + 1)
         p_in[0] = self.__p_in_0
@@ -160,53 +199,203 @@ class CommunityDetector(object):
         alpha = np.zeros(iterations + 1)
         alpha[0] = self.__alpha_0
 
-        labels = np.array(start_labels)
-        labels = labels.reshape((1, len(start_labels)))
+        number_of_communities = np.zeros(iterations + 1, dtype=np.int64)
+
+        if trace is None:
+            trace = LabelTrace(graph.number_of_nodes, iterations)
+
+        saved = checkpoint.load() if checkpoint is not None else None
+        if saved is not None:
+            if (len(saved['p_in']) != iterations + 1 or
+                    len(saved['labels']) != graph.number_of_nodes):
+                raise ValueError('Checkpoint {0} is for a different run'.format(
+                    checkpoint.filename))
+            if 'trace_labels' not in saved and trace.filename is None:
+                raise ValueError('Checkpoint {0} needs its file-backed label trace'.format(
+                    checkpoint.filename))
+            first_iteration = int(saved['iteration']) + 1
+            start_labels = saved['labels']
+            p_in[:] = saved['p_in']
+            p_out[:] = saved['p_out']
+            alpha[:] = saved['alpha']
+            number_of_communities[:] = saved['number_of_communities']
+            trace.rewind(int(saved['trace_rows']), saved.get('trace_labels'))
+            if coclustering is not None:
+                if 'coclustering_counts' not in saved:
+                    raise ValueError('Checkpoint {0} has no co-clustering counts'.format(
+                        checkpoint.filename))
+                coclustering.restore({key[len('coclustering_'):]: value
+                                      for key, value in saved.iteritems()
+                                      if key.startswith('coclustering_')})
+            print('Resuming from iteration {0}'.format(first_iteration - 1))
+        else:
+            first_iteration = 1
 
-        for i in xrange(1, iterations+1):
-            (community_count, edges_in, node_pairs_in,
-                edges_out, node_pairs_out) = CommunityDetector.__edge_count(graph)
+        #1. initialize labels in graph
+        if start_labels is None and warm_start and graph.community_labels is not None:
+            start_labels = graph.community_labels
+            print('Warm starting from {0} communities'.format(graph.number_of_communities))
+        if start_labels is None:
+            start_labels = initial_labels(graph, self.__init)
+            print('Initializing labels with {0} different labels from {1}'.format(
+                len(np.unique(start_labels)), self.__init))
+        graph.communities = start_labels
 
-            print('{0}  Iteration: {1}; Number of Communities: {2}; Number of Edges In: {3}; '
-                'Number of Edges Out: {4}'.format(
-                    datetime.datetime.strftime(datetime.datetime.now(), '%Y-%m-%d %H:%M:%S'),
-                    i, len(community_count), edges_in, edges_out))
+        sampler = LabelSampler(graph.indptr, graph.indices, start_labels)
+        sweep = None
+        if self.__components:
+            sweep = ComponentSweep(graph.indptr, graph.indices, processes=self.__sweep_processes)
+            print('Sampling {0} connected components separately'.format(
+                sweep.number_of_components))
+        elif self.__sweep_processes > 1:
+            sweep = ParallelSweep(graph.indptr, graph.indices, processes=self.__sweep_processes,
+                                  max_batch=self.__sweep_batch)
+        #split-merge moves must not join communities of different components either
+        groups = sweep.components if self.__components else None
+
+        if saved is None:
+            number_of_communities[0] = sampler.number_of_communities
+            trace.append(0, sampler.labels)
+            if coclustering is not None:
+                coclustering.append(0, sampler.labels)
+
+        if callbacks is None:
+            callbacks = [print_progress]
+
+        for i in xrange(first_iteration, iterations+1):
+            #wall clock at the start of every phase and at the end of the iteration
+            times = [time.time()]
+
+            edges_in, node_pairs_in, edges_out, node_pairs_out = sampler.edge_count()
+            times.append(time.time())
 
             #first update p_in, given p_out, pi, and alpha, with constraint that p_in > p_out
-            self.__update_p(i, edges_in, node_pairs_in, edges_out, node_pairs_out, p_in, p_out)
+            p_in_accepted, p_out_accepted = self.__update_p(i, edges_in, node_pairs_in, edges_out,
+                                                            node_pairs_out, p_in, p_out)
+            times.append(time.time())
+
+            #split-merge moves let whole communities join or part in one step
+            split_merge_accepted = 0
+            for _ in xrange(self.__split_merge):
+                split_merge_accepted += sampler.split_merge(p_in[i], p_out[i], alpha[i-1],
+                                                            scans=self.__split_merge_scans,
+                                                            groups=groups)
+            times.append(time.time())
 
             #update all the labels on each node
-            labels = CommunityDetector.__update_labels_for_node_i(labels,
-                                                                  graph,
-                                                                  i,
-                                                                  community_count,
-                                                                  p_in,
-                                                                  p_out,
-                                                                  alpha)
+            CommunityDetector.__update_labels_for_node_i(trace,
+                                                         coclustering,
+                                                         graph,
+                                                         i,
+                                                         sampler,
+                                                         p_in,
+                                                         p_out,
+                                                         alpha,
+                                                         sweep)
+            times.append(time.time())
 
             #update alpha
-            alpha[i] = self.__calculate_alpha(graph, alpha[i-1])
+            alpha[i] = self.__calculate_alpha(sampler.number_of_communities,
+                                              graph.number_of_nodes,
+                                              alpha[i-1])
+            number_of_communities[i] = sampler.number_of_communities
+            times.append(time.time())
+
+            if checkpoint is not None and checkpoint.due(i):
+                self.__save_checkpoint(checkpoint, i, sampler, trace, coclustering, p_in,
+                                       p_out, alpha, number_of_communities)
+            times.append(time.time())
+
+            if callbacks:
+                metrics = IterationMetrics(iteration=i,
+                                           iterations=iterations,
+                                           time=times[-1],
+                                           seconds=times[-1] - times[0],
+                                           phase_seconds={phase: end - start for phase, start, end
+                                                          in zip(PHASES, times, times[1:])},
+                                           number_of_communities=sampler.number_of_communities,
+                                           edges_in=sampler.edges_in,
+                                           edges_out=sampler.edges_out,
+                                           p_in=float(p_in[i]),
+                                           p_out=float(p_out[i]),
+                                           p_in_accepted=p_in_accepted,
+                                           p_out_accepted=p_out_accepted,
+                                           split_merge_accepted=split_merge_accepted,
+                                           alpha=float(alpha[i]))
+                for callback in callbacks:
+                    callback(metrics)
+
+        if isinstance(sweep, ParallelSweep):
+            sweep.close()
+
+        self.__p_in = p_in
+        self.__p_out = p_out
+        self.__alpha = alpha
+        self.__number_of_communities = number_of_communities
+
+        trace.flush()
+        return trace.labels
 
-        return labels
+    @staticmethod
+    def __one_hot(samples, number_of_labels):
+        '''Sparse players x (iterations * number_of_labels) indicator of every label'''
+        iterations, nodes = samples.shape
+        columns = (samples.astype(np.int64) +
+                   number_of_labels * np.arange(iterations).reshape((iterations, 1)))
+        return sparse.csc_matrix((np.ones(iterations * nodes, dtype=np.int64),
+                                  (np.tile(np.arange(nodes), iterations), columns.ravel())),
+                                 shape=(nodes, iterations * number_of_labels)).tocsr()
 
     @staticmethod
-    def estimate_partitions(labels, burnin=0):
-        #calculate empirical probabilities that c_i == c_j
-        emp_prob = {}
+    def estimate_partitions(labels, burnin=0, memory_budget=MEMORY_BUDGET):
+        '''
+        Picks the sampled partition that best agrees with the empirical
+        probabilities that c_i == c_j, i.e. the iteration maximising the sum
+        of (p_ij - 0.5) over pairs of players that share a community.
+
+        The co-clustering counts are built a block of players at a time from
+        one-hot label matrices, and iterations are scored in bulk, so that no
+        more than roughly memory_budget bytes of working space are used.
+        Scores are kept in exact integer arithmetic (2 * count_ij - iterations).
+        '''
         iterations, nodes = labels.shape
         iterations = iterations - burnin
-        for i in range(nodes):
-            for j in range(i+1, nodes):
-                emp_prob[(i, j)] = np.sum(labels[burnin:, i] == labels[burnin:, j]) / iterations
-
-        posterior_risk = np.zeros(iterations)
-        for k, iteration in enumerate(labels[burnin:]):
-            for i in range(len(iteration)):
-                for j in range(i + 1, len(iteration)):
-                    if iteration[i] == iteration[j]:
-                        posterior_risk[k] += emp_prob[(i, j)] - 0.5
-
-        index = np.where(posterior_risk == np.amax(posterior_risk))[0][0] + burnin
+
+        number_of_labels = 0
+        chunk = max(1, memory_budget // (8 * nodes))
+        for start in xrange(burnin, burnin + iterations, chunk):
+            number_of_labels = max(number_of_labels, int(labels[start:start+chunk].max()) + 1)
+
+        # block of players whose co-clustering counts are held at once, and
+        # block of iterations whose one-hot encoding is scored at once
+        block = int(max(1, min(nodes, memory_budget // (2 * 8 * nodes))))
+        chunk = int(max(1, min(iterations, memory_budget // (2 * 8 * block * number_of_labels))))
+        chunks = [(start, min(start + chunk, burnin + iterations))
+                  for start in xrange(burnin, burnin + iterations, chunk)]
+
+        risk = np.zeros(iterations, dtype=np.int64)
+        for first in xrange(0, nodes, block):
+            players = slice(first, min(first + block, nodes))
+            counts = np.zeros((players.stop - players.start, nodes), dtype=np.int64)
+            for start, stop in chunks:
+                one_hot = CommunityDetector.__one_hot(np.asarray(labels[start:stop]),
+                                                      number_of_labels)
+                counts += (one_hot[players] * one_hot.T).toarray()
+            weights = (2 * counts - iterations).T
+
+            for start, stop in chunks:
+                samples = np.asarray(labels[start:stop], dtype=np.int64)
+                one_hot = CommunityDetector.__one_hot(samples, number_of_labels)
+                # summed weights of each player's community at each iteration
+                community_weights = one_hot.T.dot(weights)
+                rows = (samples[:, players] +
+                        number_of_labels * np.arange(stop - start).reshape((stop - start, 1)))
+                columns = np.arange(players.stop - players.start)
+                risk[start-burnin:stop-burnin] += community_weights[rows, columns].sum(axis=1)
+
+        #risk counts every pair twice plus each player with itself, which
+        #is the same for every iteration, so the ordering is unchanged
+        index = int(np.argmax(risk)) + burnin
         return index, labels[index]
 
 
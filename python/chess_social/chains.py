@@ -0,0 +1,131 @@
+'''
+Runs several independent CommunityDetector chains in a process pool and
+compares them.
+'''
+from __future__ import division, print_function
+
+import itertools
+import multiprocessing
+import os
+from collections import namedtuple
+
+import numpy as np
+import numpy.random as npr
+
+from chess_social.bayes_community_detection import CommunityDetector
+from chess_social.partitions import adjusted_rand_index, normalized_mutual_information
+from chess_social.trace import LabelTrace
+from stats.checkpoint import Checkpoint
+from stats.diagnostics import gelman_rubin
+
+__all__ = ['ChainResult', 'run_chains', 'chain_diagnostics', 'pooled_partition']
+
+ChainResult = namedtuple('ChainResult', ['seed', 'trace', 'p_in', 'p_out', 'alpha',
+                                         'number_of_communities'])
+
+#graph inherited by the forked worker processes, which only ever read it
+_GRAPH = None
+
+
+def _run_chain(args):
+    seed, iterations, thin, trace_file, checkpoint, warm_start, detector_args = args
+    npr.seed(seed)
+    detector = CommunityDetector(**detector_args)
+    mode = 'w+'
+    if checkpoint is not None and checkpoint.resuming and trace_file and os.path.exists(trace_file):
+        mode = 'r+'
+    trace = LabelTrace(_GRAPH.number_of_nodes, iterations, thin=thin, filename=trace_file,
+                       mode=mode)
+    detector.run(_GRAPH, iterations=iterations, trace=trace, checkpoint=checkpoint,
+                 warm_start=warm_start)
+    if trace_file:
+        #hand back the file name rather than pickling the whole trace
+        trace = None
+    return (seed, trace, detector.p_in, detector.p_out, detector.alpha,
+            detector.number_of_communities)
+
+
+def run_chains(graph, chains=4, iterations=100, seed=None, processes=None, thin=1,
+               trace_dir=None, checkpoint_dir=None, checkpoint_every=100, resume=False,
+               warm_start=False, **detector_args):
+    '''
+    Runs independent chains on the same graph, each with its own seed, and
+    returns a ChainResult per chain.  With trace_dir set every chain writes
+    its labels to a memory-mapped chain_<n>.npy file in that directory, and
+    with checkpoint_dir set every chain checkpoints to chain_<n>.npz.
+    processes=1 runs the chains one after the other in this process.
+    warm_start is passed on to CommunityDetector.run.
+    '''
+    global _GRAPH
+    if seed is None:
+        seeds = npr.randint(0, 2**31 - 1, size=chains)
+    else:
+        seeds = seed + np.arange(chains)
+    trace_files = [None] * chains
+    if trace_dir:
+        trace_files = [os.path.join(trace_dir, 'chain_{0}.npy'.format(chain))
+                       for chain in xrange(chains)]
+    checkpoints = [None] * chains
+    if checkpoint_dir:
+        checkpoints = [Checkpoint(checkpoint_dir, 'chain_{0}'.format(chain),
+                                  every=checkpoint_every, resume=resume)
+                       for chain in xrange(chains)]
+    tasks = [(int(chain_seed), iterations, thin, trace_file, checkpoint, warm_start,
+              detector_args)
+             for chain_seed, trace_file, checkpoint in zip(seeds, trace_files, checkpoints)]
+
+    _GRAPH = graph
+    try:
+        if processes == 1:
+            outputs = map(_run_chain, tasks)
+        else:
+            pool = multiprocessing.Pool(processes=min(processes or chains, chains))
+            try:
+                outputs = pool.map(_run_chain, tasks)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        _GRAPH = None
+
+    results = []
+    for output, trace_file in zip(outputs, trace_files):
+        if trace_file:
+            output = (output[0], LabelTrace.load(trace_file, thin=thin)) + output[2:]
+        results.append(ChainResult(*output))
+    return results
+
+
+def chain_diagnostics(results, burnin=0):
+    '''
+    Compares the post-burnin draws of several chains.  Returns a dict of
+    R-hat for the number of communities, p_in, p_out and alpha, the
+    partition each chain picks with CommunityDetector.estimate_partitions,
+    and the mean pairwise adjusted Rand index and normalized mutual
+    information between those partitions.
+    '''
+    first = max(burnin, 1)
+    rhat = {}
+    for name in ('number_of_communities', 'p_in', 'p_out', 'alpha'):
+        draws = np.array([getattr(result, name)[first:] for result in results])
+        rhat[name] = gelman_rubin(draws)
+
+    partitions = []
+    for result in results:
+        _, partition = CommunityDetector.estimate_partitions(
+            result.trace.labels, burnin=result.trace.burnin_rows(burnin))
+        partitions.append(partition)
+
+    pairs = list(itertools.combinations(partitions, 2))
+    return {'rhat': rhat,
+            'partitions': partitions,
+            'ari': np.mean([adjusted_rand_index(one, two) for one, two in pairs]),
+            'nmi': np.mean([normalized_mutual_information(one, two) for one, two in pairs])}
+
+
+def pooled_partition(results, burnin=0):
+    '''Picks the best partition over the post-burnin draws of every chain'''
+    labels = np.vstack([result.trace.labels[result.trace.burnin_rows(burnin):]
+                        for result in results])
+    _, partition = CommunityDetector.estimate_partitions(labels)
+    return partition
@@ -0,0 +1,165 @@
+'''
+Streaming posterior summaries of the community labels sampled by
+CommunityDetector, so a partition can be picked without keeping the whole
+iterations x players trace.
+
+CoClustering counts, after burn-in, how often each candidate pair of
+players shares a community.  For a moderate number of players every pair is
+a candidate and the counts are exact; otherwise the candidates are the
+edges of the graph plus a few sampled pairs per player, and the pairs that
+did not play each other are represented by the sampled ones.  It also keeps
+a bounded reservoir of sampled partitions, evenly spread over the run, and
+at the end picks the one that best agrees with the counts, with the same
+criterion as CommunityDetector.estimate_partitions.
+'''
+from __future__ import division
+
+import numpy as np
+import numpy.random as npr
+
+__all__ = ['CoClustering',]
+
+
+class CoClustering(object):
+    '''
+    Co-clustering counts and a reservoir of at most reservoir partitions.
+
+    Graphs of up to exact_nodes players count every pair exactly.  Larger
+    graphs count the pairs of players who played each other, and about
+    sampled_pairs pairs per player drawn with the given seed; each sampled
+    pair stands in for its share of all the pairs who never played.
+
+    The reservoir keeps every stride-th sample after burn-in and doubles
+    the stride, dropping every other partition, whenever it overflows, so
+    it always holds partitions from the whole run.
+    '''
+
+    def __init__(self, graph, burnin=0, reservoir=32, exact_nodes=2000, sampled_pairs=10,
+                 seed=0):
+        if reservoir < 1:
+            raise ValueError('reservoir must hold at least 1 partition')
+        number_of_nodes = graph.number_of_nodes
+        if number_of_nodes <= exact_nodes:
+            one, two = np.triu_indices(number_of_nodes, 1)
+            weights = np.ones(len(one))
+        else:
+            one, two, weights = self.__candidate_pairs(graph, sampled_pairs, seed)
+        self.__one = one.astype(np.int32)
+        self.__two = two.astype(np.int32)
+        self.__weights = weights
+        self.__exact = number_of_nodes <= exact_nodes
+        self.__counts = np.zeros(len(one), dtype=np.int32)
+        self.__samples = 0
+        self.__burnin = burnin
+
+        self.__partitions = np.empty((reservoir + 1, number_of_nodes),
+                                     dtype=np.min_scalar_type(max(number_of_nodes - 1, 0)))
+        self.__iterations = np.empty(reservoir + 1, dtype=np.int64)
+        self.__stored = 0
+        self.__stride = 1
+
+    @staticmethod
+    def __candidate_pairs(graph, sampled_pairs, seed):
+        '''The edges with weight 1 and sampled non-edges weighted up to all the non-edges'''
+        number_of_nodes = graph.number_of_nodes
+        edge_one, edge_two, _ = graph.edges
+        edge_keys = edge_one.astype(np.int64) * number_of_nodes + edge_two
+
+        random_state = npr.RandomState(seed)
+        one = np.repeat(np.arange(number_of_nodes, dtype=np.int64), sampled_pairs)
+        two = random_state.randint(number_of_nodes, size=len(one))
+        one, two = np.minimum(one, two), np.maximum(one, two)
+        keys = np.unique(one[one != two] * number_of_nodes + two[one != two])
+        keys = np.setdiff1d(keys, edge_keys, assume_unique=True)
+
+        non_edges = number_of_nodes * (number_of_nodes - 1) // 2 - len(edge_keys)
+        weights = np.ones(len(edge_keys) + len(keys))
+        if len(keys):
+            weights[len(edge_keys):] = non_edges / len(keys)
+        keys = np.concatenate([edge_keys, keys])
+        return keys // number_of_nodes, keys % number_of_nodes, weights
+
+    @property
+    def exact(self):
+        '''True if every pair of players is counted'''
+        return self.__exact
+
+    @property
+    def number_of_pairs(self):
+        return len(self.__counts)
+
+    @property
+    def samples(self):
+        '''Number of samples counted so far'''
+        return self.__samples
+
+    @property
+    def iterations(self):
+        '''The iteration of every partition in the reservoir'''
+        return self.__iterations[:self.__stored].copy()
+
+    @property
+    def partitions(self):
+        '''The partitions in the reservoir, one row each'''
+        return self.__partitions[:self.__stored]
+
+    def probabilities(self):
+        '''Returns (player_one, player_two, p) arrays of the candidate pairs'''
+        return self.__one, self.__two, self.__counts / max(self.__samples, 1)
+
+    def append(self, iteration, labels):
+        '''Counts labels if iteration is past burn-in; returns whether it was counted'''
+        if iteration < self.__burnin:
+            return False
+        labels = np.asarray(labels)
+        self.__counts += labels[self.__one] == labels[self.__two]
+
+        if self.__samples % self.__stride == 0:
+            self.__partitions[self.__stored] = labels
+            self.__iterations[self.__stored] = iteration
+            self.__stored += 1
+            if self.__stored == len(self.__iterations):
+                kept = (self.__stored + 1) // 2
+                self.__partitions[:kept] = self.__partitions[:self.__stored:2]
+                self.__iterations[:kept] = self.__iterations[:self.__stored:2]
+                self.__stored = kept
+                self.__stride *= 2
+        self.__samples += 1
+        return True
+
+    def score(self, labels):
+        '''
+        Sum of the weights of the (2 * count - samples) of the candidate
+        pairs that share a community in labels
+        '''
+        labels = np.asarray(labels)
+        together = labels[self.__one] == labels[self.__two]
+        return float(np.dot(self.__weights[together],
+                            2.0 * self.__counts[together] - self.__samples))
+
+    def best_partition(self):
+        '''Returns the iteration and labels of the best scoring partition in the reservoir'''
+        if not self.__stored:
+            raise ValueError('No partitions have been sampled after burn-in')
+        scores = [self.score(labels) for labels in self.partitions]
+        index = int(np.argmax(scores))
+        return int(self.__iterations[index]), self.__partitions[index].copy()
+
+    def state(self):
+        '''The arrays needed to carry on counting, e.g. to save with a checkpoint'''
+        return {'counts': self.__counts,
+                'samples': self.__samples,
+                'partitions': self.partitions,
+                'iterations': self.iterations,
+                'stride': self.__stride}
+
+    def restore(self, state):
+        '''Carries on from a state saved from a CoClustering of the same graph'''
+        if len(state['counts']) != len(self.__counts):
+            raise ValueError('Co-clustering state is for different candidate pairs')
+        self.__counts[:] = state['counts']
+        self.__samples = int(state['samples'])
+        self.__stored = len(state['iterations'])
+        self.__partitions[:self.__stored] = state['partitions']
+        self.__iterations[:self.__stored] = state['iterations']
+        self.__stride = int(state['stride'])
@@ -0,0 +1,154 @@
+'''
+Label sweeps that sample every connected component of the game graph on
+its own.
+
+Players in different components never played each other, so ComponentSweep
+keeps a LabelSampler per component and a player only ever weighs up the
+communities of its own component.  The giant component is then no longer
+slowed down by the thousands of communities of small isolated groups, and
+the components can be swept in parallel by worker processes.  p_in, p_out
+and alpha stay global: they are drawn from the statistics of the whole
+graph between sweeps.
+
+Communities never span two components, which is a constraint on the model:
+such a community has no games inside it between the two parts, so it has
+little posterior mass unless p_in is close to p_out.
+'''
+from __future__ import division
+
+import multiprocessing
+
+import numpy as np
+import numpy.random as npr
+import scipy.sparse as sparse
+from scipy.sparse.csgraph import connected_components
+
+from chess_social.label_sampler import LabelSampler
+
+__all__ = ['component_labels', 'ComponentSweep']
+
+#component samplers inherited by the forked worker processes
+_SAMPLERS = None
+
+
+def component_labels(indptr, indices):
+    '''Returns the number of connected components and the component of every player'''
+    number_of_nodes = len(indptr) - 1
+    adjacency = sparse.csr_matrix((np.ones(len(indices), dtype=np.int8), indices, indptr),
+                                  shape=(number_of_nodes, number_of_nodes))
+    return connected_components(adjacency, directed=False)
+
+
+def _sweep_group(args):
+    '''Sweeps the component samplers of one group and returns their labels'''
+    seed, group, p_in, p_out, alpha = args
+    npr.seed(seed)
+    return [_SAMPLERS[c].sweep(p_in, p_out, alpha) for c in group]
+
+
+class ComponentSweep(object):
+    '''
+    Sweeps the labels of a LabelSampler one connected component at a
+    time, with processes worker processes.  The components are split into
+    groups of about the same number of players and edges, one per process;
+    the pool is forked afresh for every sweep so the workers see the
+    current component samplers.
+    '''
+
+    def __init__(self, indptr, indices, processes=1):
+        indptr = np.asarray(indptr)
+        indices = np.asarray(indices)
+        number_of_nodes = len(indptr) - 1
+        self.__number_of_components, components = component_labels(indptr, indices)
+        self.__components = components
+
+        #players laid out component by component, so every component is a
+        #contiguous block of rows and columns
+        self.__order = np.argsort(components, kind='mergesort')
+        rank = np.zeros(number_of_nodes, dtype=np.int64)
+        rank[self.__order] = np.arange(number_of_nodes)
+        rows = rank[np.repeat(np.arange(number_of_nodes), np.diff(indptr))]
+        columns = rank[indices]
+        self.__indices = columns[np.lexsort((columns, rows))]
+        self.__indptr = np.zeros(number_of_nodes + 1, dtype=np.int64)
+        self.__indptr[1:] = np.cumsum(np.bincount(rows, minlength=number_of_nodes))
+        sizes = np.bincount(components, minlength=self.__number_of_components)
+        self.__starts = np.zeros(self.__number_of_components + 1, dtype=np.int64)
+        self.__starts[1:] = np.cumsum(sizes)
+
+        self.__samplers = None
+        self.__synced = None
+
+        #largest first, each to the lightest group so far
+        work = sizes + np.diff(self.__indptr[self.__starts])
+        self.__groups = [[] for _ in xrange(max(1, min(processes, self.__number_of_components)))]
+        loads = [0] * len(self.__groups)
+        for c in np.argsort(-work, kind='mergesort').tolist():
+            lightest = loads.index(min(loads))
+            self.__groups[lightest].append(c)
+            loads[lightest] += work[c]
+
+    @property
+    def number_of_components(self):
+        return self.__number_of_components
+
+    @property
+    def components(self):
+        '''The component of every player'''
+        return self.__components
+
+    @property
+    def component_sizes(self):
+        return np.diff(self.__starts)
+
+    def __component_csr(self, c):
+        start, stop = self.__starts[c], self.__starts[c+1]
+        indptr = self.__indptr[start:stop+1]
+        return indptr - indptr[0], self.__indices[indptr[0]:indptr[-1]] - start
+
+    def __sync(self, labels):
+        '''Points every component sampler at the given labels, in component order'''
+        if self.__samplers is None:
+            self.__samplers = []
+            for c in xrange(self.__number_of_components):
+                indptr, indices = self.__component_csr(c)
+                self.__samplers.append(LabelSampler(indptr, indices,
+                                                    labels[self.__starts[c]:self.__starts[c+1]]))
+        else:
+            for c, sampler in enumerate(self.__samplers):
+                sampler.relabel(labels[self.__starts[c]:self.__starts[c+1]])
+
+    def __call__(self, sampler, p_in, p_out, alpha):
+        '''Resamples every label of sampler once and returns the new labels'''
+        global _SAMPLERS
+        labels = sampler.labels
+        #only out of step if something else, e.g. a split-merge move, changed the labels
+        if self.__synced is None or not np.array_equal(labels, self.__synced):
+            self.__sync(labels[self.__order])
+
+        if len(self.__groups) == 1:
+            for component_sampler in self.__samplers:
+                component_sampler.sweep(p_in, p_out, alpha)
+        else:
+            tasks = [(npr.randint(2**31), group, p_in, p_out, alpha) for group in self.__groups]
+            _SAMPLERS = self.__samplers
+            pool = multiprocessing.Pool(processes=len(self.__groups))
+            try:
+                results = pool.map(_sweep_group, tasks)
+            finally:
+                pool.close()
+                pool.join()
+                _SAMPLERS = None
+            for group, group_labels in zip(self.__groups, results):
+                for c, new_component_labels in zip(group, group_labels):
+                    self.__samplers[c].relabel(new_component_labels)
+
+        #every component's slots are below its number of players, so
+        #offsetting them by its first row keeps the communities apart
+        new_labels = np.empty(len(labels), dtype=np.int64)
+        for c, component_sampler in enumerate(self.__samplers):
+            new_labels[self.__order[self.__starts[c]:self.__starts[c+1]]] = (
+                component_sampler.labels + self.__starts[c])
+        sampler.relabel(new_labels)
+        self.__synced = sampler.labels
+        return self.__synced.copy()
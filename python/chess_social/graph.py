@@ -1,18 +1,47 @@
 from __future__ import print_function
 
+import array
+import gc
 import math
-import operator
 from collections import defaultdict
+from contextlib import contextmanager
 
 import numpy as np
 import networkx as nx
 import pylab
 
+#edges are keyed on (player_one << EDGE_KEY_BITS) | player_two while collecting games
+EDGE_KEY_BITS = 32
+EDGE_KEY_MASK = (1 << EDGE_KEY_BITS) - 1
+
 class GraphError(Exception):
     pass
 
 
+@contextmanager
+def _gc_paused():
+    '''
+    Turns the cyclic garbage collector off while creating records in bulk;
+    none of them form cycles, and collecting every few hundred allocations
+    would otherwise cost as much as creating them
+    '''
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
 class ChessPlayer(object):
+    '''
+    A player record.  Players are created in bulk by ChessGraph.nodes, so
+    the class uses __slots__ instead of a per-instance __dict__, and
+    hashing and equality read the slot directly.
+    '''
+
+    __slots__ = ('__fide_id', '__name', '__elo', '__title', '__community')
 
     def __init__(self, fide_id, name, title):
         self.__fide_id = fide_id
@@ -50,10 +79,13 @@ class ChessPlayer(object):
         self.__community = community
 
     def __hash__(self):
-        return hash(self.fide_id)
+        return hash(self.__fide_id)
 
     def __eq__(self, other):
-        return self.fide_id == other.fide_id
+        return self.__fide_id == other.fide_id
+
+    def __ne__(self, other):
+        return not self == other
 
     def __unicode__(self):
         return '{0}:{1}:{2}:{3}'.format(self.fide_id,
@@ -66,10 +98,20 @@ class ChessPlayer(object):
 
 
 class ChessGame(object):
+    '''
+    An unordered pair of players, used as the key of
+    ChessGraph.adjacency_matrix.  Uses __slots__ and computes its hash
+    once, since there is one game record per edge of the graph.
+    '''
+
+    __slots__ = ('__player_one', '__player_two', '__hash')
 
     def __init__(self, player_one, player_two):
-        self.__player_one = min(player_one, player_two)
-        self.__player_two = max(player_one, player_two)
+        if player_two < player_one:
+            player_one, player_two = player_two, player_one
+        self.__player_one = player_one
+        self.__player_two = player_two
+        self.__hash = hash((player_one, player_two))
 
     @property
     def player_one(self):
@@ -80,10 +122,14 @@ class ChessGame(object):
         return self.__player_two
 
     def __hash__(self):
-        return hash((self.player_one, self.player_two))
+        return self.__hash
 
     def __eq__(self, other):
-        return (self.player_one, self.player_two) == (other.player_one, other.player_two)
+        return (self.__player_one == other.player_one and
+                self.__player_two == other.player_two)
+
+    def __ne__(self, other):
+        return not self == other
 
     def __unicode__(self):
         return '{0} vs. {1}'.format(self.player_one, self.player_two)
@@ -92,45 +138,367 @@ class ChessGame(object):
         return unicode(self).encode('utf-8')
 
 
-class ChessGraph(object):
+class GameAggregator(object):
+    '''
+    Collects the players and games that make up a ChessGraph.
 
-    def __init__(self, pgnfile, min_elo=0):
-        nodes = defaultdict(list)
-        self.__edges = defaultdict(int)
-        self.__communities = None
-        self.__sorted_players = None
+    Each player keeps the name and title it was first seen with and
+    running accumulators of its ratings (sum, count, min, max and the last
+    one seen), stored in typed arrays indexed by player so memory grows
+    with the number of players, not games.  Each pair of players keeps the
+    number of games between them, keyed on one integer packing both player
+    indices.  Aggregators built from separate parts of the same games can
+    be merged, in order, into the one the whole would have given.
 
-        for game in pgnfile:
-            if game:
-                black_elo = int(game['black_elo'])
-                white_elo = int(game['white_elo'])
-                if black_elo < min_elo or white_elo < min_elo:
-                    continue
-                black_player = ChessPlayer(game['black_id'], game['black'], game['black_title'])
-                nodes[black_player].append(black_elo)
-                white_player = ChessPlayer(game['white_id'], game['white'], game['white_title'])
-                nodes[white_player].append(white_elo)
-
-                chess_game = ChessGame(game['black_id'], game['white_id'])
-                self.__edges[chess_game] += 1
-
-        self.__players = {}
-        for player, elo in nodes.iteritems():
-            player.elo = np.mean(elo)
-            self.__players[player.fide_id] = player
+    Games with a 'hash' entry are only counted once: a game is skipped if
+    its hash is in seen_games or was added before.
+    '''
 
+    def __init__(self, min_elo=0, seen_games=None):
         self.__min_elo = min_elo
+        if seen_games is None:
+            seen_games = ()
+        self.__seen_games = np.sort(np.asarray(seen_games, dtype=np.uint64))
+        self.__new_games = set()
+        self.__index = {}
+        self.__fide_ids = []
+        self.__names = []
+        self.__titles = []
+        self.__elo_sum = array.array('l')
+        self.__elo_count = array.array('l')
+        self.__elo_min = array.array('i')
+        self.__elo_max = array.array('i')
+        self.__elo_last = array.array('i')
+        self.__edges = defaultdict(int)
+
+    @classmethod
+    def from_graph(cls, graph):
+        '''Starts from the players, games and game hashes of a ChessGraph'''
+        aggregator = cls(graph.min_elo, seen_games=graph.game_hashes)
+        title_names = graph.title_names
+        aggregator.__fide_ids.extend(graph.fide_ids)
+        aggregator.__names.extend(graph.names)
+        aggregator.__titles.extend(title_names[code] for code in graph.title_codes)
+        aggregator.__index.update((fide_id, i) for i, fide_id in enumerate(graph.fide_ids))
+        aggregator.__elo_sum.extend(graph.elo_sum.tolist())
+        aggregator.__elo_count.extend(graph.elo_count.tolist())
+        aggregator.__elo_min.extend(graph.elo_min.tolist())
+        aggregator.__elo_max.extend(graph.elo_max.tolist())
+        aggregator.__elo_last.extend(graph.elo_last.tolist())
+        #players keep their node index, so the edges carry over as they are
+        edge_one, edge_two, games = graph.edges
+        keys = (edge_one.astype(np.int64) << EDGE_KEY_BITS) | edge_two
+        aggregator.__edges.update(zip(keys.tolist(), games.tolist()))
+        return aggregator
+
+    @property
+    def min_elo(self):
+        return self.__min_elo
+
+    @property
+    def fide_ids(self):
+        return self.__fide_ids
+
+    @property
+    def names(self):
+        return self.__names
+
+    @property
+    def titles(self):
+        return self.__titles
+
+    @property
+    def elo_sum(self):
+        return self.__elo_sum
+
+    @property
+    def elo_count(self):
+        return self.__elo_count
+
+    @property
+    def elo_min(self):
+        return self.__elo_min
+
+    @property
+    def elo_max(self):
+        return self.__elo_max
+
+    @property
+    def elo_last(self):
+        return self.__elo_last
+
+    @property
+    def edges(self):
+        '''Returns (player_one, player_two, games) arrays of player indices'''
+        keys = np.fromiter(self.__edges.iterkeys(), dtype=np.int64, count=len(self.__edges))
+        games = np.fromiter(self.__edges.itervalues(), dtype=np.int64, count=len(self.__edges))
+        return keys >> EDGE_KEY_BITS, keys & EDGE_KEY_MASK, games
+
+    @property
+    def game_hashes(self):
+        '''Sorted hashes of the games seen before and the games added since'''
+        new_games = np.array(sorted(self.__new_games), dtype=np.uint64)
+        return np.union1d(self.__seen_games, new_games)
+
+    def __seen(self, game_hash):
+        if game_hash in self.__new_games:
+            return True
+        game_hash = np.uint64(game_hash)
+        i = np.searchsorted(self.__seen_games, game_hash)
+        return i < len(self.__seen_games) and self.__seen_games[i] == game_hash
+
+    def __add_player(self, fide_id, name, title, elo_sum, elo_count, elo_min, elo_max, elo_last):
+        i = self.__index.get(fide_id)
+        if i is None:
+            self.__index[fide_id] = len(self.__fide_ids)
+            self.__fide_ids.append(fide_id)
+            self.__names.append(name)
+            self.__titles.append(title)
+            self.__elo_sum.append(elo_sum)
+            self.__elo_count.append(elo_count)
+            self.__elo_min.append(elo_min)
+            self.__elo_max.append(elo_max)
+            self.__elo_last.append(elo_last)
+            return len(self.__fide_ids) - 1
+        self.__elo_sum[i] += elo_sum
+        self.__elo_count[i] += elo_count
+        if elo_min < self.__elo_min[i]:
+            self.__elo_min[i] = elo_min
+        if elo_max > self.__elo_max[i]:
+            self.__elo_max[i] = elo_max
+        self.__elo_last[i] = elo_last
+        return i
+
+    def __add_edge(self, one, two, games):
+        if one > two:
+            one, two = two, one
+        self.__edges[(one << EDGE_KEY_BITS) | two] += games
+
+    def add_game(self, game):
+        '''Adds a game dict from PgnFile, skipping invalid games and players below min_elo'''
+        if not game:
+            return False
+        black_elo = int(game['black_elo'])
+        white_elo = int(game['white_elo'])
+        if black_elo < self.__min_elo or white_elo < self.__min_elo:
+            return False
+        game_hash = game.get('hash')
+        if game_hash is not None:
+            if self.__seen(game_hash):
+                return False
+            self.__new_games.add(game_hash)
+        black = self.__add_player(game['black_id'], game['black'], game['black_title'],
+                                  black_elo, 1, black_elo, black_elo, black_elo)
+        white = self.__add_player(game['white_id'], game['white'], game['white_title'],
+                                  white_elo, 1, white_elo, white_elo, white_elo)
+        self.__add_edge(black, white, 1)
+        return True
+
+    def merge(self, other):
+        '''Adds in everything collected by other, as if its games came after ours'''
+        mapping = [self.__add_player(*player) for player in zip(other.__fide_ids,
+                                                                other.__names,
+                                                                other.__titles,
+                                                                other.__elo_sum,
+                                                                other.__elo_count,
+                                                                other.__elo_min,
+                                                                other.__elo_max,
+                                                                other.__elo_last)]
+        for key, games in other.__edges.iteritems():
+            self.__add_edge(mapping[key >> EDGE_KEY_BITS], mapping[key & EDGE_KEY_MASK], games)
+        self.__new_games.update(other.__new_games)
+
+
+class ChessGraph(object):
+    '''
+    Graph of players (nodes) and the games between them (edges).
+
+    Players are indexed 0..N-1 in FIDE id order, and the graph is stored as
+    flat arrays: per-player elo, title code and community label, a unique
+    edge list with game counts, and CSR neighbour arrays (indptr, indices,
+    weights) built from it.  nodes, get_node and adjacency_matrix are views
+    built on top of these arrays.
+    '''
+
+    def __init__(self, pgnfile, min_elo=0):
+        aggregator = GameAggregator(min_elo)
+        for game in pgnfile:
+            aggregator.add_game(game)
+        self.__build_from(aggregator)
+
+    @classmethod
+    def from_aggregator(cls, aggregator):
+        '''Builds a graph from games already collected by a GameAggregator'''
+        graph = cls.__new__(cls)
+        graph.__build_from(aggregator)
+        return graph
+
+    @classmethod
+    def from_arrays(cls, fide_ids, names, titles, elo, edge_one, edge_two, games, min_elo=0):
+        '''
+        Builds a graph straight from per-player sequences, with one rating
+        per player, and a unique edge list indexing into them, e.g. for
+        synthetic graphs
+        '''
+        elo = np.asarray(elo, dtype=np.int64)
+        graph = cls.__new__(cls)
+        graph.__build(list(fide_ids), list(names), list(titles),
+                      (elo, np.ones_like(elo), elo, elo, elo),
+                      edge_one, edge_two, games, min_elo)
+        return graph
+
+    def __build_from(self, aggregator):
+        edge_one, edge_two, games = aggregator.edges
+        self.__build(aggregator.fide_ids, aggregator.names, aggregator.titles,
+                     (aggregator.elo_sum, aggregator.elo_count, aggregator.elo_min,
+                      aggregator.elo_max, aggregator.elo_last),
+                     edge_one, edge_two, games, aggregator.min_elo, aggregator.game_hashes)
 
         print('Loaded', self.number_of_nodes, 'players')
         print('Loaded', self.number_of_edges, 'games')
 
+    def __build(self, fide_ids, names, titles, ratings, edge_one, edge_two, games, min_elo,
+                game_hashes=None):
+        '''
+        Lays the graph out in FIDE id order.  ratings holds the elo sum,
+        count, min, max and last of every player, edge_one/edge_two index
+        into fide_ids and there must be at most one entry per pair of
+        players.
+        '''
+        number_of_nodes = len(fide_ids)
+        order = sorted(xrange(number_of_nodes), key=fide_ids.__getitem__)
+        rank = np.zeros(number_of_nodes, dtype=np.int64)
+        rank[order] = np.arange(number_of_nodes)
+
+        self.__fide_ids = tuple(fide_ids[i] for i in order)
+        self.__index = {fide_id: i for i, fide_id in enumerate(self.__fide_ids)}
+        self.__names = tuple(names[i] for i in order)
+        self.__title_names = tuple(sorted(set(titles)))
+        title_code = {title: code for code, title in enumerate(self.__title_names)}
+        self.__title_codes = np.array([title_code[titles[i]] for i in order], dtype=np.int8)
+        elo_sum, elo_count, elo_min, elo_max, elo_last = ratings
+        self.__elo_sum = np.asarray(elo_sum, dtype=np.int64)[order]
+        self.__elo_count = np.asarray(elo_count, dtype=np.int64)[order]
+        self.__elo_min = np.asarray(elo_min, dtype=np.int32)[order]
+        self.__elo_max = np.asarray(elo_max, dtype=np.int32)[order]
+        self.__elo_last = np.asarray(elo_last, dtype=np.int32)[order]
+        self.__elo = self.__elo_sum / self.__elo_count.astype(np.float64)
+        self.__labels = None
+        self.__communities = None
+        self.__min_elo = min_elo
+        if game_hashes is None:
+            game_hashes = ()
+        self.__game_hashes = np.asarray(game_hashes, dtype=np.uint64)
+
+        one = rank[np.asarray(edge_one, dtype=np.int64)]
+        two = rank[np.asarray(edge_two, dtype=np.int64)]
+        games = np.asarray(games, dtype=np.int32)
+        one, two = np.minimum(one, two), np.maximum(one, two)
+        edge_order = np.lexsort((two, one))
+        self.__edge_one = one[edge_order].astype(np.int32)
+        self.__edge_two = two[edge_order].astype(np.int32)
+        self.__edge_games = games[edge_order]
+
+        rows = np.concatenate([self.__edge_one, self.__edge_two])
+        cols = np.concatenate([self.__edge_two, self.__edge_one])
+        weights = np.concatenate([self.__edge_games, self.__edge_games])
+        csr_order = np.lexsort((cols, rows))
+        self.__indptr = np.zeros(number_of_nodes + 1, dtype=np.int64)
+        self.__indptr[1:] = np.cumsum(np.bincount(rows, minlength=number_of_nodes))
+        self.__indices = cols[csr_order]
+        self.__weights = weights[csr_order]
+
+        self.__sorted_players = None
+        self.__adjacency = None
+
     @property
     def number_of_edges(self):
-        return len(self.__edges)
+        return len(self.__edge_one)
 
     @property
     def number_of_nodes(self):
-        return len(self.__players)
+        return len(self.__fide_ids)
+
+    @property
+    def fide_ids(self):
+        '''Returns a tuple of FIDE ids in node index order'''
+        return self.__fide_ids
+
+    @property
+    def names(self):
+        '''Returns a tuple of player names in node index order'''
+        return self.__names
+
+    def node_index(self, player_id):
+        '''Returns the node index of a FIDE id, or None if it is not in the graph'''
+        return self.__index.get(player_id, None)
+
+    @property
+    def min_elo(self):
+        return self.__min_elo
+
+    @property
+    def elo(self):
+        '''Mean observed elo of each player, in node index order'''
+        return self.__elo
+
+    @property
+    def elo_sum(self):
+        '''Sum of every rating observed for each player'''
+        return self.__elo_sum
+
+    @property
+    def elo_count(self):
+        '''Number of ratings observed for each player'''
+        return self.__elo_count
+
+    @property
+    def elo_min(self):
+        '''Lowest rating observed for each player'''
+        return self.__elo_min
+
+    @property
+    def elo_max(self):
+        '''Highest rating observed for each player'''
+        return self.__elo_max
+
+    @property
+    def elo_last(self):
+        '''Rating of each player in the last game read'''
+        return self.__elo_last
+
+    @property
+    def game_hashes(self):
+        '''Sorted hashes of the games in the graph, for the games read with hash_games=True'''
+        return self.__game_hashes
+
+    @property
+    def title_codes(self):
+        '''Index into title_names for each player'''
+        return self.__title_codes
+
+    @property
+    def title_names(self):
+        return self.__title_names
+
+    @property
+    def indptr(self):
+        return self.__indptr
+
+    @property
+    def indices(self):
+        '''CSR neighbour indices; the neighbours of i are indices[indptr[i]:indptr[i+1]]'''
+        return self.__indices
+
+    @property
+    def weights(self):
+        '''Number of games played between each CSR neighbour pair'''
+        return self.__weights
+
+    @property
+    def edges(self):
+        '''Returns the unique edges as (player_one, player_two, games) arrays, player_one < player_two'''
+        return self.__edge_one, self.__edge_two, self.__edge_games
 
     @property
     def communities(self):
@@ -139,46 +507,186 @@ class ChessGraph(object):
     @communities.setter
     def communities(self, communities):
         '''Initialize player community assignments'''
-        if len(communities) != len(self.__players):
+        if len(communities) != self.number_of_nodes:
             raise GraphError()
-        for i, player_id in enumerate(sorted(self.__players.iterkeys())):
-            self.__players[player_id].community = communities[i]
+        self.__labels = np.asarray(communities)
         self.__communities = communities
+        if self.__sorted_players:
+            for player, community in zip(self.__sorted_players, self.__labels):
+                player.community = community
 
+    @property
+    def community_labels(self):
+        '''Community label of each player as an array, in node index order'''
+        return self.__labels
 
     @property
     def number_of_communities(self):
         if self.__communities is None:
             return 0
-        return len(np.unique(self.__communities))
-
+        return len(np.unique(self.__labels))
 
     @property
     def adjacency_matrix(self):
-        return self.__edges
+        '''Returns a dict of ChessGame to number of games played'''
+        if self.__adjacency is None:
+            fide_ids = self.__fide_ids
+            with _gc_paused():
+                self.__adjacency = {ChessGame(fide_ids[one], fide_ids[two]): games
+                                    for one, two, games in zip(self.__edge_one.tolist(),
+                                                               self.__edge_two.tolist(),
+                                                               self.__edge_games.tolist())}
+        return self.__adjacency
 
     @property
     def nodes(self):
         '''Returns a tuple of players ordered by FIDE id'''
         if not self.__sorted_players:
-            _, self.__sorted_players = zip(*sorted(self.__players.iteritems(),
-                                                 key=operator.itemgetter(0)))
+            players = []
+            with _gc_paused():
+                for i, fide_id in enumerate(self.__fide_ids):
+                    player = ChessPlayer(fide_id, self.__names[i],
+                                         self.__title_names[self.__title_codes[i]])
+                    player.elo = self.__elo[i]
+                    if self.__labels is not None:
+                        player.community = self.__labels[i]
+                    players.append(player)
+            self.__sorted_players = tuple(players)
         return self.__sorted_players
 
     def get_node(self, player_id):
-        return self.__players.get(player_id, None)
+        i = self.__index.get(player_id, None)
+        if i is None:
+            return None
+        return self.nodes[i]
+
+    def append(self, pgnfile):
+        '''
+        Adds the games in pgnfile (any iterable of PgnFile game dicts) to
+        the graph, updating the running elo of every player and the number
+        of games between each pair.  Games read with hash_games=True are
+        skipped if the graph already has them.  Existing community labels
+        are kept, with every new player in a community of its own, so they
+        can warm start CommunityDetector.run.  Returns the number of games
+        added.
+        '''
+        previous_labels = None
+        if self.__labels is not None:
+            previous_labels = dict(zip(self.__fide_ids, self.__labels.tolist()))
+
+        aggregator = GameAggregator.from_graph(self)
+        added = 0
+        for game in pgnfile:
+            if aggregator.add_game(game):
+                added += 1
+        self.__build_from(aggregator)
+
+        if previous_labels is not None:
+            next_label = max(previous_labels.values()) + 1 if previous_labels else 0
+            labels = []
+            for fide_id in self.__fide_ids:
+                label = previous_labels.get(fide_id)
+                if label is None:
+                    label = next_label
+                    next_label += 1
+                labels.append(label)
+            self.communities = labels
+        return added
+
+    def subgraph(self, keep_nodes=None, keep_edges=None):
+        '''
+        Returns a new graph of the players in the boolean mask keep_nodes and
+        the edges in the boolean mask keep_edges (indexed like edges) between
+        them.  Ratings, game hashes and community labels are carried over.
+        '''
+        if keep_nodes is None:
+            keep_nodes = np.ones(self.number_of_nodes, dtype=bool)
+        if keep_edges is None:
+            keep_edges = np.ones(self.number_of_edges, dtype=bool)
+        keep_nodes = np.asarray(keep_nodes, dtype=bool)
+        keep_edges = (np.asarray(keep_edges, dtype=bool) &
+                      keep_nodes[self.__edge_one] & keep_nodes[self.__edge_two])
+        kept = np.flatnonzero(keep_nodes)
+        new_index = np.cumsum(keep_nodes) - 1
+
+        graph = self.__class__.__new__(self.__class__)
+        graph.__build([self.__fide_ids[i] for i in kept],
+                      [self.__names[i] for i in kept],
+                      [self.__title_names[code] for code in self.__title_codes[kept]],
+                      (self.__elo_sum[kept], self.__elo_count[kept], self.__elo_min[kept],
+                       self.__elo_max[kept], self.__elo_last[kept]),
+                      new_index[self.__edge_one[keep_edges]],
+                      new_index[self.__edge_two[keep_edges]],
+                      self.__edge_games[keep_edges],
+                      self.__min_elo,
+                      self.__game_hashes)
+        if self.__labels is not None:
+            graph.communities = self.__labels[kept]
+        return graph
+
+    def save(self, npz_file, **extra_arrays):
+        '''
+        Writes the player table, weighted edge list, game hashes and
+        community labels (if any) to an .npz file (or open file), along
+        with any extra arrays
+        '''
+        if self.__labels is not None:
+            extra_arrays.setdefault('community_labels', self.__labels)
+        np.savez(npz_file,
+                 fide_ids=np.array(self.__fide_ids, dtype=str),
+                 names=np.array(self.__names, dtype=str),
+                 title_names=np.array(self.__title_names, dtype=str),
+                 title_codes=self.__title_codes,
+                 elo_sum=self.__elo_sum,
+                 elo_count=self.__elo_count,
+                 elo_min=self.__elo_min,
+                 elo_max=self.__elo_max,
+                 elo_last=self.__elo_last,
+                 edge_one=self.__edge_one,
+                 edge_two=self.__edge_two,
+                 edge_games=self.__edge_games,
+                 min_elo=self.__min_elo,
+                 game_hashes=self.__game_hashes,
+                 **extra_arrays)
+
+    @classmethod
+    def load(cls, npz_file):
+        '''Reads a graph written by save'''
+        with np.load(npz_file) as saved:
+            title_names = saved['title_names'].tolist()
+            elo_sum, elo_count = saved['elo_sum'], saved['elo_count']
+            if 'elo_min' in saved.files:
+                elo_min, elo_max, elo_last = saved['elo_min'], saved['elo_max'], saved['elo_last']
+            else:
+                #saved before the rating range was kept, so all we have is the mean
+                elo_min = elo_max = elo_last = np.round(
+                    elo_sum / np.maximum(elo_count, 1).astype(np.float64))
+            graph = cls.__new__(cls)
+            graph.__build(saved['fide_ids'].tolist(),
+                          saved['names'].tolist(),
+                          [title_names[code] for code in saved['title_codes']],
+                          (elo_sum, elo_count, elo_min, elo_max, elo_last),
+                          saved['edge_one'],
+                          saved['edge_two'],
+                          saved['edge_games'],
+                          int(saved['min_elo']),
+                          saved['game_hashes'] if 'game_hashes' in saved.files else None)
+            if 'community_labels' in saved.files:
+                graph.communities = saved['community_labels']
+        return graph
 
     def render_graph(self, max_edges=None, min_games=1):
         added_nodes = set()
         graph = nx.Graph()
-        for i, (edge, num) in enumerate(self.adjacency_matrix.iteritems()):
+        fide_ids = self.__fide_ids
+        for i, (one, two, num) in enumerate(zip(*self.edges)):
             if max_edges and i > max_edges:
                 break
             if num < min_games:
                 continue
-            graph.add_edge(edge.player_one, edge.player_two)
-            added_nodes.add(edge.player_one)
-            added_nodes.add(edge.player_two)
+            graph.add_edge(fide_ids[one], fide_ids[two])
+            added_nodes.add(fide_ids[one])
+            added_nodes.add(fide_ids[two])
 
         for node in self.nodes:
             if node.fide_id in added_nodes:
@@ -197,20 +705,21 @@ class ChessGraph(object):
     def render_community_graph(self, show_single_nodes=True):
         added_nodes = set()
         graph = nx.Graph()
-        for edge, _ in self.adjacency_matrix.iteritems():
-            player_one = self.__players[edge.player_one]
-            player_two = self.__players[edge.player_two]
+        fide_ids = self.__fide_ids
+        labels = self.__labels
+        edge_one, edge_two, _ = self.edges
+        for one, two in zip(edge_one, edge_two):
             added = False
             if show_single_nodes:
-                graph.add_node(edge.player_one)
-                graph.add_node(edge.player_two)
+                graph.add_node(fide_ids[one])
+                graph.add_node(fide_ids[two])
                 added = True
-            if player_one.community == player_two.community:
-                graph.add_edge(edge.player_one, edge.player_two)
+            if labels[one] == labels[two]:
+                graph.add_edge(fide_ids[one], fide_ids[two])
                 added = True
             if added:
-                added_nodes.add(edge.player_one)
-                added_nodes.add(edge.player_two)
+                added_nodes.add(fide_ids[one])
+                added_nodes.add(fide_ids[two])
 
         for node in self.nodes:
             if node.fide_id in added_nodes:
@@ -0,0 +1,109 @@
+'''
+On-disk cache of the ChessGraph built from a pgn file.
+'''
+from __future__ import print_function
+
+import hashlib
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from chess_social.graph import ChessGraph
+
+__all__ = ['GraphCache', 'save_graph']
+
+
+def file_digest(filename, block_size=16 * 1024 * 1024):
+    '''SHA-1 of the contents of a file'''
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as source:
+        for block in iter(lambda: source.read(block_size), ''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_graph(graph, filename, **extra_arrays):
+    '''
+    Writes graph to filename through a temporary file in the same
+    directory, so an interrupted write leaves the previous file intact
+    '''
+    directory = os.path.dirname(os.path.abspath(filename))
+    tmp_file = tempfile.NamedTemporaryFile(dir=directory, suffix='.tmp', delete=False)
+    try:
+        graph.save(tmp_file, **extra_arrays)
+        tmp_file.close()
+        os.rename(tmp_file.name, filename)
+    except BaseException:
+        tmp_file.close()
+        os.remove(tmp_file.name)
+        raise
+
+
+class GraphCache(object):
+    '''
+    Keeps one .npz file per (pgn file, min_elo) in cache_dir holding the
+    graph together with the size, modification time and SHA-1 of the pgn
+    file it came from.
+
+    A cached graph is used if the pgn file has the same size and mtime, or
+    the same size and contents if only the mtime changed; anything else
+    rebuilds the graph and replaces the cached copy, as does a cached file
+    that cannot be read, e.g. one written by an older version.
+    '''
+
+    def __init__(self, cache_dir):
+        self.__cache_dir = cache_dir
+
+    def path(self, pgn_filename, min_elo):
+        source = os.path.abspath(pgn_filename)
+        return os.path.join(self.__cache_dir, '{0}.{1}.elo{2}.npz'.format(
+            os.path.basename(source), hashlib.sha1(source).hexdigest()[:12], min_elo))
+
+    def load(self, pgn_filename, min_elo):
+        '''Returns the cached graph, or None if there is none or it is out of date'''
+        cache_filename = self.path(pgn_filename, min_elo)
+        if not os.path.exists(cache_filename):
+            return None
+        source = os.stat(pgn_filename)
+        try:
+            with np.load(cache_filename) as cached:
+                size = int(cached['source_size'])
+                mtime = float(cached['source_mtime'])
+                digest = str(cached['source_sha1'])
+            if size != source.st_size:
+                return None
+            if mtime != source.st_mtime and digest != file_digest(pgn_filename):
+                return None
+            graph = ChessGraph.load(cache_filename)
+        except (IOError, KeyError, ValueError, zipfile.BadZipfile) as error:
+            print('Ignoring unreadable cached graph {0}: {1}'.format(cache_filename, error))
+            return None
+        if mtime != source.st_mtime:
+            #same contents, so remember the new mtime for next time
+            self.save(graph, pgn_filename, digest=digest)
+        return graph
+
+    def save(self, graph, pgn_filename, digest=None):
+        '''Writes graph to the cache, keyed on the pgn file it was built from'''
+        if not os.path.isdir(self.__cache_dir):
+            os.makedirs(self.__cache_dir)
+        source = os.stat(pgn_filename)
+        if digest is None:
+            digest = file_digest(pgn_filename)
+        save_graph(graph, self.path(pgn_filename, graph.min_elo),
+                   source_size=source.st_size,
+                   source_mtime=source.st_mtime,
+                   source_sha1=digest)
+
+    def get(self, pgn_filename, min_elo, build):
+        '''Returns the cached graph, or calls build() and caches what it returns'''
+        graph = self.load(pgn_filename, min_elo)
+        if graph is not None:
+            print('Loaded cached graph of', graph.number_of_nodes, 'players and',
+                  graph.number_of_edges, 'games')
+            return graph
+        graph = build()
+        self.save(graph, pgn_filename)
+        return graph
@@ -0,0 +1,57 @@
+'''
+Builds a ChessGraph from a large pgn file using several processes.
+'''
+from __future__ import print_function
+
+import multiprocessing
+
+from chess_social.graph import ChessGraph, GameAggregator
+from chess_social.pgn_file import PgnFile
+
+__all__ = ['parallel_ingest',]
+
+
+def _aggregate_range(args):
+    filename, start, end, min_elo, use_mmap = args
+    aggregator = GameAggregator(min_elo)
+    with PgnFile(filename, fast=True, use_mmap=use_mmap, start=start, end=end) as pgnfile:
+        for game in pgnfile:
+            aggregator.add_game(game)
+    return aggregator
+
+
+def parallel_ingest(filename, min_elo=0, processes=None, parts=None, use_mmap=False):
+    '''
+    Splits the pgn file into parts byte ranges on game boundaries (by
+    default 4 per process), aggregates the players and games of each range
+    in a worker process and merges the results, in file order, into a
+    ChessGraph identical to ChessGraph(PgnFile(filename), min_elo).
+
+    filename may also be a directory or archive (see PgnFile); plain pgn
+    files are split into byte ranges and every .zip or .gz file is read
+    whole by a single worker.
+    '''
+    processes = processes or multiprocessing.cpu_count()
+    tasks = []
+    for source_file in PgnFile.source_files(filename):
+        if PgnFile.is_archive(source_file):
+            tasks.append((source_file, 0, None, min_elo, False))
+        else:
+            ranges = PgnFile.game_ranges(source_file, parts or 4 * processes)
+            tasks.extend((source_file, start, end, min_elo, use_mmap) for start, end in ranges)
+
+    aggregator = GameAggregator(min_elo)
+    if processes == 1:
+        for task in tasks:
+            aggregator.merge(_aggregate_range(task))
+    else:
+        pool = multiprocessing.Pool(processes=processes)
+        try:
+            #imap keeps file order, which decides each player's name and title
+            for partial in pool.imap(_aggregate_range, tasks):
+                aggregator.merge(partial)
+        finally:
+            pool.close()
+            pool.join()
+
+    return ChessGraph.from_aggregator(aggregator)
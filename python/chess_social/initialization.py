@@ -0,0 +1,185 @@
+'''
+Starting partitions for the community samplers.
+
+Starting every player in a community of its own makes the first sweeps the
+most expensive part of a run, as every conditional weighs up N communities.
+The initializers here cheaply find a partition with far fewer communities
+so the chain starts near where it is going and every early conditional
+costs O(degree + K):
+
+ * label_propagation: every player repeatedly takes the label most of its
+   games are played against (Raghavan, Albert and Kumara, 2007).
+ * modularity: greedy local moves that raise the modularity, the first
+   phase of the Louvain method (Blondel et al., 2008).
+ * spectral: k-means on the leading eigenvectors of the normalised
+   adjacency matrix of every connected component (Ng, Jordan and Weiss,
+   2002).
+
+Every initializer takes a ChessGraph, draws from numpy.random so a seeded
+run is reproducible, and returns one label per player in 0..K-1.
+'''
+from __future__ import division
+
+import math
+import warnings
+
+import numpy as np
+import numpy.random as npr
+import scipy.sparse as sparse
+from scipy.cluster.vq import kmeans2
+from scipy.sparse.linalg import eigsh
+
+from chess_social.components import component_labels
+
+__all__ = ['singletons', 'label_propagation', 'greedy_modularity', 'spectral',
+           'INITIALIZERS', 'initial_labels']
+
+
+def _compact(labels):
+    return np.unique(labels, return_inverse=True)[1].astype(np.int64)
+
+
+def singletons(graph):
+    '''Every player in a community of its own'''
+    return np.arange(graph.number_of_nodes, dtype=np.int64)
+
+
+def label_propagation(graph, sweeps=20):
+    '''
+    Asynchronous label propagation weighted by the number of games: players
+    are visited in a random order and take the label with the most games
+    against them, ties broken at random, until no label changes or after
+    sweeps sweeps
+    '''
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+    labels = singletons(graph)
+    for _ in xrange(sweeps):
+        changed = 0
+        for j in npr.permutation(graph.number_of_nodes).tolist():
+            start, stop = indptr[j], indptr[j+1]
+            if start == stop:
+                continue
+            neighbour_labels, inverse = np.unique(labels[indices[start:stop]],
+                                                  return_inverse=True)
+            games = np.bincount(inverse, weights=weights[start:stop])
+            best = np.flatnonzero(games == games.max())
+            #keep the current label if it is one of the best
+            if labels[j] in neighbour_labels[best]:
+                continue
+            labels[j] = neighbour_labels[best[npr.randint(len(best))]]
+            changed += 1
+        if not changed:
+            break
+    return _compact(labels)
+
+
+def greedy_modularity(graph, sweeps=20):
+    '''
+    Moves players, in a random order, to the neighbouring community that
+    raises the modularity of the game-weighted graph the most, until no
+    move raises it or after sweeps sweeps
+    '''
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+    degrees = np.bincount(np.repeat(np.arange(graph.number_of_nodes), np.diff(indptr)),
+                          weights=weights, minlength=graph.number_of_nodes)
+    total = degrees.sum()
+    labels = singletons(graph)
+    if total == 0:
+        return labels
+    #sum of the degrees of every community
+    community_degrees = degrees.copy()
+    for _ in xrange(sweeps):
+        moved = 0
+        for j in npr.permutation(graph.number_of_nodes).tolist():
+            start, stop = indptr[j], indptr[j+1]
+            if start == stop:
+                continue
+            current = labels[j]
+            community_degrees[current] -= degrees[j]
+            candidates, inverse = np.unique(labels[indices[start:stop]], return_inverse=True)
+            games = np.bincount(inverse, weights=weights[start:stop])
+            #gain of joining each candidate, up to terms that do not depend on it
+            gains = games - community_degrees[candidates] * degrees[j] / total
+            stay = -community_degrees[current] * degrees[j] / total
+            at = np.searchsorted(candidates, current)
+            if at < len(candidates) and candidates[at] == current:
+                stay = gains[at]
+            best = int(np.argmax(gains))
+            if gains[best] > stay + 1e-12:
+                current = candidates[best]
+                labels[j] = current
+                moved += 1
+            community_degrees[current] += degrees[j]
+        if not moved:
+            break
+    return _compact(labels)
+
+
+def _spectral_clusters(adjacency, communities, dimensions):
+    '''k-means labels of the players of a connected adjacency matrix'''
+    number_of_nodes = adjacency.shape[0]
+    dimensions = min(dimensions, communities, number_of_nodes - 2)
+    if communities == 1 or dimensions < 1:
+        return np.zeros(number_of_nodes, dtype=np.int64)
+
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    scale = 1.0 / np.sqrt(np.maximum(degrees, 1.0))
+    normalised = sparse.diags(scale, 0).dot(adjacency).dot(sparse.diags(scale, 0))
+    #a fixed start vector, so the embedding only depends on the graph
+    _, vectors = eigsh(normalised, k=dimensions, which='LA', v0=np.ones(number_of_nodes))
+
+    lengths = np.sqrt((vectors ** 2).sum(axis=1))
+    lengths[lengths == 0] = 1.0
+    points = vectors / lengths[:, np.newaxis]
+    centroids = points[npr.choice(number_of_nodes, communities, replace=False)]
+    with warnings.catch_warnings():
+        #clusters that end up empty are simply dropped
+        warnings.simplefilter('ignore', UserWarning)
+        _, labels = kmeans2(points, centroids, minit='matrix')
+    return labels
+
+
+def spectral(graph, communities=None, dimensions=32):
+    '''
+    Clusters the players into about communities communities, by default
+    the square root of the number of players, with k-means on the rows,
+    scaled to unit length, of the leading eigenvectors of D^-1/2 A D^-1/2;
+    at most dimensions eigenvectors are used.  Every connected component
+    is clustered on its own, into its share of communities by number of
+    players but at least one, so players who never met are never put
+    together and there are at least as many communities as components.
+    '''
+    number_of_nodes = graph.number_of_nodes
+    if communities is None:
+        communities = int(round(math.sqrt(number_of_nodes)))
+    communities = max(1, min(communities, number_of_nodes))
+
+    _, components = component_labels(graph.indptr, graph.indices)
+    shares = np.maximum(1, np.round(communities * np.bincount(components) / number_of_nodes))
+    adjacency = sparse.csr_matrix((graph.weights.astype(np.float64), graph.indices, graph.indptr),
+                                  shape=(number_of_nodes, number_of_nodes))
+
+    #components that are a single community keep their component label
+    labels = components.astype(np.int64)
+    next_label = len(shares)
+    for component in np.flatnonzero(shares > 1).tolist():
+        players = np.flatnonzero(components == component)
+        share = int(min(shares[component], len(players)))
+        labels[players] = next_label + _spectral_clusters(adjacency[players][:, players], share,
+                                                          dimensions)
+        next_label += share
+    return _compact(labels)
+
+
+INITIALIZERS = {'singletons': singletons,
+                'label_propagation': label_propagation,
+                'modularity': greedy_modularity,
+                'spectral': spectral}
+
+
+def initial_labels(graph, method='singletons'):
+    '''Returns the starting labels of the graph's players from the named initializer'''
+    if method not in INITIALIZERS:
+        raise ValueError('Unknown initializer {0}; expected one of {1}'.format(
+            method, ', '.join(sorted(INITIALIZERS))))
+    return INITIALIZERS[method](graph)
@@ -0,0 +1,376 @@
+'''
+Sparse Gibbs kernel for the community labels of a ChessGraph.
+
+The conditional probability of a player joining community k only depends on
+the size of k and on how many of the player's opponents are already in k, so
+both are kept as integer arrays and the full conditional is evaluated in
+closed form (in log space) from the player's neighbour list.
+'''
+from __future__ import division
+
+import math
+
+import numpy as np
+import numpy.random as npr
+from scipy.special import gammaln
+
+__all__ = ['LabelSampler',]
+
+
+def log_conditional(labels, sizes, high, neighbours, current, log_edge_ratio, log_gap_ratio,
+                    log_alpha):
+    '''
+    The unnormalised log probabilities of slots 0..high-1 and a new
+    community for a node in slot current with the given neighbours
+    '''
+    sizes = sizes[:high].astype(np.float64)
+    sizes[current] -= 1
+    edges = np.bincount(labels[neighbours], minlength=high)
+
+    log_probabilities = np.empty(high + 1)
+    with np.errstate(divide='ignore'):
+        log_probabilities[:high] = np.log(sizes)
+    log_probabilities[:high] += edges * log_edge_ratio + (sizes - edges) * log_gap_ratio
+    log_probabilities[high] = log_alpha
+    return log_probabilities
+
+
+def draw(log_probabilities, random_state=npr):
+    '''Draws an index with probability proportional to exp(log_probabilities)'''
+    probabilities = np.exp(log_probabilities - log_probabilities.max())
+    cumulative = np.cumsum(probabilities)
+    rnd_unif = random_state.uniform()
+    return int(np.searchsorted(cumulative, rnd_unif * cumulative[-1], side='right'))
+
+
+class LabelSampler(object):
+    '''
+    Holds the current community labels of every player together with the
+    community sizes, and resamples labels one player at a time.
+
+    Communities are stored as slots 0..K-1; a slot that empties is recycled
+    for the next new community.  The slots are compacted at the start of
+    every sweep so each conditional costs O(degree + K).
+
+    The sufficient statistics of the edge probabilities (edges inside
+    communities and pairs of players inside communities) are updated on
+    every move, so reading them costs O(1).
+
+    Besides single-site Gibbs updates the sampler has split-merge moves
+    (Jain and Neal, 2004), which split a community in two or merge two
+    communities in one Metropolis-Hastings step.
+    '''
+
+    def __init__(self, indptr, indices, start_labels):
+        self.__indptr = np.asarray(indptr)
+        self.__indices = np.asarray(indices)
+        self.__number_of_nodes = len(self.__indptr) - 1
+        if len(start_labels) != self.__number_of_nodes:
+            raise ValueError('Need one start label per node')
+        self.__number_of_edges = len(self.__indices) // 2
+        self.__labels = None
+        self.__sizes = None
+        self.__free = None
+        self.__high = 0
+        self.__edges_in = 0
+        self.__pairs_inside = 0
+        self.__number_of_communities = 0
+        self.relabel(start_labels)
+
+    @property
+    def labels(self):
+        return self.__labels.copy()
+
+    @property
+    def community_sizes(self):
+        return self.__sizes[:self.__high].copy()
+
+    @property
+    def number_of_communities(self):
+        return self.__number_of_communities
+
+    @property
+    def edges_in(self):
+        '''Number of edges between players in the same community'''
+        return self.__edges_in
+
+    @property
+    def edges_out(self):
+        return self.__number_of_edges - self.__edges_in
+
+    @property
+    def pairs_inside(self):
+        '''Number of pairs of players in the same community, with or without an edge'''
+        return self.__pairs_inside
+
+    def edge_count(self):
+        '''Returns (edges_in, node_pairs_in, edges_out, node_pairs_out)'''
+        number_of_nodes = self.__number_of_nodes
+        total_pairs = number_of_nodes * (number_of_nodes - 1) // 2
+        edges_out = self.edges_out
+        return (self.__edges_in, self.__pairs_inside - self.__edges_in,
+                edges_out, total_pairs - self.__pairs_inside - edges_out)
+
+    def relabel(self, labels):
+        '''Replaces every label at once, recounting sizes and edges in O(N + E)'''
+        if len(labels) != self.__number_of_nodes:
+            raise ValueError('Need one label per node')
+        self.__compact(np.asarray(labels))
+
+        sources = np.repeat(np.arange(self.__number_of_nodes), np.diff(self.__indptr))
+        self.__edges_in = int(np.count_nonzero(
+            self.__labels[sources] == self.__labels[self.__indices])) // 2
+        self.__pairs_inside = int(np.sum(self.__sizes * (self.__sizes - 1))) // 2
+        self.__number_of_communities = int(np.count_nonzero(self.__sizes))
+
+    def __compact(self, labels):
+        _, slots = np.unique(labels, return_inverse=True)
+        self.__labels = slots.astype(np.int64)
+        self.__sizes = np.bincount(self.__labels, minlength=self.__number_of_nodes)
+        self.__high = int(self.__labels.max()) + 1 if self.__number_of_nodes else 0
+        self.__free = []
+
+    def __new_slot(self):
+        if self.__free:
+            return self.__free.pop()
+        slot = self.__high
+        self.__high += 1
+        return slot
+
+    def conditional(self, j, p_in, p_out, alpha):
+        '''
+        Returns the unnormalised log probabilities of each slot for node j,
+        with the final entry being a brand new community.  Empty slots
+        have a log probability of -inf.
+        '''
+        # relative to every other node being 'OUT' of j's community
+        log_edge_ratio = math.log(p_in) - math.log(p_out)
+        log_gap_ratio = math.log(1 - p_in) - math.log(1 - p_out)
+
+        neighbours = self.__indices[self.__indptr[j]:self.__indptr[j+1]]
+        return log_conditional(self.__labels, self.__sizes, self.__high, neighbours,
+                               self.__labels[j], log_edge_ratio, log_gap_ratio, math.log(alpha))
+
+    def sample_node(self, j, p_in, p_out, alpha):
+        '''Draws a new label for node j from its full conditional'''
+        sample_index = draw(self.conditional(j, p_in, p_out, alpha))
+
+        current = self.__labels[j]
+        if sample_index >= self.__high:
+            if self.__sizes[current] == 1:
+                #already alone, so staying put is the same as a new community
+                return current
+            sample_index = self.__new_slot()
+        self.move(j, sample_index)
+        return sample_index
+
+    def move(self, j, new_label):
+        '''Moves node j into slot new_label, keeping sizes and edge counts in step'''
+        labels = self.__labels
+        current = labels[j]
+        if new_label == current:
+            return
+        neighbour_labels = labels[self.__indices[self.__indptr[j]:self.__indptr[j+1]]]
+        self.__edges_in += (int(np.count_nonzero(neighbour_labels == new_label)) -
+                            int(np.count_nonzero(neighbour_labels == current)))
+
+        sizes = self.__sizes
+        self.__pairs_inside += int(sizes[new_label]) - int(sizes[current] - 1)
+        sizes[current] -= 1
+        if sizes[current] == 0:
+            self.__free.append(current)
+            self.__number_of_communities -= 1
+        if sizes[new_label] == 0:
+            self.__number_of_communities += 1
+        sizes[new_label] += 1
+        labels[j] = new_label
+
+    def sweep(self, p_in, p_out, alpha):
+        '''Resamples every node's label in turn and returns the new labels'''
+        self.__compact(self.__labels)
+        for j in xrange(self.__number_of_nodes):
+            self.sample_node(j, p_in, p_out, alpha)
+        return self.labels
+
+    def best_label(self, j, p_in, p_out, alpha):
+        '''
+        Moves node j to the label with the highest conditional probability,
+        staying put on ties.  Returns True if node j moved.
+        '''
+        log_probabilities = self.conditional(j, p_in, p_out, alpha)
+        current = self.__labels[j]
+        best = int(np.argmax(log_probabilities))
+        if log_probabilities[best] <= log_probabilities[current]:
+            return False
+        if best >= self.__high:
+            if self.__sizes[current] == 1:
+                return False
+            best = self.__new_slot()
+        self.move(j, best)
+        return True
+
+    def greedy_sweep(self, p_in, p_out, alpha):
+        '''
+        Moves every node in turn to its most probable label, i.e. one sweep
+        of iterated conditional modes.  Returns the number of nodes moved.
+        '''
+        self.__compact(self.__labels)
+        moved = 0
+        for j in xrange(self.__number_of_nodes):
+            moved += self.best_label(j, p_in, p_out, alpha)
+        return moved
+
+    def greedy_merge(self, p_in, p_out, alpha):
+        '''
+        Merges pairs of communities joined by at least one edge wherever
+        that raises the posterior, best first and each community at most
+        once, so the gains of the merges add up.  Returns the number of
+        merges.
+        '''
+        labels = self.__labels
+        sources = np.repeat(np.arange(self.__number_of_nodes), np.diff(self.__indptr))
+        one, two = labels[sources], labels[self.__indices]
+        between = one < two
+        high = self.__high
+        keys, edges = np.unique(one[between] * high + two[between], return_counts=True)
+        if not len(keys):
+            return 0
+        one, two = keys // high, keys % high
+
+        log_edge_ratio = math.log(p_in) - math.log(p_out)
+        log_gap_ratio = math.log(1 - p_in) - math.log(1 - p_out)
+        sizes_one = self.__sizes[one].astype(np.float64)
+        sizes_two = self.__sizes[two].astype(np.float64)
+        #log posterior of the merge over the split, as in split_merge
+        gains = (gammaln(sizes_one + sizes_two) - gammaln(sizes_one) - gammaln(sizes_two) -
+                 math.log(alpha) + edges * log_edge_ratio +
+                 (sizes_one * sizes_two - edges) * log_gap_ratio)
+
+        #members of every community, which stay valid as each one changes at most once
+        order = np.argsort(labels, kind='mergesort')
+        starts = np.searchsorted(labels[order], np.arange(high + 1))
+
+        merged = set()
+        merges = 0
+        for k in np.argsort(-gains):
+            if gains[k] <= 0:
+                break
+            small, large = sorted((one[k], two[k]), key=lambda label: self.__sizes[label])
+            if small in merged or large in merged:
+                continue
+            merged.update((small, large))
+            for j in order[starts[small]:starts[small+1]]:
+                self.move(j, large)
+            merges += 1
+        return merges
+
+    def __restricted_scan(self, nodes, side, sizes, log_edge_ratio, log_gap_ratio,
+                          target=None):
+        '''
+        One restricted Gibbs scan of nodes between side 0 and side 1.  With
+        target set the nodes are moved to their target side instead of a
+        sampled one.  Returns the log probability of the moves made.
+        '''
+        log_probability = 0.0
+        indptr = self.__indptr
+        indices = self.__indices
+        for position, k in enumerate(nodes):
+            neighbour_sides = side[indices[indptr[k]:indptr[k+1]]]
+            current = side[k]
+            sizes[current] -= 1
+            log_odds = 0.0
+            for other, sign in ((0, -1.0), (1, 1.0)):
+                edges = int(np.count_nonzero(neighbour_sides == other))
+                log_odds += sign * (math.log(sizes[other]) + edges * log_edge_ratio +
+                                    (sizes[other] - edges) * log_gap_ratio)
+            #probability of side 1; log_odds = log p(1) - log p(0)
+            log_p_one = -math.log1p(math.exp(-log_odds)) if log_odds > -700 else log_odds
+            log_p_zero = -math.log1p(math.exp(log_odds)) if log_odds < 700 else -log_odds
+            if target is None:
+                new = 1 if npr.uniform() < math.exp(log_p_one) else 0
+            else:
+                new = target[position]
+            log_probability += log_p_one if new else log_p_zero
+            side[k] = new
+            sizes[new] += 1
+        return log_probability
+
+    def split_merge(self, p_in, p_out, alpha, scans=3, groups=None):
+        '''
+        Proposes splitting the community of two random players if they
+        share one, or merging their two communities otherwise, and accepts
+        with the Metropolis-Hastings probability.  Splits are proposed by
+        scans restricted Gibbs scans from a random split and then one more
+        scan whose probability is the proposal probability.  Costs
+        O(N + scans * the degrees of the players in the communities).
+        Returns True if the move was accepted.
+
+        If groups, one per player, are given the second player is drawn
+        from the group of the first, so communities that lie within groups
+        (e.g. connected components) stay within them.
+        '''
+        number_of_nodes = self.__number_of_nodes
+        if number_of_nodes < 2:
+            return False
+        if groups is None:
+            i, j = npr.choice(number_of_nodes, 2, replace=False)
+        else:
+            #the pair is as likely to be drawn for the split as for the merge
+            i = npr.randint(number_of_nodes)
+            same_group = np.flatnonzero(groups == groups[i])
+            if len(same_group) < 2:
+                return False
+            j = same_group[npr.randint(len(same_group) - 1)]
+            if j == i:
+                j = same_group[-1]
+        labels = self.__labels
+        label_i, label_j = labels[i], labels[j]
+        members = np.flatnonzero((labels == label_i) | (labels == label_j))
+        others = members[(members != i) & (members != j)]
+
+        log_edge_ratio = math.log(p_in) - math.log(p_out)
+        log_gap_ratio = math.log(1 - p_in) - math.log(1 - p_out)
+
+        #launch state: i on side 0, j on side 1 and the others at random
+        side = np.zeros(number_of_nodes, dtype=np.int8) - 1
+        side[i] = 0
+        side[j] = 1
+        side[others] = npr.randint(0, 2, size=len(others))
+        sizes = [1 + int(np.count_nonzero(side[others] == 0)),
+                 1 + int(np.count_nonzero(side[others] == 1))]
+        for _ in xrange(scans):
+            self.__restricted_scan(others, side, sizes, log_edge_ratio, log_gap_ratio)
+
+        if label_i == label_j:
+            log_proposal = self.__restricted_scan(others, side, sizes, log_edge_ratio,
+                                                  log_gap_ratio)
+        else:
+            target = (labels[others] == label_j).astype(np.int8)
+            log_proposal = self.__restricted_scan(others, side, sizes, log_edge_ratio,
+                                                  log_gap_ratio, target=target)
+
+        #log posterior of the split over the merge, for fixed p_in, p_out and alpha
+        side_zero = members[side[members] == 0]
+        neighbours = np.concatenate([self.__indices[self.__indptr[k]:self.__indptr[k+1]]
+                                     for k in side_zero])
+        edges_between = int(np.count_nonzero(side[neighbours] == 1))
+        log_split_ratio = (math.log(alpha) + math.lgamma(sizes[0]) + math.lgamma(sizes[1]) -
+                           math.lgamma(sizes[0] + sizes[1]) -
+                           edges_between * log_edge_ratio -
+                           (sizes[0] * sizes[1] - edges_between) * log_gap_ratio)
+
+        if label_i == label_j:
+            log_acceptance = log_split_ratio - log_proposal
+        else:
+            log_acceptance = log_proposal - log_split_ratio
+        if log_acceptance < 0 and math.log(1.0 - npr.uniform()) >= log_acceptance:
+            return False
+
+        if label_i == label_j:
+            new_label = self.__new_slot()
+            for k in side_zero:
+                self.move(k, new_label)
+        else:
+            for k in members[labels[members] == label_i]:
+                self.move(k, label_j)
+        return True
@@ -0,0 +1,218 @@
+'''
+A fast point estimate of the communities of a ChessGraph under the same
+stochastic block model and Chinese restaurant process prior as
+CommunityDetector.
+
+Instead of sampling, MapCommunityDetector climbs the joint posterior of the
+labels, p_in, p_out and alpha by iterated conditional modes: every player
+in turn moves to its most probable community, and p_in, p_out and alpha are
+set to their conditional modes, until nothing changes.  Every step can only
+raise the posterior, so the run stops at a local maximum, usually within a
+few tens of sweeps.  It gives no measure of uncertainty, but it is quick
+enough to try several min_elo thresholds interactively.
+'''
+from __future__ import division, print_function
+
+import math
+import time
+
+import numpy as np
+from scipy.optimize import minimize_scalar
+
+from chess_social.bayes_community_detection import (A_IN, B_IN, A_OUT, B_OUT, GAMMA_A, GAMMA_B,
+                                                    P_IN, P_OUT, ALPHA, INIT)
+from chess_social.initialization import initial_labels
+from chess_social.label_sampler import LabelSampler
+from chess_social.monitor import IterationMetrics, PHASES, print_progress
+
+__all__ = ['MapCommunityDetector',]
+
+
+def _beta_mode(successes, failures, a, b):
+    '''Mode of Beta(successes + a, failures + b)'''
+    return (successes + a - 1) / (successes + failures + a + b - 2)
+
+
+class MapCommunityDetector(object):
+    '''
+    Takes the same keyword arguments as CommunityDetector: the Beta priors
+    of p_in and p_out, the Gamma prior of alpha, their starting values and
+    the initializer of the starting labels.
+    alpha starts at 1 rather than 10, since from one community per player
+    a large alpha keeps every player on their own.
+    '''
+
+    def __init__(self, **kw_args):
+        self.__a_in = kw_args.get(A_IN, 2.0)
+        self.__b_in = kw_args.get(B_IN, 1.0)
+        self.__a_out = kw_args.get(A_OUT, 1.0)
+        self.__b_out = kw_args.get(B_OUT, 2.0)
+        self.__gamma_a = kw_args.get(GAMMA_A, 1.0)
+        self.__gamma_b = kw_args.get(GAMMA_B, 1.0)
+
+        self.__p_in_0 = kw_args.get(P_IN, 0.8)
+        self.__p_out_0 = kw_args.get(P_OUT, 0.2)
+        self.__alpha_0 = kw_args.get(ALPHA, 1.0)
+        self.__init = kw_args.get(INIT, 'singletons')
+
+        self.__p_in = None
+        self.__p_out = None
+        self.__alpha = None
+        self.__iterations = None
+        self.__log_posterior = None
+
+    @property
+    def p_in(self):
+        '''p_in at the end of the last run'''
+        return self.__p_in
+
+    @property
+    def p_out(self):
+        '''p_out at the end of the last run'''
+        return self.__p_out
+
+    @property
+    def alpha(self):
+        '''alpha at the end of the last run'''
+        return self.__alpha
+
+    @property
+    def iterations(self):
+        '''Number of sweeps the last run took'''
+        return self.__iterations
+
+    @property
+    def log_posterior(self):
+        '''Unnormalised log posterior after every sweep of the last run'''
+        return self.__log_posterior
+
+    def __update_p(self, edges_in, node_pairs_in, edges_out, node_pairs_out, p_in, p_out):
+        '''Returns the conditional modes of p_in and p_out, keeping p_in > p_out'''
+        p_in_mode = _beta_mode(edges_in, node_pairs_in, self.__a_in, self.__b_in)
+        if 0 < p_in_mode < 1 and p_in_mode > p_out:
+            p_in = p_in_mode
+        p_out_mode = _beta_mode(edges_out, node_pairs_out, self.__a_out, self.__b_out)
+        if 0 < p_out_mode < 1 and p_out_mode < p_in:
+            p_out = p_out_mode
+        return p_in, p_out
+
+    def __log_alpha_posterior(self, alpha, num_communities, num_players):
+        return ((self.__gamma_a + num_communities - 1) * math.log(alpha) -
+                self.__gamma_b * alpha + math.lgamma(alpha) - math.lgamma(alpha + num_players))
+
+    def __update_alpha(self, num_communities, num_players, alpha):
+        '''Returns the conditional mode of alpha, searched on a log scale'''
+        result = minimize_scalar(
+            lambda log_alpha: -self.__log_alpha_posterior(math.exp(log_alpha), num_communities,
+                                                          num_players),
+            bounds=(-20.0, 20.0), method='bounded')
+        new_alpha = math.exp(result.x)
+        #the bounded search is not exact, so never step downhill
+        if (self.__log_alpha_posterior(new_alpha, num_communities, num_players) >
+                self.__log_alpha_posterior(alpha, num_communities, num_players)):
+            return new_alpha
+        return alpha
+
+    def joint_log_posterior(self, sampler, p_in, p_out, alpha):
+        '''The unnormalised log posterior of the sampler's labels, p_in, p_out and alpha'''
+        edges_in, node_pairs_in, edges_out, node_pairs_out = sampler.edge_count()
+        sizes = sampler.community_sizes
+        sizes = sizes[sizes > 0]
+        number_of_nodes = int(sizes.sum())
+        log_crp = (len(sizes) * math.log(alpha) + sum(math.lgamma(size) for size in sizes) +
+                   math.lgamma(alpha) - math.lgamma(alpha + number_of_nodes))
+        return (log_crp +
+                (edges_in + self.__a_in - 1) * math.log(p_in) +
+                (node_pairs_in + self.__b_in - 1) * math.log(1 - p_in) +
+                (edges_out + self.__a_out - 1) * math.log(p_out) +
+                (node_pairs_out + self.__b_out - 1) * math.log(1 - p_out) +
+                (self.__gamma_a - 1) * math.log(alpha) - self.__gamma_b * alpha)
+
+    def run(self, graph, start_labels=None, iterations=100, warm_start=False, callbacks=None):
+        '''
+        Climbs to a local maximum of the posterior, for at most iterations
+        sweeps, and returns the labels, one per player, in the same format
+        as the partition picked by CommunityDetector.estimate_partitions.
+        Starting labels are chosen as in CommunityDetector.run, and every
+        callback is called with the chess_social.monitor.IterationMetrics
+        of each sweep.
+        '''
+        if start_labels is None and warm_start and graph.community_labels is not None:
+            start_labels = graph.community_labels
+            print('Warm starting from {0} communities'.format(graph.number_of_communities))
+        if start_labels is None:
+            start_labels = initial_labels(graph, self.__init)
+            print('Initializing labels with {0} different labels from {1}'.format(
+                len(np.unique(start_labels)), self.__init))
+
+        sampler = LabelSampler(graph.indptr, graph.indices, start_labels)
+        p_in, p_out, alpha = self.__p_in_0, self.__p_out_0, self.__alpha_0
+        log_posterior = []
+
+        if callbacks is None:
+            callbacks = [print_progress]
+
+        i = 0
+        moved = len(start_labels)
+        for i in xrange(1, iterations + 1):
+            #wall clock at the start of every phase and at the end of the iteration;
+            #the split-merge phase is the merge pass and there are no checkpoints
+            times = [time.time()]
+
+            edges_in, node_pairs_in, edges_out, node_pairs_out = sampler.edge_count()
+            times.append(time.time())
+
+            new_p_in, new_p_out = self.__update_p(edges_in, node_pairs_in, edges_out,
+                                                  node_pairs_out, p_in, p_out)
+            p_in_changed, p_out_changed = new_p_in != p_in, new_p_out != p_out
+            p_in, p_out = new_p_in, new_p_out
+            times.append(time.time())
+
+            #merge communities once no single player wants to move
+            merges = 0
+            if not moved:
+                merges = sampler.greedy_merge(p_in, p_out, alpha)
+            times.append(time.time())
+
+            moved = sampler.greedy_sweep(p_in, p_out, alpha)
+            times.append(time.time())
+
+            new_alpha = self.__update_alpha(sampler.number_of_communities, graph.number_of_nodes,
+                                            alpha)
+            alpha_changed = new_alpha != alpha
+            alpha = new_alpha
+            log_posterior.append(self.joint_log_posterior(sampler, p_in, p_out, alpha))
+            times.append(time.time())
+            times.append(times[-1])
+
+            if callbacks:
+                metrics = IterationMetrics(iteration=i,
+                                           iterations=iterations,
+                                           time=times[-1],
+                                           seconds=times[-1] - times[0],
+                                           phase_seconds={phase: end - start for phase, start, end
+                                                          in zip(PHASES, times, times[1:])},
+                                           number_of_communities=sampler.number_of_communities,
+                                           edges_in=sampler.edges_in,
+                                           edges_out=sampler.edges_out,
+                                           p_in=p_in,
+                                           p_out=p_out,
+                                           p_in_accepted=p_in_changed,
+                                           p_out_accepted=p_out_changed,
+                                           split_merge_accepted=merges,
+                                           alpha=alpha)
+                for callback in callbacks:
+                    callback(metrics)
+
+            if not (moved or merges or p_in_changed or p_out_changed or alpha_changed):
+                break
+
+        self.__p_in = p_in
+        self.__p_out = p_out
+        self.__alpha = alpha
+        self.__iterations = i
+        self.__log_posterior = np.array(log_posterior)
+
+        labels = sampler.labels
+        graph.communities = labels
+        return labels
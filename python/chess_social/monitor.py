@@ -0,0 +1,128 @@
+'''
+Per-iteration metrics of CommunityDetector.run and the callbacks that
+consume them.
+
+A callback is any callable taking an IterationMetrics; it is called at the
+end of every iteration.  For example:
+
+    with JsonLinesSink('metrics.jsonl') as metrics:
+        detector.run(graph, iterations=1000,
+                     callbacks=[print_progress, ThroughputSink(every=10), metrics])
+
+chess_social.map_community_detection.MapCommunityDetector reports the same
+IterationMetrics for every sweep, with some fields read differently:
+p_in_accepted and p_out_accepted say whether the mode changed,
+split_merge_accepted counts greedy merges and the split_merge phase is the
+merge pass, and the checkpoint phase is always zero.
+'''
+from __future__ import division, print_function
+
+import datetime
+import json
+import sys
+from collections import deque, namedtuple
+
+__all__ = ['IterationMetrics', 'PHASES', 'print_progress', 'JsonLinesSink', 'ThroughputSink']
+
+#the timed phases of every iteration, in order
+PHASES = ('edge_count', 'update_p', 'split_merge', 'sweep', 'update_alpha', 'checkpoint')
+
+IterationMetrics = namedtuple('IterationMetrics', [
+    'iteration',              # this iteration, 1..iterations
+    'iterations',             # total iterations of the run
+    'time',                   # time.time() at the end of the iteration
+    'seconds',                # wall time of the whole iteration
+    'phase_seconds',          # dict of PHASES to wall time
+    'number_of_communities',  # after the label sweep
+    'edges_in',               # edges inside communities, after the label sweep
+    'edges_out',
+    'p_in',
+    'p_out',
+    'p_in_accepted',          # whether the p_in proposal kept p_in > p_out
+    'p_out_accepted',         # whether the p_out proposal kept p_out < p_in
+    'split_merge_accepted',   # number of split-merge moves accepted
+    'alpha'])
+
+
+def print_progress(metrics):
+    '''The default callback: one progress line per iteration'''
+    print('{0}  Iteration: {1}; Number of Communities: {2}; Number of Edges In: {3}; '
+          'Number of Edges Out: {4}'.format(
+              datetime.datetime.fromtimestamp(metrics.time).strftime('%Y-%m-%d %H:%M:%S'),
+              metrics.iteration, metrics.number_of_communities, metrics.edges_in,
+              metrics.edges_out))
+
+
+class JsonLinesSink(object):
+    '''
+    Writes every IterationMetrics as one JSON object per line to a file name
+    or open file.  A file opened from a name is closed by close(), or on
+    leaving a with block.
+    '''
+
+    def __init__(self, output):
+        if isinstance(output, basestring):
+            self.__output = open(output, 'a')
+            self.__owned = True
+        else:
+            self.__output = output
+            self.__owned = False
+
+    def __call__(self, metrics):
+        self.__output.write(json.dumps(metrics._asdict()))
+        self.__output.write('\n')
+        self.__output.flush()
+
+    def close(self):
+        if self.__owned:
+            self.__output.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class ThroughputSink(object):
+    '''
+    Estimates iterations per second over the last window iterations and the
+    time left in the run, and prints them every every iterations to stream
+    (standard output by default).  The latest estimates are also kept in
+    rate and eta.
+    '''
+
+    def __init__(self, window=20, every=1, stream=None):
+        self.__times = deque(maxlen=window + 1)
+        self.__every = every
+        self.__stream = stream
+        self.__rate = None
+        self.__eta = None
+
+    @property
+    def rate(self):
+        '''Iterations per second, or None before the first iteration'''
+        return self.__rate
+
+    @property
+    def eta(self):
+        '''Seconds left in the run, or None before the first iteration'''
+        return self.__eta
+
+    def __call__(self, metrics):
+        if not self.__times:
+            #the start of the first iteration we hear about
+            self.__times.append((metrics.iteration - 1, metrics.time - metrics.seconds))
+        self.__times.append((metrics.iteration, metrics.time))
+        first_iteration, first_time = self.__times[0]
+        last_iteration, last_time = self.__times[-1]
+        elapsed = last_time - first_time
+        self.__rate = (last_iteration - first_iteration) / elapsed if elapsed > 0 else float('inf')
+        self.__eta = (metrics.iterations - metrics.iteration) / self.__rate
+
+        if metrics.iteration % self.__every == 0 or metrics.iteration == metrics.iterations:
+            print('Iteration {0}/{1}: {2:.3g} iterations/s; ETA {3}'.format(
+                metrics.iteration, metrics.iterations, self.__rate,
+                datetime.timedelta(seconds=int(round(self.__eta)))),
+                  file=self.__stream or sys.stdout)
@@ -0,0 +1,180 @@
+'''
+Label sweeps that use several cores within a single chain.
+
+The players are split into batches of players who never played each other,
+from a greedy colouring of the game graph, and every batch is resampled by
+a pool of worker processes over shared-memory label and community size
+arrays.  A player's conditional only reads the labels of its opponents, and
+those are never in the same batch, so the labels a worker sees are always
+current.  The community sizes are only brought up to date at the end of a
+batch, so players in a batch do not see each other's moves in them; this
+makes the sweep an approximation of a sequential Gibbs sweep whose
+staleness is bounded by max_batch players.  max_batch=1 gives an exact
+Gibbs sweep, in colour order.
+'''
+from __future__ import division
+
+import ctypes
+import math
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+
+import numpy as np
+import numpy.random as npr
+
+from chess_social.label_sampler import draw, log_conditional
+
+__all__ = ['color_batches', 'ParallelSweep']
+
+#arrays inherited by the worker processes when they are forked
+_SHARED = None
+
+
+def color_batches(indptr, indices, max_batch=1024):
+    '''
+    Greedily colours the graph, highest degree first, and returns the
+    players of every colour in batches of at most max_batch players
+    '''
+    number_of_nodes = len(indptr) - 1
+    degrees = np.diff(indptr)
+    colors = np.zeros(number_of_nodes, dtype=np.int64) - 1
+    for j in np.argsort(-degrees, kind='mergesort').tolist():
+        taken = set(colors[indices[indptr[j]:indptr[j+1]]].tolist())
+        color = 0
+        while color in taken:
+            color += 1
+        colors[j] = color
+
+    batches = []
+    order = np.argsort(colors, kind='mergesort')
+    for color_nodes in np.split(order, np.flatnonzero(np.diff(colors[order])) + 1):
+        for start in xrange(0, len(color_nodes), max_batch):
+            batches.append(color_nodes[start:start + max_batch])
+    return batches
+
+
+def _shared_int64(values):
+    shared = np.frombuffer(RawArray(ctypes.c_int64, len(values)), dtype=np.int64)
+    shared[:] = values
+    return shared
+
+
+def _sweep_chunk(args, shared=None):
+    '''
+    Resamples the players order[start:stop] against the shared arrays,
+    giving new communities the slots free[start:stop]
+    '''
+    seed, start, stop, high, log_edge_ratio, log_gap_ratio, log_alpha = args
+    random_state = npr.RandomState(seed)
+    indptr, indices, labels, sizes, order, free = shared or _SHARED
+    slot = start
+    for j in order[start:stop].tolist():
+        current = labels[j]
+        neighbours = indices[indptr[j]:indptr[j+1]]
+        sample_index = draw(log_conditional(labels, sizes, high, neighbours, current,
+                                            log_edge_ratio, log_gap_ratio, log_alpha),
+                            random_state)
+        if sample_index >= high:
+            if sizes[current] == 1:
+                #already alone, so staying put is the same as a new community
+                continue
+            sample_index = free[slot]
+            slot += 1
+        labels[j] = sample_index
+
+
+class ParallelSweep(object):
+    '''
+    Sweeps the labels of a LabelSampler with processes worker processes,
+    in batches from color_batches.  The batches, the shared arrays and the
+    pool are set up once and the arrays are refreshed in place for every
+    sweep; close() stops the pool.
+    '''
+
+    def __init__(self, indptr, indices, processes=None, max_batch=1024):
+        self.__indptr = np.asarray(indptr)
+        self.__indices = np.asarray(indices)
+        self.__processes = processes or multiprocessing.cpu_count()
+        self.__batches = color_batches(self.__indptr, self.__indices, max_batch)
+
+        number_of_nodes = len(self.__indptr) - 1
+        #room for every player in its own community besides the current ones
+        self.__labels = _shared_int64(np.zeros(number_of_nodes, dtype=np.int64))
+        self.__sizes = _shared_int64(np.zeros(2 * number_of_nodes, dtype=np.int64))
+        self.__order = _shared_int64(np.concatenate(self.__batches) if self.__batches else [])
+        self.__free = _shared_int64(np.zeros(number_of_nodes, dtype=np.int64))
+        self.__shared = (self.__indptr, self.__indices, self.__labels, self.__sizes,
+                         self.__order, self.__free)
+        self.__pool = None
+
+    @property
+    def batches(self):
+        return self.__batches
+
+    def __start_pool(self):
+        '''Forks the workers, which inherit the shared arrays'''
+        global _SHARED
+        _SHARED = self.__shared
+        try:
+            self.__pool = multiprocessing.Pool(processes=self.__processes)
+        finally:
+            _SHARED = None
+
+    def close(self):
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
+
+    def __call__(self, sampler, p_in, p_out, alpha):
+        '''Resamples every label of sampler once and returns the new labels'''
+        labels, sizes, free = self.__labels, self.__sizes, self.__free
+        labels[:] = sampler.labels
+        sizes[:] = np.bincount(labels, minlength=len(sizes))
+        high = int(labels.max()) + 1 if len(labels) else 0
+        #free slots, taken from the end: emptied slots are pushed on top so
+        #they are reused first, then the slots from high upwards in order
+        stack = np.empty(len(sizes), dtype=np.int64)
+        top = len(sizes) - high
+        stack[:top] = np.arange(len(sizes) - 1, high - 1, -1)
+
+        log_edge_ratio = math.log(p_in) - math.log(p_out)
+        log_gap_ratio = math.log(1 - p_in) - math.log(1 - p_out)
+        log_alpha = math.log(alpha)
+
+        if self.__processes > 1 and self.__pool is None:
+            self.__start_pool()
+        start = 0
+        for batch in self.__batches:
+            stop = start + len(batch)
+            old_labels = labels[batch]
+            offered = stack[top - len(batch):top][::-1].copy()
+            free[start:stop] = offered
+
+            bounds = np.linspace(start, stop, min(self.__processes, len(batch)) + 1)
+            bounds = bounds.astype(np.int64).tolist()
+            chunks = [(npr.randint(2**31), first, last, high, log_edge_ratio,
+                       log_gap_ratio, log_alpha) for first, last in zip(bounds, bounds[1:])]
+            if self.__pool is None:
+                for chunk in chunks:
+                    _sweep_chunk(chunk, self.__shared)
+            else:
+                self.__pool.map(_sweep_chunk, chunks)
+
+            new_labels = labels[batch]
+            np.subtract.at(sizes, old_labels, 1)
+            np.add.at(sizes, new_labels, 1)
+            high = max(high, int(new_labels.max()) + 1)
+
+            #put back the offered slots nobody took, then the emptied ones
+            unused = offered[sizes[offered] == 0][::-1]
+            emptied = np.unique(old_labels[sizes[old_labels] == 0])
+            top -= len(batch)
+            stack[top:top + len(unused)] = unused
+            top += len(unused)
+            stack[top:top + len(emptied)] = emptied
+            top += len(emptied)
+            start = stop
+
+        sampler.relabel(labels)
+        return sampler.labels
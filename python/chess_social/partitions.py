@@ -0,0 +1,53 @@
+'''
+Measures of agreement between two partitions of the same players.
+'''
+from __future__ import division
+
+import numpy as np
+
+__all__ = ['adjusted_rand_index', 'normalized_mutual_information']
+
+
+def __contingency(labels_one, labels_two):
+    _, one = np.unique(labels_one, return_inverse=True)
+    _, two = np.unique(labels_two, return_inverse=True)
+    if len(one) != len(two):
+        raise ValueError('Partitions must label the same players')
+    rows = one.max() + 1
+    columns = two.max() + 1
+    counts = np.bincount(one * columns + two, minlength=rows * columns)
+    return counts.reshape((rows, columns)).astype(np.double)
+
+
+def __pairs(counts):
+    return np.sum(counts * (counts - 1)) / 2
+
+
+def adjusted_rand_index(labels_one, labels_two):
+    '''Rand index of the two partitions, adjusted for chance (1 is identical)'''
+    table = __contingency(labels_one, labels_two)
+    total = __pairs(np.array([table.sum()]))
+    pairs_both = __pairs(table)
+    pairs_one = __pairs(table.sum(axis=1))
+    pairs_two = __pairs(table.sum(axis=0))
+    expected = pairs_one * pairs_two / total if total else 0.0
+    maximum = (pairs_one + pairs_two) / 2
+    if maximum == expected:
+        return 1.0
+    return (pairs_both - expected) / (maximum - expected)
+
+
+def normalized_mutual_information(labels_one, labels_two):
+    '''Mutual information of the two partitions over the geometric mean of their entropies'''
+    table = __contingency(labels_one, labels_two)
+    total = table.sum()
+    joint = table[table > 0] / total
+    marginal_one = table.sum(axis=1) / total
+    marginal_two = table.sum(axis=0) / total
+    entropy_one = -np.sum(marginal_one * np.log(marginal_one))
+    entropy_two = -np.sum(marginal_two * np.log(marginal_two))
+    if entropy_one == 0 or entropy_two == 0:
+        return 1.0 if entropy_one == entropy_two else 0.0
+    outer = np.outer(marginal_one, marginal_two)[table > 0]
+    mutual_information = np.sum(joint * np.log(joint / outer))
+    return mutual_information / np.sqrt(entropy_one * entropy_two)
@@ -3,7 +3,80 @@ Provides code for handling large pgn (portable game notation) files.
 '''
 from __future__ import print_function
 
+import gzip
+import hashlib
+import mmap
+import os
 import re
+import struct
+import zipfile
+
+PGN_EXTENSIONS = ('.pgn', '.zip', '.gz')
+
+
+def _pgn_sources(filename):
+    '''Opens the decompressed pgn files of filename one after the other'''
+    for source_file in PgnFile.source_files(filename):
+        if source_file.lower().endswith('.zip'):
+            with zipfile.ZipFile(source_file) as archive:
+                for member in archive.infolist():
+                    if not member.filename.lower().endswith('.pgn'):
+                        continue
+                    source = archive.open(member)
+                    try:
+                        yield source
+                    finally:
+                        source.close()
+        else:
+            if source_file.lower().endswith('.gz'):
+                source = gzip.open(source_file, 'rb')
+            else:
+                source = open(source_file, 'rb')
+            try:
+                yield source
+            finally:
+                source.close()
+
+
+class _PgnStream(object):
+    '''
+    Reads the pgn files inside a directory or archive as one file, with a
+    blank line between files so the last game of one file never runs into
+    the first game of the next
+    '''
+
+    SEPARATOR = '\n\n'
+
+    def __init__(self, filename):
+        self.__sources = _pgn_sources(filename)
+        self.__source = next(self.__sources, None)
+
+    def __next_source(self):
+        self.__source = next(self.__sources, None)
+
+    def read(self, size):
+        while self.__source is not None:
+            data = self.__source.read(size)
+            if data:
+                return data
+            self.__next_source()
+            return self.SEPARATOR
+        return ''
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        while self.__source is not None:
+            line = self.__source.readline()
+            if line:
+                return line
+            self.__next_source()
+            return '\n'
+        raise StopIteration
+
+    def close(self):
+        self.__sources.close()
 
 
 class PgnFile(object):
@@ -19,6 +92,23 @@ class PgnFile(object):
     with pgn.PgnFile('my_games.pgn') as pgnfile:
         for game in pgnfile:
             print(game['white'], 'vs.', game['black'])
+
+    With fast=True the file is read as bytes in large blocks (or memory
+    mapped with use_mmap=True), only the tag section of each game is
+    parsed, with one combined pattern, and the movetext is skipped by
+    jumping straight to the next [Event tag.  The games are the same.
+    A fast PgnFile can also be limited to the games starting in the byte
+    range [start, end) of the file, see PgnFile.game_ranges.
+
+    With hash_games=True every game also gets a 'hash' entry, a 64 bit
+    digest of its tag section that identifies the game however the file
+    it came in was put together (see ChessGraph.append).
+
+    filename can also be a .zip archive of pgn files, a gzipped pgn file
+    or a directory of pgn, .zip and .gz files, which are read in name
+    order.  The pgn files are decompressed as they are parsed, so nothing
+    is ever extracted to disk; byte ranges and use_mmap need a plain pgn
+    file.
     '''
 
     EVENT_PATTERN = re.compile(r'^\[Event .*')
@@ -34,20 +124,52 @@ class PgnFile(object):
     REQUIRED_KEYS = ('black', 'white', 'black_id', 'white_id',
                      'black_elo', 'white_elo')
 
-    def __init__(self, filename):
+    EVENT_TAG = '[Event '
+    HEADER_END_PATTERN = re.compile(r'\n[ \t\r]*\n')
+    TAG_PATTERN = re.compile(r'^[ \t]*\[(Black|White|BlackFideId|WhiteFideId|BlackElo|WhiteElo|'
+                             r'BlackTitle|WhiteTitle) "([^"]+)"\][ \t\r]*$', re.M)
+    TAG_FIELDS = {'Black': 'black',
+                  'White': 'white',
+                  'BlackFideId': 'black_id',
+                  'WhiteFideId': 'white_id',
+                  'BlackElo': 'black_elo',
+                  'WhiteElo': 'white_elo',
+                  'BlackTitle': 'black_title',
+                  'WhiteTitle': 'white_title'}
+
+    BLOCK_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, filename, fast=False, use_mmap=False, start=0, end=None,
+                 hash_games=False):
         self.__filename = filename
+        self.__fast = fast
+        self.__hash_games = hash_games
+        self.__use_mmap = use_mmap
+        self.__start = start
+        self.__end = end
         self.__pgn_file = None
-
-        # with open(self.__filename) as pgn_file:
-        #     pgn_data = pgn_file.read()
-        # self._pgn_lines = pgn_data.split('\n')
-        # del pgn_data
+        self.__mmap = None
+        self.__games = None
 
     def __enter__(self):
-        self.__pgn_file = open(self.__filename)
+        if os.path.isdir(self.__filename) or PgnFile.is_archive(self.__filename):
+            if self.__use_mmap or self.__start or self.__end is not None:
+                raise ValueError('{0} is not a plain pgn file'.format(self.__filename))
+            self.__pgn_file = _PgnStream(self.__filename)
+            if self.__fast:
+                self.__games = self.__scan_games()
+        elif self.__fast:
+            self.__pgn_file = open(self.__filename, 'rb')
+            if self.__use_mmap and os.fstat(self.__pgn_file.fileno()).st_size:
+                self.__mmap = mmap.mmap(self.__pgn_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__games = self.__scan_games()
+        else:
+            self.__pgn_file = open(self.__filename)
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        if self.__mmap is not None:
+            self.__mmap.close()
         self.__pgn_file.close()
         if exc_type is not None:
             return False
@@ -82,10 +204,135 @@ class PgnFile(object):
             game['white_title'] = 'None'
         return game
 
+    @staticmethod
+    def _game_hash(game_text):
+        '''64 bit digest of the tag lines of a game, ignoring surrounding whitespace'''
+        tags = [line.strip() for line in game_text if line.strip().startswith('[')]
+        return struct.unpack('<Q', hashlib.sha1('\n'.join(tags)).digest()[:8])[0]
+
+    @staticmethod
+    def _game_starts(data, start, end):
+        '''Offsets of the [Event tags at the start of a line in data[start:end]'''
+        position = data.find(PgnFile.EVENT_TAG, start, end)
+        while position >= 0:
+            line_start = data.rfind('\n', start, position) + 1
+            if line_start <= start or not data[line_start:position].strip():
+                yield position
+            position = data.find(PgnFile.EVENT_TAG, position + 1, end)
+
+    @staticmethod
+    def _headers(data, start, end):
+        '''The tag section of every game in data[start:end]'''
+        previous = None
+        for position in PgnFile._game_starts(data, start, end):
+            if previous is not None:
+                yield PgnFile._header(data, previous, position)
+            previous = position
+        if previous is not None:
+            yield PgnFile._header(data, previous, end)
+
+    @staticmethod
+    def _header(data, start, end):
+        header_end = PgnFile.HEADER_END_PATTERN.search(data, start, end)
+        return data[start:header_end.start() if header_end else end]
+
+    @staticmethod
+    def _next_game_start(pgn_file, offset):
+        '''Offset of the first [Event tag line after offset, or of the end of the file'''
+        marker = '\n' + PgnFile.EVENT_TAG
+        pgn_file.seek(offset)
+        data = ''
+        while True:
+            block = pgn_file.read(PgnFile.BLOCK_SIZE)
+            if not block:
+                return pgn_file.tell()
+            #keep the tail of the last block in case the marker straddles the two
+            data = data[-(len(marker) - 1):] + block
+            position = data.find(marker)
+            if position >= 0:
+                return pgn_file.tell() - len(data) + position + 1
+
+    @staticmethod
+    def is_archive(filename):
+        return filename.lower().endswith(('.zip', '.gz'))
+
+    @staticmethod
+    def source_files(filename):
+        '''The pgn, .zip and .gz files in a directory, in name order, or [filename]'''
+        if not os.path.isdir(filename):
+            return [filename]
+        return [os.path.join(filename, name) for name in sorted(os.listdir(filename))
+                if name.lower().endswith(PGN_EXTENSIONS) and
+                os.path.isfile(os.path.join(filename, name))]
+
+    @staticmethod
+    def game_ranges(filename, parts):
+        '''
+        Splits a pgn file into at most parts (start, end) byte ranges of
+        roughly equal size, each starting on an [Event tag line
+        '''
+        size = os.path.getsize(filename)
+        boundaries = [0]
+        with open(filename, 'rb') as pgn_file:
+            for part in xrange(1, parts):
+                offset = PgnFile._next_game_start(pgn_file,
+                                                  max(part * size // parts, boundaries[-1]))
+                if offset >= size:
+                    break
+                if offset > boundaries[-1]:
+                    boundaries.append(offset)
+        boundaries.append(size)
+        return zip(boundaries, boundaries[1:])
+
+    def __scan_headers(self):
+        end = self.__end
+        if self.__mmap is not None:
+            if end is None:
+                end = len(self.__mmap)
+            for header in PgnFile._headers(self.__mmap, self.__start, end):
+                yield header
+            return
+        if self.__start:
+            self.__pgn_file.seek(self.__start)
+        remaining = end - self.__start if end is not None else None
+        remainder = ''
+        while True:
+            size = self.BLOCK_SIZE if remaining is None else min(self.BLOCK_SIZE, remaining)
+            block = self.__pgn_file.read(size) if size else ''
+            if not block:
+                break
+            if remaining is not None:
+                remaining -= len(block)
+            data = remainder + block
+            #only parse up to the last game that might not be complete yet
+            last_game = data.rfind('\n' + PgnFile.EVENT_TAG)
+            if last_game <= 0:
+                remainder = data
+                continue
+            for header in PgnFile._headers(data, 0, last_game + 1):
+                yield header
+            remainder = data[last_game + 1:]
+        for header in PgnFile._headers(remainder, 0, len(remainder)):
+            yield header
+
+    def __scan_games(self):
+        for header in self.__scan_headers():
+            game = {}
+            for tag in PgnFile.TAG_PATTERN.finditer(header):
+                game.setdefault(PgnFile.TAG_FIELDS[tag.group(1)], tag.group(2))
+            game_text = header.splitlines()
+            game = self._verify_game(game, game_text)
+            if game and self.__hash_games:
+                game['hash'] = self._game_hash(game_text)
+            yield game
+
     def next(self):
         '''
         Implementation of iterator
         '''
+        if self.__games is not None:
+            return next(self.__games)
+
         in_game = False
         game = {}
         empty_line_count = 0
@@ -125,6 +372,8 @@ class PgnFile(object):
             raise StopIteration
 
         game = self._verify_game(game, game_text)
+        if game and self.__hash_games:
+            game['hash'] = self._game_hash(game_text)
 
         return game
 
@@ -0,0 +1,108 @@
+'''
+Reductions of a ChessGraph before community detection, so that runs with a
+low min_elo on the whole archive fit in memory and finish in reasonable
+time.  Every reduction returns a new graph and a PruneStep recording how
+many players and edges it removed; prune applies several in turn.
+'''
+from __future__ import print_function
+
+from collections import namedtuple
+
+import numpy as np
+
+__all__ = ['PruneStep', 'drop_light_edges', 'drop_low_degree', 'k_core', 'keep_most_active',
+           'prune', 'expand_labels']
+
+PruneStep = namedtuple('PruneStep', ['name', 'nodes_removed', 'edges_removed'])
+
+
+def _step(name, graph, pruned):
+    return pruned, PruneStep(name, graph.number_of_nodes - pruned.number_of_nodes,
+                             graph.number_of_edges - pruned.number_of_edges)
+
+
+def _degrees(graph):
+    return np.diff(graph.indptr)
+
+
+def drop_light_edges(graph, min_games):
+    '''Removes the edges with fewer than min_games games; players are kept'''
+    _, _, games = graph.edges
+    return _step('min_games_per_edge={0}'.format(min_games), graph,
+                 graph.subgraph(keep_edges=games >= min_games))
+
+
+def drop_low_degree(graph, min_degree):
+    '''Removes, once, the players with fewer than min_degree opponents'''
+    return _step('min_degree={0}'.format(min_degree), graph,
+                 graph.subgraph(keep_nodes=_degrees(graph) >= min_degree))
+
+
+def k_core(graph, k):
+    '''
+    Keeps the k-core: removes players with fewer than k opponents until
+    every player left has at least k
+    '''
+    edge_one, edge_two, _ = graph.edges
+    keep = np.ones(graph.number_of_nodes, dtype=bool)
+    while True:
+        kept_edges = keep[edge_one] & keep[edge_two]
+        degrees = (np.bincount(edge_one[kept_edges], minlength=graph.number_of_nodes) +
+                   np.bincount(edge_two[kept_edges], minlength=graph.number_of_nodes))
+        low = keep & (degrees < k)
+        if not np.any(low):
+            break
+        keep &= ~low
+    return _step('k_core={0}'.format(k), graph, graph.subgraph(keep_nodes=keep))
+
+
+def keep_most_active(graph, max_players):
+    '''Keeps the max_players players with the most games in the graph'''
+    games_played = np.bincount(np.repeat(np.arange(graph.number_of_nodes), _degrees(graph)),
+                               weights=graph.weights, minlength=graph.number_of_nodes)
+    keep = np.zeros(graph.number_of_nodes, dtype=bool)
+    #ties go to the lower FIDE id
+    keep[np.argsort(-games_played, kind='mergesort')[:max_players]] = True
+    return _step('max_players={0}'.format(max_players), graph, graph.subgraph(keep_nodes=keep))
+
+
+def prune(graph, min_games_per_edge=1, min_degree=0, k=0, max_players=None):
+    '''
+    Applies, in this order, whichever reductions are set: drop_light_edges,
+    keep_most_active, drop_low_degree and k_core, printing what each one
+    removed.  Returns the pruned graph and the list of PruneSteps.
+    '''
+    steps = []
+    if min_games_per_edge > 1:
+        graph, step = drop_light_edges(graph, min_games_per_edge)
+        steps.append(step)
+    if max_players is not None and max_players < graph.number_of_nodes:
+        graph, step = keep_most_active(graph, max_players)
+        steps.append(step)
+    if min_degree > 0:
+        graph, step = drop_low_degree(graph, min_degree)
+        steps.append(step)
+    if k > 0:
+        graph, step = k_core(graph, k)
+        steps.append(step)
+
+    for step in steps:
+        print('Pruning {0} removed {1} players and {2} edges'.format(
+            step.name, step.nodes_removed, step.edges_removed))
+    if steps:
+        print('Pruned graph has', graph.number_of_nodes, 'players and', graph.number_of_edges,
+              'edges')
+    return graph, steps
+
+
+def expand_labels(graph, pruned, labels):
+    '''
+    Maps the community labels of the players of pruned back onto graph,
+    with every player that was pruned away in a community of its own
+    '''
+    labels = np.asarray(labels)
+    next_label = int(labels.max()) + 1 if len(labels) else 0
+    expanded = np.arange(next_label, next_label + graph.number_of_nodes, dtype=np.int64)
+    indices = [graph.node_index(fide_id) for fide_id in pruned.fide_ids]
+    expanded[indices] = labels
+    return expanded
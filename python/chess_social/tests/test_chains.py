@@ -0,0 +1,43 @@
+from __future__ import print_function
+
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from chess_social.chains import run_chains, chain_diagnostics, pooled_partition
+from chess_social.tests.test_label_sampler import make_graph
+
+
+class ChainsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_run_chains(self):
+        graph = make_graph()
+
+        results = run_chains(graph, chains=3, iterations=30, seed=7, processes=2,
+                             trace_dir=self.tmp_dir)
+
+        self.assertEqual([7, 8, 9], [result.seed for result in results])
+        for result in results:
+            self.assertEqual((31, graph.number_of_nodes), result.trace.labels.shape)
+            self.assertEqual(31, len(result.p_in))
+
+        serial = run_chains(graph, chains=1, iterations=30, seed=7, processes=1)
+        self.assertTrue(np.array_equal(results[0].trace.labels, serial[0].trace.labels))
+        self.assertTrue(np.array_equal(results[0].alpha, serial[0].alpha))
+
+        diagnostics = chain_diagnostics(results, burnin=10)
+        self.assertEqual(set(['number_of_communities', 'p_in', 'p_out', 'alpha']),
+                         set(diagnostics['rhat']))
+        self.assertEqual(3, len(diagnostics['partitions']))
+        self.assertTrue(-1.0 <= diagnostics['ari'] <= 1.0)
+
+        partition = pooled_partition(results, burnin=10)
+        self.assertEqual(graph.number_of_nodes, len(partition))
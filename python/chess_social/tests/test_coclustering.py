@@ -0,0 +1,103 @@
+from __future__ import division, print_function
+
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import numpy.random as npr
+
+from chess_social.bayes_community_detection import CommunityDetector
+from chess_social.coclustering import CoClustering
+from chess_social.tests.test_label_sampler import make_graph
+from stats.checkpoint import Checkpoint
+
+
+def trace_probabilities(labels, one, two):
+    return (labels[:, one] == labels[:, two]).mean(axis=0)
+
+
+class CoClusteringTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_exact_counts(self):
+        graph = make_graph()
+        npr.seed(0)
+        counts = CoClustering(graph, burnin=5, reservoir=100)
+        labels = CommunityDetector().run(graph, iterations=40, callbacks=[], coclustering=counts)
+
+        self.assertTrue(counts.exact)
+        self.assertEqual(15, counts.number_of_pairs)
+        self.assertEqual(36, counts.samples)
+        one, two, probabilities = counts.probabilities()
+        self.assertTrue(np.allclose(trace_probabilities(labels[5:], one, two), probabilities))
+
+        #with every sample in the reservoir the pick agrees with the full trace
+        self.assertTrue(np.array_equal(np.arange(5, 41), counts.iterations))
+        index, expected = CommunityDetector.estimate_partitions(labels, burnin=5)
+        iteration, partition = counts.best_partition()
+        self.assertTrue(np.array_equal(labels[iteration], partition))
+        self.assertEqual(counts.score(expected), counts.score(partition))
+
+    def test_reservoir(self):
+        graph = make_graph()
+        counts = CoClustering(graph, reservoir=4)
+        for iteration in xrange(41):
+            counts.append(iteration, npr.randint(3, size=graph.number_of_nodes))
+        #every 16th sample once the stride has doubled four times
+        self.assertTrue(np.array_equal([0, 16, 32], counts.iterations))
+        self.assertEqual((3, graph.number_of_nodes), counts.partitions.shape)
+
+    def test_sampled_pairs(self):
+        graph = make_graph()
+        npr.seed(1)
+        counts = CoClustering(graph, exact_nodes=0, sampled_pairs=2)
+        labels = CommunityDetector().run(graph, iterations=20, callbacks=[], coclustering=counts)
+
+        self.assertFalse(counts.exact)
+        one, two, probabilities = counts.probabilities()
+        self.assertTrue(np.all(one < two))
+        edge_one, edge_two, _ = graph.edges
+        self.assertTrue(np.array_equal(edge_one, one[:len(edge_one)]))
+        self.assertTrue(np.array_equal(edge_two, two[:len(edge_two)]))
+        self.assertTrue(np.allclose(trace_probabilities(labels, one, two), probabilities))
+
+    def test_resume_from_checkpoint(self):
+        class Interrupted(Exception):
+            pass
+
+        class InterruptingCheckpoint(Checkpoint):
+            def save(self, **state):
+                Checkpoint.save(self, **state)
+                if state['iteration'] == 10:
+                    raise Interrupted()
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            graph = make_graph()
+            npr.seed(4)
+            expected = CoClustering(graph, burnin=3, reservoir=4)
+            CommunityDetector().run(graph, iterations=25, callbacks=[], coclustering=expected)
+
+            npr.seed(4)
+            with self.assertRaises(Interrupted):
+                CommunityDetector().run(graph, iterations=25, callbacks=[],
+                                        checkpoint=InterruptingCheckpoint(tmp_dir, 'run', every=5),
+                                        coclustering=CoClustering(graph, burnin=3, reservoir=4))
+
+            counts = CoClustering(graph, burnin=3, reservoir=4)
+            CommunityDetector().run(graph, iterations=25, callbacks=[],
+                                    checkpoint=Checkpoint(tmp_dir, 'run', every=5, resume=True),
+                                    coclustering=counts)
+
+            self.assertEqual(expected.samples, counts.samples)
+            self.assertTrue(np.array_equal(expected.probabilities()[2], counts.probabilities()[2]))
+            self.assertTrue(np.array_equal(expected.iterations, counts.iterations))
+            self.assertTrue(np.array_equal(expected.partitions, counts.partitions))
+        finally:
+            shutil.rmtree(tmp_dir)
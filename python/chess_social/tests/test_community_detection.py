@@ -1,8 +1,16 @@
-from __future__ import print_function
+from __future__ import division, print_function
 
+import shutil
+import tempfile
 import unittest
 
+import numpy as np
+import numpy.random as npr
+
 from chess_social.bayes_community_detection import *
+from chess_social.bayes_community_detection import MEMORY_BUDGET
+from chess_social.tests.test_label_sampler import make_graph
+from stats.checkpoint import Checkpoint
 
 class CommunityDetectorTest(unittest.TestCase):
 
@@ -22,3 +30,59 @@ class CommunityDetectorTest(unittest.TestCase):
 
         self.assertIsNotNone(detector)
         self.assertEquals(str(detector), '[INIT: 5.0, 6.0, 7.0, 8.0, 9.0, 10.0]')
+
+    def test_estimate_partitions(self):
+        def reference(labels, burnin):
+            iterations = labels.shape[0] - burnin
+            nodes = labels.shape[1]
+            posterior_risk = np.zeros(iterations)
+            for k, iteration in enumerate(labels[burnin:]):
+                for i in range(nodes):
+                    for j in range(i + 1, nodes):
+                        if iteration[i] == iteration[j]:
+                            emp_prob = np.sum(labels[burnin:, i] == labels[burnin:, j]) / iterations
+                            posterior_risk[k] += emp_prob - 0.5
+            return np.where(posterior_risk == np.amax(posterior_risk))[0][0] + burnin
+
+        npr.seed(3)
+        for _ in range(5):
+            labels = npr.randint(0, 4, size=(30, 12)).astype(np.uint8)
+            expected = reference(labels, 5)
+            for memory_budget in (64, 4096, MEMORY_BUDGET):
+                index, partition = CommunityDetector.estimate_partitions(
+                    labels, burnin=5, memory_budget=memory_budget)
+                self.assertEqual(expected, index)
+                self.assertTrue(np.array_equal(labels[expected], partition))
+
+    def test_resume_from_checkpoint(self):
+        class Interrupted(Exception):
+            pass
+
+        class InterruptingCheckpoint(Checkpoint):
+            def save(self, **state):
+                Checkpoint.save(self, **state)
+                if state['iteration'] == 10:
+                    raise Interrupted()
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            graph = make_graph()
+            npr.seed(4)
+            detector = CommunityDetector()
+            expected = detector.run(graph, iterations=25)
+
+            npr.seed(4)
+            with self.assertRaises(Interrupted):
+                CommunityDetector().run(graph, iterations=25,
+                                        checkpoint=InterruptingCheckpoint(tmp_dir, 'run', every=5))
+
+            npr.seed(99)
+            resumed = CommunityDetector()
+            labels = resumed.run(graph, iterations=25,
+                                 checkpoint=Checkpoint(tmp_dir, 'run', every=5, resume=True))
+
+            self.assertTrue(np.array_equal(expected, labels))
+            self.assertTrue(np.array_equal(detector.alpha, resumed.alpha))
+            self.assertTrue(np.array_equal(detector.p_in, resumed.p_in))
+        finally:
+            shutil.rmtree(tmp_dir)
@@ -0,0 +1,80 @@
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+import numpy.random as npr
+
+from chess_social.bayes_community_detection import CommunityDetector
+from chess_social.components import ComponentSweep, component_labels
+from chess_social.graph import ChessGraph
+from chess_social.label_sampler import LabelSampler
+from chess_social.tests.test_label_sampler import (assert_counts_in_step, assert_reproducible,
+                                                   make_game)
+
+
+def make_split_graph():
+    '''A triangle, a pair and a path of four players, with interleaved FIDE ids'''
+    games = [make_game('1', '4'), make_game('4', '7'), make_game('1', '7'),
+             make_game('2', '5'),
+             make_game('3', '6'), make_game('6', '8'), make_game('8', '9')]
+    return ChessGraph(games)
+
+
+class ComponentSweepTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_component_labels(self):
+        graph = make_split_graph()
+        number_of_components, components = component_labels(graph.indptr, graph.indices)
+        self.assertEqual(3, number_of_components)
+        self.assertEqual([0, 1, 2, 0, 1, 2, 0, 2, 2], components.tolist())
+
+        sweep = ComponentSweep(graph.indptr, graph.indices)
+        self.assertEqual([3, 2, 4], sweep.component_sizes.tolist())
+
+    def test_sweep_stays_within_components(self):
+        graph = make_split_graph()
+        _, components = component_labels(graph.indptr, graph.indices)
+        for processes in (1, 2):
+            npr.seed(6)
+            sampler = LabelSampler(graph.indptr, graph.indices, np.zeros(9, dtype=np.int64))
+            sweep = ComponentSweep(graph.indptr, graph.indices, processes=processes)
+            for i in range(10):
+                if i == 5:
+                    #labels changed behind the sweep's back are picked up
+                    sampler.move(0, 1)
+                labels = sweep(sampler, 0.8, 0.2, 1.0)
+                assert_counts_in_step(self, graph, sampler, labels)
+                for label in np.unique(labels):
+                    self.assertEqual(1, len(np.unique(components[labels == label])))
+
+    def test_detector(self):
+        samples = assert_reproducible(self, make_split_graph(), 8, components=True,
+                                      sweep_processes=2)
+        self.assertTrue(all(len(np.unique(labels)) >= 3 for labels in samples[1:]))
+
+    def test_split_merge_stays_within_components(self):
+        graph = make_split_graph()
+        sweep = ComponentSweep(graph.indptr, graph.indices)
+        npr.seed(3)
+        sampler = LabelSampler(graph.indptr, graph.indices, np.arange(9))
+        accepted = 0
+        for _ in range(500):
+            accepted += sampler.split_merge(0.8, 0.2, 1.0, groups=sweep.components)
+            labels = sampler.labels
+            for label in np.unique(labels):
+                self.assertEqual(1, len(np.unique(sweep.components[labels == label])))
+        self.assertTrue(accepted > 0)
+
+        npr.seed(9)
+        detector = CommunityDetector(components=True, split_merge=5)
+        samples = detector.run(graph, iterations=20, callbacks=[])
+        for labels in samples[1:]:
+            for label in np.unique(labels):
+                self.assertEqual(1, len(np.unique(sweep.components[labels == label])))
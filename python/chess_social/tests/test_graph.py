@@ -1,11 +1,16 @@
 from __future__ import print_function
 
+import os
+import shutil
+import tempfile
 import unittest
 from mock import MagicMock
 
 import numpy as np
 
 from chess_social.graph import ChessGame, ChessPlayer, ChessGraph, GraphError
+from chess_social.pgn_file import PgnFile
+from chess_social.tests.test_ingest import write_games
 
 class ChessGameTest(unittest.TestCase):
 
@@ -24,6 +29,9 @@ class ChessGameTest(unittest.TestCase):
         game_three = ChessGame(1235, 1234)
 
         self.assertEqual(game_one, game_three)
+        self.assertEqual(hash(game_one), hash(game_three))
+        self.assertEqual((1234, 1235), (game_three.player_one, game_three.player_two))
+        self.assertFalse(hasattr(game_three, '__dict__'))
 
         game_four = ChessGame(1234, 1236)
 
@@ -46,6 +54,8 @@ class ChessPlayerTest(unittest.TestCase):
         player_three = ChessPlayer(1234, 'test_name_two', 'NM')
 
         self.assertEqual(player_one, player_three)
+        self.assertEqual(hash(player_one), hash(player_three))
+        self.assertFalse(hasattr(player_three, '__dict__'))
 
         player_four = ChessPlayer(1235, 'test_name_one', 'GM')
 
@@ -110,4 +120,94 @@ class ChessGraphTest(unittest.TestCase):
         with self.assertRaises(GraphError) as _:
             graph.communities = bad_community_labels
 
-
+    def test_compact_layout(self):
+        games = [{'black_id': '30', 'black': 'player_c', 'black_elo': '2500',
+                  'black_title': 'IM', 'white_id': '10', 'white': 'player_a',
+                  'white_elo': '2600', 'white_title': 'GM'},
+                 {'black_id': '10', 'black': 'player_a', 'black_elo': '2700',
+                  'black_title': 'GM', 'white_id': '20', 'white': 'player_b',
+                  'white_elo': '2400', 'white_title': 'None'},
+                 {'black_id': '10', 'black': 'player_a', 'black_elo': '2650',
+                  'black_title': 'GM', 'white_id': '30', 'white': 'player_c',
+                  'white_elo': '2550', 'white_title': 'IM'}]
+
+        graph = ChessGraph(games)
+
+        self.assertEqual(('10', '20', '30'), graph.fide_ids)
+        self.assertEqual(2, graph.node_index('30'))
+        self.assertIsNone(graph.node_index('40'))
+        self.assertTrue(np.allclose([2650, 2400, 2525], graph.elo))
+        self.assertEqual([2600, 2400, 2500], list(graph.elo_min))
+        self.assertEqual([2700, 2400, 2550], list(graph.elo_max))
+        self.assertEqual([2650, 2400, 2550], list(graph.elo_last))
+        self.assertEqual(['GM', 'None', 'IM'],
+                         [graph.title_names[code] for code in graph.title_codes])
+
+        self.assertEqual([0, 2, 3, 4], list(graph.indptr))
+        self.assertEqual([1, 2, 0, 0], list(graph.indices))
+        self.assertEqual([1, 2, 1, 2], list(graph.weights))
+        self.assertEqual({ChessGame('10', '20'): 1, ChessGame('10', '30'): 2},
+                         graph.adjacency_matrix)
+
+        player = graph.get_node('30')
+        self.assertEqual(('30', 'player_c', 'IM', 2525), (player.fide_id, player.name,
+                                                         player.title, player.elo))
+        self.assertEqual(graph.nodes[2], player)
+
+        graph.communities = [5, 5, 6]
+        self.assertEqual(6, graph.get_node('30').community)
+        self.assertEqual([5, 5, 6], list(graph.community_labels))
+
+    def test_from_arrays(self):
+        graph = ChessGraph.from_arrays(['30', '10', '20'], ['c', 'a', 'b'], ['IM', 'GM', 'None'],
+                                       [2500, 2700, 2600], [0, 1], [1, 2], [3, 1])
+
+        self.assertEqual(('10', '20', '30'), graph.fide_ids)
+        self.assertEqual(('a', 'b', 'c'), graph.names)
+        self.assertEqual([2700, 2600, 2500], list(graph.elo))
+        self.assertEqual({ChessGame('10', '30'): 3, ChessGame('10', '20'): 1},
+                         graph.adjacency_matrix)
+
+    def test_append(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmp_dir, 'games.pgn')
+            write_games(filename, 300, 40)
+            with PgnFile(filename, fast=True, hash_games=True) as pgnfile:
+                games = list(pgnfile)
+            with PgnFile(filename, hash_games=True) as pgnfile:
+                self.assertEqual(games, list(pgnfile))
+            self.assertEqual(300, len(set(game['hash'] for game in games)))
+
+            expected = ChessGraph(games)
+            graph = ChessGraph(games[:30])
+            graph.communities = np.arange(graph.number_of_nodes) % 3
+            old_labels = dict(zip(graph.fide_ids, graph.community_labels))
+
+            #the second batch overlaps the first by 10 games
+            self.assertEqual(270, graph.append(games[20:]))
+
+            self.assertEqual(expected.fide_ids, graph.fide_ids)
+            self.assertEqual(expected.names, graph.names)
+            self.assertTrue(np.array_equal(expected.elo_sum, graph.elo_sum))
+            self.assertTrue(np.array_equal(expected.elo_count, graph.elo_count))
+            for expected_array, array in zip(expected.edges, graph.edges):
+                self.assertTrue(np.array_equal(expected_array, array))
+            self.assertTrue(np.array_equal(expected.game_hashes, graph.game_hashes))
+
+            new_labels = [label for fide_id, label in zip(graph.fide_ids, graph.community_labels)
+                          if fide_id not in old_labels]
+            self.assertTrue(new_labels)
+            self.assertEqual(range(3, 3 + len(new_labels)), new_labels)
+            for fide_id, label in zip(graph.fide_ids, graph.community_labels):
+                if fide_id in old_labels:
+                    self.assertEqual(old_labels[fide_id], label)
+
+            graph_file = os.path.join(tmp_dir, 'graph.npz')
+            graph.save(graph_file)
+            loaded = ChessGraph.load(graph_file)
+            self.assertTrue(np.array_equal(graph.game_hashes, loaded.game_hashes))
+            self.assertTrue(np.array_equal(graph.community_labels, loaded.community_labels))
+            self.assertEqual(0, loaded.append(games))
+        finally:
+            shutil.rmtree(tmp_dir)
@@ -0,0 +1,80 @@
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from chess_social.graph import ChessGraph
+from chess_social.graph_cache import GraphCache
+from chess_social.pgn_file import PgnFile
+from chess_social.tests.test_ingest import write_games
+
+
+class GraphCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'games.pgn')
+        write_games(self.filename, 50, 12)
+        self.builds = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def build(self, min_elo=0):
+        def build_graph():
+            self.builds += 1
+            with PgnFile(self.filename, fast=True) as pgnfile:
+                return ChessGraph(pgnfile, min_elo=min_elo)
+        return build_graph
+
+    def test_cache(self):
+        cache = GraphCache(os.path.join(self.tmp_dir, 'cache'))
+
+        graph = cache.get(self.filename, 0, self.build())
+        cached = cache.get(self.filename, 0, self.build())
+        self.assertEqual(1, self.builds)
+        self.assertEqual(graph.fide_ids, cached.fide_ids)
+        self.assertEqual([player.name for player in graph.nodes],
+                         [player.name for player in cached.nodes])
+        self.assertTrue(np.array_equal(graph.elo, cached.elo))
+        self.assertTrue(np.array_equal(graph.weights, cached.weights))
+        self.assertEqual(graph.adjacency_matrix, cached.adjacency_matrix)
+
+        cache.get(self.filename, 2500, self.build(2500))
+        self.assertEqual(2, self.builds)
+
+        #touching the file keeps the cache, changing it does not
+        os.utime(self.filename, (0, 0))
+        cache.get(self.filename, 0, self.build())
+        self.assertEqual(2, self.builds)
+        write_games(self.filename, 50, 12, seed=1)
+        os.utime(self.filename, (0, 0))
+        cache.get(self.filename, 0, self.build())
+        self.assertEqual(3, self.builds)
+
+    def test_old_and_unreadable_files(self):
+        cache = GraphCache(os.path.join(self.tmp_dir, 'cache'))
+        graph = cache.get(self.filename, 0, self.build())
+        cache_filename = cache.path(self.filename, 0)
+
+        #written before the rating range was saved
+        with np.load(cache_filename) as cached:
+            arrays = {key: cached[key] for key in cached.files
+                      if key not in ('elo_min', 'elo_max', 'elo_last')}
+        with open(cache_filename, 'wb') as cache_file:
+            np.savez(cache_file, **arrays)
+        cached = cache.get(self.filename, 0, self.build())
+        self.assertEqual(1, self.builds)
+        self.assertTrue(np.array_equal(graph.elo, cached.elo))
+        self.assertTrue(np.array_equal(np.round(graph.elo), cached.elo_min))
+
+        with open(cache_filename, 'wb') as cache_file:
+            cache_file.write('not a graph')
+        cache.get(self.filename, 0, self.build())
+        self.assertEqual(2, self.builds)
+        cache.get(self.filename, 0, self.build())
+        self.assertEqual(2, self.builds)
@@ -0,0 +1,99 @@
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import numpy as np
+import numpy.random as npr
+
+from chess_social.graph import ChessGraph
+from chess_social.ingest import parallel_ingest
+from chess_social.pgn_file import PgnFile
+
+GAME_TEMPLATE = '''[Event "Test {event}"]
+[White "{white_name}"]
+[Black "{black_name}"]
+[WhiteElo "{white_elo}"]
+[BlackElo "{black_elo}"]
+[WhiteFideId "{white}"]
+[BlackFideId "{black}"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 {{[Event "not a game"]}} 1/2-1/2
+
+'''
+
+
+def write_games(filename, number_of_games, number_of_players, seed=0):
+    npr.seed(seed)
+    with open(filename, 'w') as pgn_file:
+        for event in range(number_of_games):
+            white, black = npr.choice(number_of_players, 2, replace=False)
+            pgn_file.write(GAME_TEMPLATE.format(event=event,
+                                                white=1000 + white,
+                                                black=1000 + black,
+                                                white_name='player {0}.{1}'.format(white, event),
+                                                black_name='player {0}.{1}'.format(black, event),
+                                                white_elo=npr.randint(2200, 2800),
+                                                black_elo=npr.randint(2200, 2800)))
+
+
+class ParallelIngestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'games.pgn')
+        write_games(self.filename, 300, 40)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_game_ranges(self):
+        ranges = PgnFile.game_ranges(self.filename, 7)
+
+        self.assertEqual(7, len(ranges))
+        self.assertEqual(0, ranges[0][0])
+        self.assertEqual(os.path.getsize(self.filename), ranges[-1][1])
+        with open(self.filename) as pgn_file:
+            data = pgn_file.read()
+        for start, end in ranges:
+            self.assertTrue(data[start:].startswith('[Event "Test'))
+
+    def test_same_graph_as_serial(self):
+        with PgnFile(self.filename) as pgnfile:
+            expected = ChessGraph(pgnfile, min_elo=2300)
+
+        for processes, use_mmap in ((1, False), (3, True)):
+            graph = parallel_ingest(self.filename, min_elo=2300, processes=processes,
+                                    parts=7, use_mmap=use_mmap)
+
+            self.assertEqual(expected.fide_ids, graph.fide_ids)
+            self.assertEqual([player.name for player in expected.nodes],
+                             [player.name for player in graph.nodes])
+            self.assertTrue(np.array_equal(expected.elo, graph.elo))
+            self.assertTrue(np.array_equal(expected.elo_min, graph.elo_min))
+            self.assertTrue(np.array_equal(expected.elo_last, graph.elo_last))
+            for expected_array, array in zip(expected.edges, graph.edges):
+                self.assertTrue(np.array_equal(expected_array, array))
+
+    def test_archives(self):
+        source_dir = os.path.join(self.tmp_dir, 'twic')
+        os.mkdir(source_dir)
+        with open(self.filename) as pgn_file:
+            data = pgn_file.read()
+        middle = data.index('[Event "Test 150"]')
+        with zipfile.ZipFile(os.path.join(source_dir, 'a.zip'), 'w') as archive:
+            archive.writestr('a.pgn', data[:middle])
+        with open(os.path.join(source_dir, 'b.pgn'), 'w') as pgn_file:
+            pgn_file.write(data[middle:])
+
+        with PgnFile(self.filename) as pgnfile:
+            expected = ChessGraph(pgnfile, min_elo=2300)
+        graph = parallel_ingest(source_dir, min_elo=2300, processes=2, parts=3)
+
+        self.assertEqual(expected.fide_ids, graph.fide_ids)
+        self.assertTrue(np.array_equal(expected.elo, graph.elo))
+        for expected_array, array in zip(expected.edges, graph.edges):
+            self.assertTrue(np.array_equal(expected_array, array))
@@ -0,0 +1,73 @@
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+import numpy.random as npr
+
+from chess_social.bayes_community_detection import CommunityDetector
+from chess_social.components import component_labels
+from chess_social.initialization import INITIALIZERS, initial_labels
+from chess_social.map_community_detection import MapCommunityDetector
+from chess_social.tests.test_components import make_split_graph
+from chess_social.tests.test_map_community_detection import make_two_cliques
+
+
+def clique_sets(graph, labels):
+    communities = {}
+    for player, label in zip(graph.nodes, labels):
+        communities.setdefault(label, set()).add(int(player.fide_id))
+    return sorted(communities.values(), key=min)
+
+
+class InitializationTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_initializers(self):
+        graph = make_two_cliques()
+        cliques = [set(range(1, 6)), set(range(6, 11))]
+        for method in ('label_propagation', 'modularity'):
+            npr.seed(0)
+            labels = initial_labels(graph, method)
+            self.assertEqual(cliques, clique_sets(graph, labels))
+
+        npr.seed(0)
+        labels = INITIALIZERS['spectral'](graph, communities=2)
+        self.assertEqual(cliques, clique_sets(graph, labels))
+
+        for method in INITIALIZERS:
+            npr.seed(0)
+            labels = initial_labels(graph, method)
+            self.assertEqual(graph.number_of_nodes, len(labels))
+            self.assertTrue(np.array_equal(np.arange(labels.max() + 1), np.unique(labels)))
+        self.assertTrue(np.array_equal(np.arange(graph.number_of_nodes),
+                                       initial_labels(graph, 'singletons')))
+
+        self.assertRaises(ValueError, initial_labels, graph, 'no_such_initializer')
+
+    def test_spectral_components(self):
+        graph = make_split_graph()
+        _, components = component_labels(graph.indptr, graph.indices)
+        for communities in (1, 3, 6):
+            npr.seed(0)
+            labels = INITIALIZERS['spectral'](graph, communities=communities)
+            #never fewer communities than components, nor one across two
+            self.assertTrue(len(np.unique(labels)) >= 3)
+            for label in np.unique(labels):
+                self.assertEqual(1, len(np.unique(components[labels == label])))
+
+    def test_detectors(self):
+        graph = make_two_cliques()
+        npr.seed(0)
+        detector = CommunityDetector(init='modularity')
+        detector.run(graph, iterations=2, callbacks=[])
+        self.assertEqual(2, detector.number_of_communities[0])
+
+        labels = MapCommunityDetector(init='label_propagation').run(graph, iterations=50,
+                                                                     callbacks=[])
+        self.assertEqual(2, len(clique_sets(graph, labels)))
@@ -0,0 +1,211 @@
+from __future__ import print_function
+
+import itertools
+import math
+import unittest
+
+import numpy as np
+import numpy.random as npr
+
+from chess_social.bayes_community_detection import CommunityDetector
+from chess_social.graph import ChessGame, ChessGraph
+from chess_social.label_sampler import LabelSampler
+
+
+def make_game(black_id, white_id):
+    return {'black_id': black_id,
+            'black': 'player_' + black_id,
+            'black_elo': '2600',
+            'black_title': 'GM',
+            'white_id': white_id,
+            'white': 'player_' + white_id,
+            'white_elo': '2600',
+            'white_title': 'GM'}
+
+
+def make_graph():
+    games = [make_game('1', '2'), make_game('1', '3'), make_game('2', '3'),
+             make_game('3', '4'), make_game('4', '5'), make_game('5', '6'),
+             make_game('4', '6'), make_game('2', '3')]
+    return ChessGraph(games)
+
+
+def reference_conditional(graph, labels, j, p_in, p_out, alpha):
+    '''The label probabilities for node j, computed pair by pair'''
+    nodes = graph.nodes
+    others = [k for k in range(len(nodes)) if k != j]
+    candidates = sorted(set(labels[k] for k in others))
+    weights = []
+    for label in candidates + [None]:
+        if label is None:
+            weight = alpha
+        else:
+            weight = float(sum(1 for k in others if labels[k] == label))
+        for k in others:
+            p_ij = p_in if labels[k] == label else p_out
+            game = ChessGame(nodes[j].fide_id, nodes[k].fide_id)
+            if graph.adjacency_matrix.get(game, 0):
+                weight *= p_ij
+            else:
+                weight *= (1 - p_ij)
+        weights.append(weight)
+    weights = np.array(weights)
+    return candidates, weights / weights.sum()
+
+
+def canonical(labels):
+    '''The labels renumbered in order of first appearance, as a tuple'''
+    first = {}
+    return tuple(first.setdefault(label, len(first)) for label in labels)
+
+
+def set_partitions(number_of_nodes):
+    '''Every partition of number_of_nodes players, as canonical labels'''
+    partitions = set()
+    for labels in itertools.product(range(number_of_nodes), repeat=number_of_nodes):
+        partitions.add(canonical(labels))
+    return sorted(partitions)
+
+
+def exact_posterior(graph, p_in, p_out, alpha):
+    '''
+    The posterior probability of every partition of a small graph for
+    fixed p_in, p_out and alpha, keyed on canonical labels
+    '''
+    edge_one, edge_two, _ = graph.edges
+    played = set(zip(edge_one.tolist(), edge_two.tolist()))
+    log_posterior = {}
+    for labels in set_partitions(graph.number_of_nodes):
+        sizes = np.bincount(labels)
+        value = len(sizes) * math.log(alpha) + sum(math.lgamma(size) for size in sizes)
+        for one, two in itertools.combinations(range(graph.number_of_nodes), 2):
+            p_ij = p_in if labels[one] == labels[two] else p_out
+            value += math.log(p_ij if (one, two) in played else 1 - p_ij)
+        log_posterior[labels] = value
+    largest = max(log_posterior.values())
+    weights = {labels: math.exp(value - largest) for labels, value in log_posterior.iteritems()}
+    total = sum(weights.values())
+    return {labels: weight / total for labels, weight in weights.iteritems()}
+
+
+def total_variation(samples, posterior):
+    '''Total variation distance between the sampled and the exact partition frequencies'''
+    counts = {}
+    for labels in samples:
+        key = canonical(labels)
+        counts[key] = counts.get(key, 0) + 1
+    return 0.5 * sum(abs(counts.get(labels, 0) / float(len(samples)) - probability)
+                     for labels, probability in posterior.iteritems())
+
+
+def assert_counts_in_step(test, graph, sampler, labels=None):
+    '''Checks the sizes and edge counts of sampler against a recount of its labels'''
+    if labels is None:
+        labels = sampler.labels
+    test.assertTrue(np.array_equal(labels, sampler.labels))
+    edge_one, edge_two, _ = graph.edges
+    sizes = np.bincount(labels, minlength=len(sampler.community_sizes))
+    test.assertTrue(np.array_equal(sizes, sampler.community_sizes))
+    test.assertEqual(len(np.unique(labels)), sampler.number_of_communities)
+    test.assertEqual(np.count_nonzero(labels[edge_one] == labels[edge_two]), sampler.edges_in)
+    test.assertEqual(np.sum(sizes * (sizes - 1)) // 2, sampler.pairs_inside)
+
+
+def assert_reproducible(test, graph, seed, iterations=5, **detector_args):
+    '''Checks that two seeded CommunityDetector runs sample the same labels'''
+    samples = []
+    for _ in range(2):
+        npr.seed(seed)
+        samples.append(CommunityDetector(**detector_args).run(graph, iterations=iterations,
+                                                              callbacks=[]))
+    test.assertTrue(np.array_equal(samples[0], samples[1]))
+    return samples[0]
+
+
+class LabelSamplerTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_conditional_matches_pairwise_likelihood(self):
+        graph = make_graph()
+        labels = [0, 0, 1, 1, 2, 2]
+        sampler = LabelSampler(graph.indptr, graph.indices, labels)
+
+        for j in range(graph.number_of_nodes):
+            candidates, expected = reference_conditional(graph, labels, j, 0.7, 0.1, 2.0)
+            log_probabilities = sampler.conditional(j, 0.7, 0.1, 2.0)
+            probabilities = np.exp(log_probabilities - log_probabilities.max())
+            probabilities /= probabilities.sum()
+            # slots line up with the sorted start labels, empty slots have no mass
+            observed = [probabilities[c] for c in candidates] + [probabilities[-1]]
+            self.assertTrue(np.allclose(observed, expected))
+            self.assertAlmostEqual(sum(observed), 1.0)
+
+    def test_sweep_keeps_sizes_in_step(self):
+        npr.seed(1)
+        graph = make_graph()
+        sampler = LabelSampler(graph.indptr, graph.indices, range(graph.number_of_nodes))
+
+        for _ in range(20):
+            labels = sampler.sweep(0.8, 0.2, 1.0)
+            sizes = sampler.community_sizes
+            self.assertTrue(np.array_equal(np.bincount(labels, minlength=len(sizes)), sizes))
+            self.assertEqual(len(np.unique(labels)), sampler.number_of_communities)
+
+    def test_edge_count_tracks_moves(self):
+        npr.seed(2)
+        graph = make_graph()
+        sampler = LabelSampler(graph.indptr, graph.indices, [0, 0, 0, 1, 1, 2])
+        edge_one, edge_two, _ = graph.edges
+
+        for _ in range(20):
+            labels = sampler.sweep(0.6, 0.3, 3.0)
+            edges_in = np.count_nonzero(labels[edge_one] == labels[edge_two])
+            sizes = np.bincount(labels)
+            pairs_inside = np.sum(sizes * (sizes - 1)) // 2
+            expected = (edges_in, pairs_inside - edges_in,
+                        graph.number_of_edges - edges_in,
+                        15 - pairs_inside - (graph.number_of_edges - edges_in))
+            self.assertEqual(expected, sampler.edge_count())
+
+    def test_split_merge_keeps_counts_in_step(self):
+        npr.seed(4)
+        graph = make_graph()
+        sampler = LabelSampler(graph.indptr, graph.indices, [0, 0, 0, 0, 0, 0])
+
+        accepted = 0
+        for _ in range(200):
+            accepted += sampler.split_merge(0.8, 0.1, 1.0)
+            assert_counts_in_step(self, graph, sampler)
+        #both splits and merges were accepted along the way
+        self.assertTrue(0 < accepted < 200)
+
+    def test_split_merge_leaves_posterior_invariant(self):
+        npr.seed(11)
+        graph = make_graph()
+        posterior = exact_posterior(graph, 0.8, 0.1, 1.0)
+        self.assertEqual(203, len(posterior))
+        sampler = LabelSampler(graph.indptr, graph.indices, range(graph.number_of_nodes))
+
+        samples = []
+        for _ in range(40000):
+            sampler.split_merge(0.8, 0.1, 1.0)
+            samples.append(sampler.labels)
+        self.assertTrue(total_variation(samples, posterior) < 0.02)
+
+    def test_greedy_moves_keep_counts_in_step(self):
+        graph = make_graph()
+        sampler = LabelSampler(graph.indptr, graph.indices, range(graph.number_of_nodes))
+
+        for _ in range(3):
+            sampler.greedy_sweep(0.9, 0.1, 0.5)
+            sampler.greedy_merge(0.9, 0.1, 0.5)
+            assert_counts_in_step(self, graph, sampler)
+        #the triangle 1-2-3 and the triangle 4-5-6
+        self.assertEqual(2, sampler.number_of_communities)
+        self.assertEqual(0, sampler.greedy_sweep(0.9, 0.1, 0.5))
+        self.assertEqual(0, sampler.greedy_merge(0.9, 0.1, 0.5))
@@ -0,0 +1,58 @@
+from __future__ import print_function
+
+import itertools
+import unittest
+
+import numpy as np
+
+from chess_social.graph import ChessGraph
+from chess_social.map_community_detection import MapCommunityDetector
+from chess_social.tests.test_label_sampler import make_game
+
+
+def make_two_cliques():
+    '''Two cliques of five players joined by a single game'''
+    games = [make_game(str(one), str(two))
+             for clique in (range(1, 6), range(6, 11))
+             for one, two in itertools.combinations(clique, 2)]
+    games.append(make_game('5', '6'))
+    return ChessGraph(games)
+
+
+class MapCommunityDetectorTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_run(self):
+        graph = make_two_cliques()
+        detector = MapCommunityDetector()
+        labels = detector.run(graph, iterations=50, callbacks=[])
+
+        communities = {}
+        for player, label in zip(graph.nodes, labels):
+            communities.setdefault(label, set()).add(int(player.fide_id))
+        self.assertEqual([set(range(1, 6)), set(range(6, 11))],
+                         sorted(communities.values(), key=min))
+        self.assertTrue(np.array_equal(labels, graph.community_labels))
+
+        self.assertTrue(detector.iterations < 50)
+        self.assertTrue(detector.p_in > detector.p_out)
+        self.assertTrue(np.all(np.diff(detector.log_posterior) >= -1e-9))
+
+    def test_warm_start(self):
+        graph = make_two_cliques()
+        MapCommunityDetector().run(graph, iterations=50, callbacks=[])
+        expected = graph.community_labels
+
+        collected = []
+        detector = MapCommunityDetector()
+        labels = detector.run(graph, iterations=50, warm_start=True, callbacks=[collected.append])
+        self.assertTrue(np.array_equal(expected, labels))
+        #one sweep to fit the parameters and one to see that nothing changes
+        self.assertTrue(detector.iterations <= 3)
+        self.assertEqual(detector.iterations, len(collected))
+        self.assertEqual(2, collected[-1].number_of_communities)
@@ -0,0 +1,51 @@
+from __future__ import print_function
+
+import json
+import unittest
+from StringIO import StringIO
+
+import numpy.random as npr
+
+from chess_social.bayes_community_detection import CommunityDetector
+from chess_social.monitor import PHASES, JsonLinesSink, ThroughputSink
+from chess_social.tests.test_label_sampler import make_graph
+
+class MonitorTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_callbacks(self):
+        npr.seed(3)
+        graph = make_graph()
+        detector = CommunityDetector()
+        collected = []
+        json_lines = StringIO()
+        throughput_lines = StringIO()
+        throughput = ThroughputSink(window=3, every=2, stream=throughput_lines)
+
+        detector.run(graph, iterations=5,
+                     callbacks=[collected.append, JsonLinesSink(json_lines), throughput])
+
+        self.assertEqual(range(1, 6), [metrics.iteration for metrics in collected])
+        for metrics in collected:
+            self.assertEqual(5, metrics.iterations)
+            self.assertEqual(set(PHASES), set(metrics.phase_seconds))
+            self.assertTrue(metrics.seconds >= sum(metrics.phase_seconds.values()) - 1e-9)
+            self.assertEqual(graph.number_of_edges, metrics.edges_in + metrics.edges_out)
+        self.assertEqual(detector.number_of_communities[1:].tolist(),
+                         [metrics.number_of_communities for metrics in collected])
+        self.assertEqual(detector.alpha[1:].tolist(), [metrics.alpha for metrics in collected])
+        for i, metrics in enumerate(collected, 1):
+            self.assertEqual(metrics.p_in_accepted, detector.p_in[i] != detector.p_in[i-1])
+
+        records = [json.loads(line) for line in json_lines.getvalue().splitlines()]
+        self.assertEqual([metrics._asdict() for metrics in collected], records)
+
+        #printed at iterations 2, 4 and the last one
+        self.assertEqual(3, len(throughput_lines.getvalue().splitlines()))
+        self.assertTrue(throughput.rate > 0)
+        self.assertEqual(0, throughput.eta)
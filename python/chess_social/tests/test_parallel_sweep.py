@@ -0,0 +1,60 @@
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+import numpy.random as npr
+
+from chess_social.label_sampler import LabelSampler
+from chess_social.parallel_sweep import ParallelSweep, color_batches
+from chess_social.tests.test_label_sampler import (assert_counts_in_step, assert_reproducible,
+                                                   exact_posterior, make_graph,
+                                                   total_variation)
+
+class ParallelSweepTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_color_batches(self):
+        graph = make_graph()
+        edge_one, edge_two, _ = graph.edges
+        for max_batch in (1, 2, 100):
+            batches = color_batches(graph.indptr, graph.indices, max_batch)
+            self.assertEqual(range(graph.number_of_nodes),
+                             sorted(np.concatenate(batches).tolist()))
+            for batch in batches:
+                self.assertTrue(len(batch) <= max_batch)
+                inside = np.in1d(edge_one, batch) & np.in1d(edge_two, batch)
+                self.assertFalse(np.any(inside))
+        #the triangles need three colours
+        self.assertEqual(3, len(color_batches(graph.indptr, graph.indices)))
+
+    def test_sweep_keeps_counts_in_step(self):
+        graph = make_graph()
+        for processes in (1, 2):
+            npr.seed(5)
+            sampler = LabelSampler(graph.indptr, graph.indices, range(graph.number_of_nodes))
+            sweep = ParallelSweep(graph.indptr, graph.indices, processes=processes, max_batch=2)
+            try:
+                for _ in range(10):
+                    assert_counts_in_step(self, graph, sampler, sweep(sampler, 0.8, 0.2, 1.0))
+            finally:
+                sweep.close()
+
+    def test_single_player_batches_sample_the_posterior(self):
+        #with one player per batch every sweep is an exact Gibbs sweep
+        npr.seed(12)
+        graph = make_graph()
+        posterior = exact_posterior(graph, 0.8, 0.1, 1.0)
+        sampler = LabelSampler(graph.indptr, graph.indices, range(graph.number_of_nodes))
+        sweep = ParallelSweep(graph.indptr, graph.indices, processes=1, max_batch=1)
+        samples = [sweep(sampler, 0.8, 0.1, 1.0) for _ in range(8000)]
+        self.assertTrue(total_variation(samples, posterior) < 0.03)
+
+    def test_detector_is_reproducible(self):
+        #every chunk draws from its own seed, whichever worker runs it
+        assert_reproducible(self, make_graph(), 7, sweep_processes=2, sweep_batch=2)
@@ -0,0 +1,26 @@
+from __future__ import print_function
+
+import unittest
+
+from chess_social.partitions import adjusted_rand_index, normalized_mutual_information
+
+
+class PartitionAgreementTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_adjusted_rand_index(self):
+        self.assertAlmostEqual(1.0, adjusted_rand_index([0, 0, 1, 1, 2], [5, 5, 3, 3, 9]))
+        self.assertAlmostEqual(0.24242424, adjusted_rand_index([0, 0, 0, 1, 1, 1],
+                                                               [0, 0, 1, 1, 2, 2]))
+        self.assertAlmostEqual(1.0, adjusted_rand_index([0, 0, 0], [1, 1, 1]))
+
+    def test_normalized_mutual_information(self):
+        self.assertAlmostEqual(1.0, normalized_mutual_information([0, 0, 1, 1], [1, 1, 0, 0]))
+        self.assertAlmostEqual(0.0, normalized_mutual_information([0, 0, 1, 1], [0, 1, 0, 1]))
+        with self.assertRaises(ValueError):
+            normalized_mutual_information([0, 1], [0, 1, 2])
@@ -1,7 +1,12 @@
 
 from __future__ import print_function
 
+import gzip
+import os
+import shutil
+import tempfile
 import unittest
+import zipfile
 import mock
 from mock import MagicMock
 
@@ -108,13 +113,52 @@ Bxe3+ 22. Qxe3 Ndf8 23. Bd3 Ra7 24. Rf1 Rf7 25. Qh6 Kh8 26. Nd2 Rf4 27. Rg4 b5
 28. Ne4 Nd7 29. Rxg6 Rg8 30. Ng5 1-0
 '''
 
+EXPECTED_GAME_1 = {'black': "Giri,A",
+                   'black_id': '24116068',
+                   'black_elo': '2734',
+                   'black_title': 'GM',
+                   'white': "Dominguez Perez,L",
+                   'white_id': '3503240',
+                   'white_elo': '2754',
+                   'white_title': 'GM',}
+
+EXPECTED_GAME_2 = {'black': "Karjakin,Sergey",
+                   'black_id': '14109603',
+                   'black_elo': '2759',
+                   'black_title': 'GM',
+                   'white': "Van Wely,L",
+                   'white_id': '1000268',
+                   'white_elo': '2672',
+                   'white_title': 'GM',}
+
+EXPECTED_GAME_3 = {'black': "Aronian,L",
+                   'black_id': '13300474',
+                   'black_elo': '2812',
+                   'black_title': 'GM',
+                   'white': "Harikrishna,P",
+                   'white_id': '5007003',
+                   'white_elo': '2706',
+                   'white_title': 'GM',}
+
+EXPECTED_GAME_4 = {'black': "Gelfand,B",
+                   'black_id': '2805677',
+                   'black_elo': '2777',
+                   'black_title': 'GM',
+                   'white': "Caruana,F",
+                   'white_id': '2020009',
+                   'white_elo': '2782',
+                   'white_title': 'GM',}
+
+EXPECTED_GAMES = [EXPECTED_GAME_1, EXPECTED_GAME_2, EXPECTED_GAME_3, EXPECTED_GAME_4]
+
+
 class PgnFileTest(unittest.TestCase):
 
     def setUp(self):
-        pass
+        self.tmp_dir = tempfile.mkdtemp()
 
     def tearDown(self):
-        pass
+        shutil.rmtree(self.tmp_dir)
 
     @mock.patch('__builtin__.open')
     def test_parse_game(self, open_mock):
@@ -128,43 +172,51 @@ class PgnFileTest(unittest.TestCase):
             for game in pgnfile:
                 results.append(game)
 
-        expected_game_1 = {'black': "Giri,A",
-                           'black_id': '24116068',
-                           'black_elo': '2734',
-                           'black_title': 'GM',
-                           'white': "Dominguez Perez,L",
-                           'white_id': '3503240',
-                           'white_elo': '2754',
-                           'white_title': 'GM',}
-
-        expected_game_2 = {'black': "Karjakin,Sergey",
-                           'black_id': '14109603',
-                           'black_elo': '2759',
-                           'black_title': 'GM',
-                           'white': "Van Wely,L",
-                           'white_id': '1000268',
-                           'white_elo': '2672',
-                           'white_title': 'GM',}
-
-        expected_game_3 = {'black': "Aronian,L",
-                           'black_id': '13300474',
-                           'black_elo': '2812',
-                           'black_title': 'GM',
-                           'white': "Harikrishna,P",
-                           'white_id': '5007003',
-                           'white_elo': '2706',
-                           'white_title': 'GM',}
-
-        expected_game_4 = {'black': "Gelfand,B",
-                           'black_id': '2805677',
-                           'black_elo': '2777',
-                           'black_title': 'GM',
-                           'white': "Caruana,F",
-                           'white_id': '2020009',
-                           'white_elo': '2782',
-                           'white_title': 'GM',}
-
-        expected_results = [expected_game_1, expected_game_2, expected_game_3, expected_game_4]
-
-        self.assertEqual(expected_results, results)
-
+        self.assertEqual(EXPECTED_GAMES, results)
+
+    def test_fast_scan(self):
+        filename = os.path.join(self.tmp_dir, 'games.pgn')
+        with open(filename, 'w') as pgn_data:
+            pgn_data.write(TEST_PGN_DATA)
+
+        for use_mmap in (False, True):
+            with PgnFile(filename, fast=True, use_mmap=use_mmap) as pgnfile:
+                self.assertEqual(EXPECTED_GAMES, list(pgnfile))
+
+        #games split across block boundaries
+        with mock.patch.object(PgnFile, 'BLOCK_SIZE', 97):
+            with PgnFile(filename, fast=True) as pgnfile:
+                self.assertEqual(EXPECTED_GAMES, list(pgnfile))
+
+        with open(filename, 'w') as pgn_data:
+            pgn_data.write(TEST_PGN_DATA.replace('\n', '\r\n'))
+        with PgnFile(filename, fast=True) as pgnfile:
+            self.assertEqual(EXPECTED_GAMES, list(pgnfile))
+
+    def test_archives(self):
+        source_dir = os.path.join(self.tmp_dir, 'twic')
+        os.mkdir(source_dir)
+        with open(os.path.join(source_dir, 'a.pgn'), 'w') as pgn_data:
+            pgn_data.write(TEST_PGN_DATA)
+        zip_filename = os.path.join(source_dir, 'b.zip')
+        with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('b1.pgn', TEST_PGN_DATA)
+            archive.writestr('readme.txt', '[Event "not a game"]')
+            archive.writestr('b2.pgn', TEST_PGN_DATA)
+        gz_filename = os.path.join(source_dir, 'c.pgn.gz')
+        with gzip.open(gz_filename, 'wb') as pgn_data:
+            pgn_data.write(TEST_PGN_DATA)
+        with open(os.path.join(source_dir, 'notes.txt'), 'w') as notes:
+            notes.write(TEST_PGN_DATA)
+
+        for filename, copies in ((zip_filename, 2), (gz_filename, 1), (source_dir, 4)):
+            for fast in (False, True):
+                with PgnFile(filename, fast=fast) as pgnfile:
+                    self.assertEqual(EXPECTED_GAMES * copies, list(pgnfile))
+            with mock.patch.object(PgnFile, 'BLOCK_SIZE', 97):
+                with PgnFile(filename, fast=True) as pgnfile:
+                    self.assertEqual(EXPECTED_GAMES * copies, list(pgnfile))
+
+        with self.assertRaises(ValueError):
+            with PgnFile(zip_filename, fast=True, use_mmap=True) as pgnfile:
+                pass
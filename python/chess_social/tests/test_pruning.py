@@ -0,0 +1,71 @@
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+
+from chess_social.pruning import (PruneStep, drop_light_edges, drop_low_degree, expand_labels,
+                                  k_core, keep_most_active, prune)
+from chess_social.tests.test_label_sampler import make_game, make_graph
+
+class PruningTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_subgraph(self):
+        graph = make_graph()
+        graph.communities = [0, 0, 0, 1, 1, 1]
+        sub = graph.subgraph(keep_nodes=[True, True, True, False, True, True])
+
+        self.assertEqual(('1', '2', '3', '5', '6'), sub.fide_ids)
+        self.assertEqual([0, 0, 0, 1, 1], sub.community_labels.tolist())
+        self.assertEqual(3 + 1, sub.number_of_edges)
+        one, two, games = sub.edges
+        self.assertEqual([(0, 1), (0, 2), (1, 2), (3, 4)], zip(one.tolist(), two.tolist()))
+        self.assertEqual([1, 1, 2, 1], games.tolist())
+        self.assertTrue(np.array_equal(graph.elo_last[[0, 1, 2, 4, 5]], sub.elo_last))
+
+    def test_reductions(self):
+        graph = make_graph()
+
+        pruned, step = drop_light_edges(graph, 2)
+        self.assertEqual(PruneStep('min_games_per_edge=2', 0, 6), step)
+        self.assertEqual([(1, 2)], zip(*pruned.edges[:2]))
+
+        pruned, step = drop_low_degree(graph, 3)
+        self.assertEqual(('3', '4'), pruned.fide_ids)
+        self.assertEqual((4, 6), step[1:])
+
+        #a pendant player is peeled off, then its neighbour
+        games = [make_game('1', '2'), make_game('2', '3'), make_game('1', '3'),
+                 make_game('3', '4'), make_game('4', '5')]
+        pruned, step = k_core(make_graph().__class__(games), 2)
+        self.assertEqual(('1', '2', '3'), pruned.fide_ids)
+        self.assertEqual((2, 2), step[1:])
+
+        pruned, step = keep_most_active(graph, 2)
+        #players 2, 3 and 4 all played 3 games; ties go to the lower FIDE id
+        self.assertEqual(('2', '3'), pruned.fide_ids)
+        self.assertEqual(4, step.nodes_removed)
+
+    def test_prune(self):
+        graph = make_graph()
+        same, steps = prune(graph)
+        self.assertIs(graph, same)
+        self.assertEqual([], steps)
+
+        pruned, steps = prune(graph, min_degree=2, k=3)
+        self.assertEqual(['min_degree=2', 'k_core=3'], [step.name for step in steps])
+        self.assertEqual(0, pruned.number_of_nodes)
+
+        pruned, steps = prune(graph, max_players=5, k=2)
+        self.assertEqual(('1', '2', '3'), pruned.fide_ids)
+
+        labels = expand_labels(graph, pruned, [4, 4, 4])
+        self.assertEqual([4, 4, 4], labels[:3].tolist())
+        #the players pruned away are each on their own
+        self.assertEqual(4, len(np.unique(labels)))
@@ -0,0 +1,46 @@
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from chess_social.trace import LabelTrace
+
+
+class LabelTraceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_thinned_trace(self):
+        trace = LabelTrace(4, 10, thin=3)
+
+        for i in range(11):
+            trace.append(i, [i, i, 0, 1])
+
+        self.assertEqual(np.uint8, trace.labels.dtype)
+        self.assertEqual([0, 3, 6, 9], list(trace.iterations))
+        self.assertEqual([0, 3, 6, 9], list(trace.labels[:, 0]))
+        self.assertEqual(2, trace.burnin_rows(4))
+        self.assertEqual(4, trace.burnin_rows(100))
+
+    def test_memory_mapped_trace(self):
+        filename = os.path.join(self.tmp_dir, 'labels.npy')
+        trace = LabelTrace(300, 2, filename=filename)
+        for i in range(3):
+            trace.append(i, np.arange(300) % (i + 1))
+        trace.flush()
+
+        loaded = LabelTrace.load(filename)
+        self.assertEqual(np.uint16, loaded.labels.dtype)
+        self.assertEqual(3, len(loaded))
+        self.assertTrue(np.array_equal(trace.labels, loaded.labels))
+
+        with self.assertRaises(IndexError):
+            trace.append(3, np.zeros(300))
@@ -0,0 +1,115 @@
+from __future__ import print_function
+
+import BaseHTTPServer
+import os
+import shutil
+import SocketServer
+import tempfile
+import threading
+import time
+import unittest
+import urllib2
+import zipfile
+from StringIO import StringIO
+
+import mock
+
+from chess_social import twic
+from chess_social.twic import download_pgn
+
+PGN_ONE = '[Event "One"]\n\n1. e4 e5 1-0\n'
+PGN_TWO = '[Event "Two"]\n\n1. d4 d5 0-1\n'
+PGN_THREE = '[Event "Three"]\n\n1. c4 c5 1/2-1/2\n'
+
+
+def make_zip(members):
+    data = StringIO()
+    with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, contents in members:
+            archive.writestr(name, contents)
+    return data.getvalue()
+
+
+class FixtureHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    '''Serves FILES, failing the first FAILURES[path] requests for a path with a 503'''
+
+    FILES = {}
+    FAILURES = {}
+
+    def do_GET(self):
+        if self.FAILURES.get(self.path):
+            self.FAILURES[self.path] -= 1
+            self.send_error(503)
+            return
+        if self.path not in self.FILES:
+            self.send_error(404)
+            return
+        data = self.FILES[self.path]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/zip')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class DownloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        FixtureHandler.FILES = {'/twic1g.zip': make_zip([('twic1.pgn', PGN_ONE)]),
+                                '/twic2g.zip': make_zip([('twic2.pgn', PGN_TWO),
+                                                         ('readme.txt', 'not a game')]),
+                                '/twic3g.zip': make_zip([('twic3.pgn', PGN_THREE)])}
+        FixtureHandler.FAILURES = {'/twic2g.zip': 2}
+        self.server = FixtureServer(('127.0.0.1', 0), FixtureHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.base_url = 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_download(self):
+        urls = [self.base_url + path for path in ('/twic1g.zip', '/twic2g.zip', '/twic3g.zip')]
+        output = os.path.join(self.tmp_dir, 'twic.pgn')
+
+        self.assertEqual(3, download_pgn(urls, output, concurrency=2, retries=2, retry_wait=0))
+        with open(output) as pgn_file:
+            self.assertEqual('\n\n'.join([PGN_ONE, PGN_TWO, PGN_THREE, '']), pgn_file.read())
+        #only the output is left behind
+        self.assertEqual(['twic.pgn'], os.listdir(self.tmp_dir))
+
+        FixtureHandler.FAILURES = {'/twic2g.zip': 3}
+        with self.assertRaises(urllib2.HTTPError):
+            download_pgn(urls, output, concurrency=2, retries=2, retry_wait=0)
+
+        with self.assertRaises(urllib2.HTTPError):
+            download_pgn([self.base_url + '/missing.zip'], output, retries=2, retry_wait=0)
+        self.assertEqual(['twic.pgn'], os.listdir(self.tmp_dir))
+
+    def test_bounded_read_ahead(self):
+        urls = [self.base_url + path for path in ('/twic1g.zip', '/twic2g.zip', '/twic3g.zip')]
+        output = os.path.join(self.tmp_dir, 'twic.pgn')
+        FixtureHandler.FAILURES = {}
+        archives_on_disk = []
+
+        def slow_write(zip_filename, output_file):
+            #give the downloads time to run ahead of the writer if they can
+            time.sleep(0.2)
+            archives_on_disk.append(len(os.listdir(os.path.dirname(zip_filename))))
+            return write_pgn_members(zip_filename, output_file)
+
+        write_pgn_members = twic.write_pgn_members
+        with mock.patch.object(twic, 'write_pgn_members', slow_write):
+            self.assertEqual(3, download_pgn(urls, output, concurrency=1, retry_wait=0))
+        self.assertEqual([1, 1, 1], archives_on_disk)
@@ -0,0 +1,103 @@
+'''
+Storage for the community labels sampled by CommunityDetector.
+'''
+from __future__ import division
+
+import numpy as np
+
+__all__ = ['LabelTrace',]
+
+
+class LabelTrace(object):
+    '''
+    Preallocated iterations x players table of sampled labels.
+
+    Row 0 holds the starting labels and every thin-th iteration after that
+    gets its own row.  Labels are community slots (always smaller than the
+    number of players) so they are stored in the smallest unsigned integer
+    type that fits.  If a filename is given the table is a memory-mapped
+    .npy file that can be reopened with LabelTrace.load; mode='r+' reopens
+    an existing file of the same shape to carry on filling it.
+    '''
+
+    def __init__(self, number_of_nodes, iterations, thin=1, filename=None, dtype=None,
+                 mode='w+'):
+        if thin < 1:
+            raise ValueError('thin must be at least 1')
+        if dtype is None:
+            dtype = np.min_scalar_type(max(number_of_nodes - 1, 0))
+        shape = (iterations // thin + 1, number_of_nodes)
+        if filename:
+            if mode == 'r+':
+                self.__labels = np.lib.format.open_memmap(filename, mode='r+')
+                if self.__labels.shape != shape:
+                    raise ValueError('Label trace {0} has shape {1}, expected {2}'.format(
+                        filename, self.__labels.shape, shape))
+            else:
+                self.__labels = np.lib.format.open_memmap(filename, mode='w+',
+                                                          dtype=dtype, shape=shape)
+        else:
+            self.__labels = np.empty(shape, dtype=dtype)
+        self.__thin = thin
+        self.__filename = filename
+        self.__rows = 0
+
+    @classmethod
+    def load(cls, filename, thin=1):
+        '''Opens a saved trace read-only; every row in the file is treated as filled'''
+        trace = cls.__new__(cls)
+        trace.__labels = np.load(filename, mmap_mode='r')
+        trace.__thin = thin
+        trace.__filename = filename
+        trace.__rows = trace.__labels.shape[0]
+        return trace
+
+    @property
+    def thin(self):
+        return self.__thin
+
+    @property
+    def filename(self):
+        return self.__filename
+
+    @property
+    def labels(self):
+        '''The filled rows of the trace, without copying'''
+        return self.__labels[:self.__rows]
+
+    @property
+    def iterations(self):
+        '''The iteration number of each filled row'''
+        return np.arange(self.__rows) * self.__thin
+
+    def __len__(self):
+        return self.__rows
+
+    def burnin_rows(self, burnin):
+        '''Number of filled rows sampled before iteration burnin'''
+        return min(-(-burnin // self.__thin), self.__rows)
+
+    def append(self, iteration, labels):
+        '''Saves labels if iteration falls on the thinning interval'''
+        if iteration % self.__thin:
+            return False
+        if self.__rows == self.__labels.shape[0]:
+            raise IndexError('Label trace is full')
+        self.__labels[self.__rows] = labels
+        self.__rows += 1
+        return True
+
+    def rewind(self, rows, labels=None):
+        '''
+        Marks only the first rows as filled, e.g. when resuming from a
+        checkpoint, optionally overwriting them with labels
+        '''
+        if rows > self.__labels.shape[0]:
+            raise IndexError('Label trace only has {0} rows'.format(self.__labels.shape[0]))
+        if labels is not None:
+            self.__labels[:rows] = labels
+        self.__rows = rows
+
+    def flush(self):
+        if isinstance(self.__labels, np.memmap):
+            self.__labels.flush()
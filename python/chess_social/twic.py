@@ -0,0 +1,105 @@
+'''
+Downloads the zipped pgn archives of The Week in Chess (TWIC).
+'''
+from __future__ import print_function
+
+import collections
+import httplib
+import os
+import shutil
+import socket
+import tempfile
+import time
+import urllib2
+import zipfile
+from multiprocessing.pool import ThreadPool
+
+__all__ = ['fetch', 'write_pgn_members', 'download_pgn']
+
+BLOCK_SIZE = 1024 * 1024
+
+
+def fetch(url, directory, retries=3, retry_wait=1.0, timeout=60):
+    '''
+    Downloads url into a new file in directory and returns its name.
+    Connection errors, server errors and truncated downloads are retried
+    up to retries times, waiting retry_wait seconds and doubling the wait
+    each time; client errors such as 404 are not retried.
+    '''
+    for attempt in xrange(retries + 1):
+        download = tempfile.NamedTemporaryFile(dir=directory, suffix='.zip', delete=False)
+        try:
+            response = urllib2.urlopen(url, timeout=timeout)
+            try:
+                shutil.copyfileobj(response, download, BLOCK_SIZE)
+                expected_size = response.info().getheader('Content-Length')
+            finally:
+                response.close()
+            download.close()
+            if expected_size is not None and os.path.getsize(download.name) != int(expected_size):
+                raise IOError('Expected {0} bytes, got {1}'.format(
+                    expected_size, os.path.getsize(download.name)))
+            return download.name
+        except (urllib2.URLError, httplib.HTTPException, socket.error, IOError) as error:
+            download.close()
+            os.remove(download.name)
+            if isinstance(error, urllib2.HTTPError) and error.code < 500:
+                raise
+            if attempt == retries:
+                raise
+            print('Failed to fetch {0} ({1}), retrying'.format(url, error))
+            time.sleep(retry_wait * 2**attempt)
+
+
+def write_pgn_members(zip_filename, output_file):
+    '''Copies every .pgn member of a zip archive to output_file; returns how many there were'''
+    members = 0
+    with zipfile.ZipFile(zip_filename) as archive:
+        for member in archive.infolist():
+            if not member.filename.lower().endswith('.pgn'):
+                continue
+            source = archive.open(member)
+            try:
+                shutil.copyfileobj(source, output_file, BLOCK_SIZE)
+            finally:
+                source.close()
+            #keep the last game of one member apart from the first of the next
+            output_file.write('\n\n')
+            members += 1
+    return members
+
+
+def download_pgn(urls, output_filename, concurrency=4, retries=3, retry_wait=1.0, timeout=60):
+    '''
+    Fetches the zip archives at urls with up to concurrency downloads at a
+    time and streams the pgn files inside them, in url order, into
+    output_filename.  Each archive is only ever on disk, in a temporary
+    directory next to the output, until its members have been copied, and
+    downloads never run more than concurrency archives ahead of the
+    writer.  Returns the number of pgn files written.
+    '''
+    directory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_filename)))
+    pool = ThreadPool(processes=concurrency)
+    try:
+        def fetch_url(url):
+            return fetch(url, directory, retries=retries, retry_wait=retry_wait,
+                         timeout=timeout)
+
+        urls = list(urls)
+        downloads = collections.deque(pool.apply_async(fetch_url, (url,))
+                                      for url in urls[:concurrency])
+        members = 0
+        with open(output_filename, 'wb') as output_file:
+            for index, url in enumerate(urls):
+                zip_filename = downloads.popleft().get()
+                members += write_pgn_members(zip_filename, output_file)
+                os.remove(zip_filename)
+                print('Added', url)
+                #start the next download once this archive is off the disk
+                if index + concurrency < len(urls):
+                    downloads.append(pool.apply_async(fetch_url, (urls[index + concurrency],)))
+        return members
+    finally:
+        pool.terminate()
+        pool.join()
+        shutil.rmtree(directory)
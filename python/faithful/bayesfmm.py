@@ -16,7 +16,12 @@ class GaussianFiniteMixtureModel(object):
         self.__g = g
         self.__delta = delta
 
-    def run(self,data,k,iterations=100):
+    def run(self,data,k,iterations=100,checkpoint=None):
+        '''
+        Runs the Gibbs sampler.  If a stats.checkpoint.Checkpoint is supplied
+        the pi/theta/sigma/beta traces are saved whenever it is due, and a run
+        that is resuming carries on from the last saved iteration.
+        '''
         data = np.array(data)
 
         num_observations = data.shape[0]
@@ -40,7 +45,18 @@ class GaussianFiniteMixtureModel(object):
             gibbs_theta[0,j] = np.mean(data,axis=0)
             gibbs_sigma[0,j] = np.cov(data.T)
 
-        for i in range(1,iterations):
+        first_iteration = 1
+        saved = checkpoint.load() if checkpoint is not None else None
+        if saved is not None:
+            if saved['pi'].shape != gibbs_pi.shape or saved['theta'].shape != gibbs_theta.shape:
+                raise ValueError('Checkpoint %s is for a different run' % checkpoint.filename)
+            gibbs_pi[:] = saved['pi']
+            gibbs_theta[:] = saved['theta']
+            gibbs_sigma[:] = saved['sigma']
+            gibbs_beta[:] = saved['beta']
+            first_iteration = int(saved['iteration']) + 1
+
+        for i in range(first_iteration,iterations):
             a = np.zeros((num_observations,k))
             for m in range(k):
                 a[:,m] = gibbs_pi[i-1,m] * dmvnorm(data, mu=gibbs_theta[i-1,m],sigma=gibbs_sigma[i-1,m])
@@ -80,6 +96,10 @@ class GaussianFiniteMixtureModel(object):
                 mean = cov.dot(n[m] * la.inv(gibbs_sigma[i,m]).dot(mean_x) + kappa.dot(xi))
                 gibbs_theta[i,m] = npr.multivariate_normal(mean,cov,size=1)
 
+            if checkpoint is not None and checkpoint.due(i):
+                checkpoint.save(iteration=i, pi=gibbs_pi, theta=gibbs_theta,
+                                sigma=gibbs_sigma, beta=gibbs_beta)
+
         return (gibbs_pi,gibbs_theta,gibbs_sigma)
 
     def __sum_isigma(self, sigma, k, p):
@@ -5,6 +5,7 @@ import argparse
 import faithful.bayesfmm as fmm
 from faithful import ida, clustering, em
 from stats import diagnostics, utils
+from stats.checkpoint import Checkpoint
 
 def __run_clustering(data, output_dir):
     """k-means clustering code"""
@@ -27,9 +28,9 @@ def __run_em(data, output_dir, km2):
     em.draw_contour_plots(theta[-1], sigma[-1], pi[-1],
                           filename='{0}/faithful_em_model.png'.format(output_dir))
 
-def __run_bayesfmm(data, iterations, save_diagnostics, output_dir, burnin, km2):
+def __run_bayesfmm(data, iterations, save_diagnostics, output_dir, burnin, km2, checkpoint):
     gaussian_fmm = fmm.GaussianFiniteMixtureModel()
-    pi, theta, sigma = gaussian_fmm.run(data, k=2, iterations=iterations)
+    pi, theta, sigma = gaussian_fmm.run(data, k=2, iterations=iterations, checkpoint=checkpoint)
 
     outfilename = None
     if save_diagnostics:
@@ -55,7 +56,8 @@ def __run_bayesfmm(data, iterations, save_diagnostics, output_dir, burnin, km2):
                            filename='{0}/faithful_bayesfmm_model.png'.format(output_dir))
 
 
-def main(filename, iterations, save_diagnostics, output_dir, burnin):
+def main(filename, iterations, save_diagnostics, output_dir, burnin,
+         checkpoint_dir=None, checkpoint_every=100, resume=False):
     """ Run all the Old Faithful code """
     data = []
     with open(filename,'rb') as csvfile:
@@ -77,7 +79,10 @@ def main(filename, iterations, save_diagnostics, output_dir, burnin):
     __run_em(data, output_dir, km2)
 
     #build bayes fmm model
-    __run_bayesfmm(data, iterations, save_diagnostics, output_dir, burnin, km2)
+    checkpoint = None
+    if checkpoint_dir:
+        checkpoint = Checkpoint(checkpoint_dir, 'bayesfmm', every=checkpoint_every, resume=resume)
+    __run_bayesfmm(data, iterations, save_diagnostics, output_dir, burnin, km2, checkpoint)
 
 
 if __name__ == '__main__':
@@ -88,9 +93,13 @@ if __name__ == '__main__':
     cmdline_parser.add_argument('--save_diagnostics', action='store_true', default=False)
     cmdline_parser.add_argument('--output_dir', action='store', default='.')
     cmdline_parser.add_argument('--burnin', action='store', type=int, default=0)
+    cmdline_parser.add_argument('--checkpoint_dir', action='store', default=None)
+    cmdline_parser.add_argument('--checkpoint_every', action='store', type=int, default=100)
+    cmdline_parser.add_argument('--resume', action='store_true', default=False)
 
     parsed_args = cmdline_parser.parse_args()
 
     main(parsed_args.filename, parsed_args.iterations,
-         parsed_args.save_diagnostics, parsed_args.output_dir, parsed_args.burnin)
+         parsed_args.save_diagnostics, parsed_args.output_dir, parsed_args.burnin,
+         parsed_args.checkpoint_dir, parsed_args.checkpoint_every, parsed_args.resume)
 
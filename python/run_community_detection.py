@@ -2,25 +2,177 @@
 from __future__ import print_function
 
 import argparse
+import os
 import sys
 
+import numpy.random as npr
+
 from chess_social.pgn_file import PgnFile
 from chess_social.graph import ChessGraph
 from chess_social.bayes_community_detection import CommunityDetector
+from chess_social.chains import run_chains, chain_diagnostics, pooled_partition
+from chess_social.coclustering import CoClustering
+from chess_social.graph_cache import GraphCache, save_graph
+from chess_social.ingest import parallel_ingest
+from chess_social.initialization import INITIALIZERS
+from chess_social.map_community_detection import MapCommunityDetector
+from chess_social.monitor import JsonLinesSink, ThroughputSink, print_progress
+from chess_social.pruning import expand_labels, prune
+from chess_social.trace import LabelTrace
+from stats.checkpoint import Checkpoint
+
+DEFAULT_MIN_ELO = 2500
+
+def load_graph(data_file_name, min_elo, ingest_processes):
+    if data_file_name.endswith('.npz'):
+        #a graph saved by update_chess_graph.py, with its own min_elo
+        return ChessGraph.load(data_file_name)
+    if min_elo is None:
+        min_elo = DEFAULT_MIN_ELO
+    if ingest_processes > 1:
+        return parallel_ingest(data_file_name, min_elo=min_elo, processes=ingest_processes)
+    with PgnFile(data_file_name, fast=True) as pgnfile:
+        return ChessGraph(pgnfile, min_elo=min_elo)
+
+
+def run_single_chain(graph, iterations, p_in, p_out, burnin, thin, trace_file, seed,
+                     checkpoint_dir, checkpoint_every, resume, warm_start, metrics_file,
+                     split_merge, sweep_processes, components, init, coclustering):
+    if seed is not None:
+        npr.seed(seed)
+
+    detector = CommunityDetector(p_in=p_in, p_out=p_out, split_merge=split_merge,
+                                 sweep_processes=sweep_processes, components=components,
+                                 init=init)
+
+    checkpoint = None
+    if checkpoint_dir:
+        checkpoint = Checkpoint(checkpoint_dir, 'community_detection',
+                                every=checkpoint_every, resume=resume)
+
+    counts = None
+    if coclustering:
+        #the partition is picked from the counts, so only the first and last labels are kept
+        counts = CoClustering(graph, burnin=burnin)
+        thin = max(iterations, 1)
+
+    mode = 'w+'
+    if checkpoint is not None and checkpoint.resuming and trace_file and os.path.exists(trace_file):
+        mode = 'r+'
+    trace = LabelTrace(graph.number_of_nodes, iterations, thin=thin, filename=trace_file,
+                       mode=mode)
+    callbacks = [print_progress, ThroughputSink(every=10)]
+    if metrics_file:
+        callbacks.append(JsonLinesSink(metrics_file))
+    try:
+        labels = detector.run(graph, iterations=iterations, trace=trace, checkpoint=checkpoint,
+                              warm_start=warm_start, callbacks=callbacks, coclustering=counts)
+    finally:
+        if metrics_file:
+            callbacks[-1].close()
+
+    assert len(labels) == iterations // thin + 1
+
+    if counts is not None:
+        chosen_iteration, communities = counts.best_partition()
+        print('Picked iteration {0} from {1} partitions using {2} pairs of players'.format(
+            chosen_iteration, len(counts.iterations), counts.number_of_pairs))
+        return communities
+
+    chosen_index, communities = CommunityDetector.estimate_partitions(
+        labels, burnin=trace.burnin_rows(burnin))
+    return communities
+
+
+def run_map(graph, iterations, p_in, p_out, warm_start, metrics_file, init, seed):
+    if seed is not None:
+        #the initializers draw from numpy.random
+        npr.seed(seed)
+
+    detector = MapCommunityDetector(p_in=p_in, p_out=p_out, init=init)
+
+    callbacks = [print_progress]
+    if metrics_file:
+        callbacks.append(JsonLinesSink(metrics_file))
+    try:
+        communities = detector.run(graph, iterations=iterations, warm_start=warm_start,
+                                   callbacks=callbacks)
+    finally:
+        if metrics_file:
+            callbacks[-1].close()
+
+    print('Stopped after {0} of {1} iterations: p_in {2:.4f}; p_out {3:.4f}; '
+          'alpha {4:.3f}'.format(detector.iterations, iterations, detector.p_in,
+                                 detector.p_out, detector.alpha))
+    return communities
+
+
+def run_multiple_chains(graph, iterations, p_in, p_out, burnin, thin, trace_dir, seed,
+                        chains, processes, checkpoint_dir, checkpoint_every, resume,
+                        warm_start, split_merge, components, init):
+    results = run_chains(graph, chains=chains, iterations=iterations, seed=seed,
+                         processes=processes, thin=thin, trace_dir=trace_dir,
+                         checkpoint_dir=checkpoint_dir, checkpoint_every=checkpoint_every,
+                         resume=resume, warm_start=warm_start, p_in=p_in, p_out=p_out,
+                         split_merge=split_merge, components=components, init=init)
+
+    diagnostics = chain_diagnostics(results, burnin=burnin)
+    for name, rhat in sorted(diagnostics['rhat'].iteritems()):
+        print('R-hat for {0}: {1:.3f}'.format(name, rhat))
+    print('Partition agreement between chains: ARI {0:.3f}; NMI {1:.3f}'.format(
+        diagnostics['ari'], diagnostics['nmi']))
+
+    return pooled_partition(results, burnin=burnin)
+
 
-def main(data_file_name, iterations, output_dir, min_elo, p_in, p_out, burnin):
+def main(data_file_name, iterations, output_dir, min_elo, p_in, p_out, burnin,
+         thin=1, trace_file=None, chains=1, processes=None, seed=None, trace_dir=None,
+         checkpoint_dir=None, checkpoint_every=100, resume=False, ingest_processes=1,
+         cache_dir=None, warm_start=False, metrics_file=None, split_merge=0, engine='gibbs',
+         sweep_processes=1, min_games_per_edge=1, min_degree=0, k_core=0, max_players=None,
+         components=False, init='singletons', coclustering=False):
 
-    with PgnFile(data_file_name) as pgnfile:
-        graph = ChessGraph(pgnfile, min_elo=min_elo)
+    if cache_dir and os.path.isfile(data_file_name) and not data_file_name.endswith('.npz'):
+        if min_elo is None:
+            min_elo = DEFAULT_MIN_ELO
+        graph = GraphCache(cache_dir).get(data_file_name, min_elo,
+                                          lambda: load_graph(data_file_name, min_elo,
+                                                             ingest_processes))
+    else:
+        graph = load_graph(data_file_name, min_elo, ingest_processes)
 
-    detector = CommunityDetector(p_in=p_in, p_out=p_out)
+    if min_elo is not None and graph.min_elo != min_elo:
+        print('{0} holds the players rated at least {1}, not {2}'.format(
+            data_file_name, graph.min_elo, min_elo))
+        return 1
 
-    labels = detector.run(graph, iterations=iterations)
+    full_graph = graph
+    graph, steps = prune(graph, min_games_per_edge=min_games_per_edge, min_degree=min_degree,
+                         k=k_core, max_players=max_players)
+    if graph.number_of_nodes == 0:
+        print('Pruning left no players in {0}'.format(data_file_name))
+        return 1
 
-    assert len(labels) == iterations + 1
+    if engine == 'map':
+        communities = run_map(graph, iterations, p_in, p_out, warm_start, metrics_file, init,
+                              seed)
+    elif chains > 1:
+        communities = run_multiple_chains(graph, iterations, p_in, p_out, burnin, thin,
+                                          trace_dir, seed, chains, processes,
+                                          checkpoint_dir, checkpoint_every, resume,
+                                          warm_start, split_merge, components, init)
+    else:
+        communities = run_single_chain(graph, iterations, p_in, p_out, burnin, thin,
+                                       trace_file, seed, checkpoint_dir, checkpoint_every,
+                                       resume, warm_start, metrics_file, split_merge,
+                                       sweep_processes, components, init, coclustering)
 
-    chosen_index, communities = CommunityDetector.estimate_partitions(labels, burnin=burnin)
     graph.communities = communities
+    if data_file_name.endswith('.npz'):
+        #keep the partition with the graph to warm start the next update
+        if graph is not full_graph:
+            full_graph.communities = expand_labels(full_graph, graph, communities)
+        save_graph(full_graph, data_file_name)
     graph.render_community_graph(show_single_nodes=False)
 
     return 0
@@ -33,9 +185,34 @@ if __name__ == '__main__':
                                 type=int, default=100)
     cmdline_parser.add_argument('--output_dir', action='store', default='.')
     cmdline_parser.add_argument('--burnin', action='store', type=int, default=0)
-    cmdline_parser.add_argument('--min_elo', action='store', type=int, default=2500)
+    cmdline_parser.add_argument('--min_elo', action='store', type=int, default=None)
     cmdline_parser.add_argument('--p_in', action='store', type=float, default=0.8)
     cmdline_parser.add_argument('--p_out', action='store', type=float, default=0.2)
+    cmdline_parser.add_argument('--thin', action='store', type=int, default=1)
+    cmdline_parser.add_argument('--trace_file', action='store', default=None)
+    cmdline_parser.add_argument('--chains', action='store', type=int, default=1)
+    cmdline_parser.add_argument('--processes', action='store', type=int, default=None)
+    cmdline_parser.add_argument('--seed', action='store', type=int, default=None)
+    cmdline_parser.add_argument('--trace_dir', action='store', default=None)
+    cmdline_parser.add_argument('--checkpoint_dir', action='store', default=None)
+    cmdline_parser.add_argument('--checkpoint_every', action='store', type=int, default=100)
+    cmdline_parser.add_argument('--resume', action='store_true', default=False)
+    cmdline_parser.add_argument('--ingest_processes', action='store', type=int, default=1)
+    cmdline_parser.add_argument('--cache_dir', action='store', default=None)
+    cmdline_parser.add_argument('--warm_start', action='store_true', default=False)
+    cmdline_parser.add_argument('--metrics_file', action='store', default=None)
+    cmdline_parser.add_argument('--split_merge', action='store', type=int, default=0)
+    cmdline_parser.add_argument('--engine', action='store', choices=['gibbs', 'map'],
+                                default='gibbs')
+    cmdline_parser.add_argument('--sweep_processes', action='store', type=int, default=1)
+    cmdline_parser.add_argument('--min_games_per_edge', action='store', type=int, default=1)
+    cmdline_parser.add_argument('--min_degree', action='store', type=int, default=0)
+    cmdline_parser.add_argument('--k_core', action='store', type=int, default=0)
+    cmdline_parser.add_argument('--max_players', action='store', type=int, default=None)
+    cmdline_parser.add_argument('--components', action='store_true', default=False)
+    cmdline_parser.add_argument('--init', action='store', choices=sorted(INITIALIZERS),
+                                default='singletons')
+    cmdline_parser.add_argument('--coclustering', action='store_true', default=False)
 
     parsed_args = cmdline_parser.parse_args()
 
@@ -44,15 +221,92 @@ if __name__ == '__main__':
                                                             parsed_args.p_out))
         sys.exit(1)
 
-    if parsed_args.min_elo < 1000:
+    if parsed_args.chains < 1:
+        print('Invalid number of chains: {0}'.format(parsed_args.chains))
+        sys.exit(1)
+
+    if parsed_args.chains > 1 and parsed_args.burnin > parsed_args.iterations - 2:
+        #R-hat needs at least two draws of every chain after burn-in
+        print('Invalid burn-in for {0} chains: {1} of {2} iterations'.format(
+            parsed_args.chains, parsed_args.burnin, parsed_args.iterations))
+        sys.exit(1)
+
+    if parsed_args.thin < 1:
+        print('Invalid thinning interval: {0}'.format(parsed_args.thin))
+        sys.exit(1)
+
+    if parsed_args.min_elo is not None and parsed_args.min_elo < 1000:
         print('Invalid minimum ELO rating: {0}'.format(parsed_args.min_elo))
         sys.exit(1)
 
+    if parsed_args.split_merge < 0:
+        print('Invalid number of split-merge moves: {0}'.format(parsed_args.split_merge))
+        sys.exit(1)
+
+    if parsed_args.engine == 'map' and parsed_args.chains > 1:
+        print('The map engine runs a single chain: {0}'.format(parsed_args.chains))
+        sys.exit(1)
+
+    if parsed_args.engine == 'map' and (parsed_args.components or parsed_args.split_merge or
+                                        parsed_args.sweep_processes > 1 or
+                                        parsed_args.checkpoint_dir):
+        print('The map engine does not take --components, --split_merge, --sweep_processes '
+              'or --checkpoint_dir')
+        sys.exit(1)
+
+    if parsed_args.sweep_processes < 1 or (parsed_args.sweep_processes > 1 and
+                                           parsed_args.chains > 1):
+        print('Invalid number of sweep processes: {0} for {1} chains'.format(
+            parsed_args.sweep_processes, parsed_args.chains))
+        sys.exit(1)
+
+    if parsed_args.max_players is not None and parsed_args.max_players < 1:
+        print('Invalid maximum number of players: {0}'.format(parsed_args.max_players))
+        sys.exit(1)
+
+    if parsed_args.coclustering and (parsed_args.chains > 1 or parsed_args.engine == 'map'):
+        print('Co-clustering counts need a single gibbs chain: {0} {1} chains'.format(
+            parsed_args.chains, parsed_args.engine))
+        sys.exit(1)
+
+    if parsed_args.coclustering and parsed_args.burnin > parsed_args.iterations:
+        print('Invalid burn-in for co-clustering counts: {0} of {1} iterations'.format(
+            parsed_args.burnin, parsed_args.iterations))
+        sys.exit(1)
+
+    if parsed_args.coclustering and parsed_args.thin != 1:
+        #only the first and last labels are kept, so there is nothing to thin
+        print('Co-clustering counts keep no label trace to thin: {0}'.format(parsed_args.thin))
+        sys.exit(1)
+
     sys.exit(main(parsed_args.filename,
                   parsed_args.iterations,
                   parsed_args.output_dir,
                   parsed_args.min_elo,
                   parsed_args.p_in,
                   parsed_args.p_out,
-                  parsed_args.burnin))
+                  parsed_args.burnin,
+                  parsed_args.thin,
+                  parsed_args.trace_file,
+                  parsed_args.chains,
+                  parsed_args.processes,
+                  parsed_args.seed,
+                  parsed_args.trace_dir,
+                  parsed_args.checkpoint_dir,
+                  parsed_args.checkpoint_every,
+                  parsed_args.resume,
+                  parsed_args.ingest_processes,
+                  parsed_args.cache_dir,
+                  parsed_args.warm_start,
+                  parsed_args.metrics_file,
+                  parsed_args.split_merge,
+                  parsed_args.engine,
+                  parsed_args.sweep_processes,
+                  parsed_args.min_games_per_edge,
+                  parsed_args.min_degree,
+                  parsed_args.k_core,
+                  parsed_args.max_players,
+                  parsed_args.components,
+                  parsed_args.init,
+                  parsed_args.coclustering))
 
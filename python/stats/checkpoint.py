@@ -0,0 +1,67 @@
+import os
+import tempfile
+
+import numpy as np
+import numpy.random as npr
+
+class Checkpoint(object):
+    '''
+    Periodically saves the state of a sampler to <directory>/<name>.npz.
+
+    The state is a set of named numpy arrays plus the state of the numpy
+    random number generator, so a resumed run continues the exact same
+    random stream.  Files are written to a temporary file and renamed into
+    place, so a run killed mid-write leaves the previous checkpoint intact.
+    '''
+
+    def __init__(self, directory, name, every=100, resume=False):
+        self.__directory = directory
+        self.__filename = os.path.join(directory, '{0}.npz'.format(name))
+        self.__every = every
+        self.__resume = resume
+
+    @property
+    def filename(self):
+        return self.__filename
+
+    @property
+    def resuming(self):
+        '''True if a previous run's state is going to be picked up by load'''
+        return self.__resume and os.path.exists(self.__filename)
+
+    def due(self, iteration):
+        return bool(self.__every) and iteration % self.__every == 0
+
+    def save(self, **state):
+        keys, pos, has_gauss, cached_gaussian = npr.get_state()[1:]
+        state['rng_keys'] = keys
+        state['rng_pos'] = pos
+        state['rng_has_gauss'] = has_gauss
+        state['rng_cached_gaussian'] = cached_gaussian
+
+        if not os.path.isdir(self.__directory):
+            os.makedirs(self.__directory)
+        tmp_file = tempfile.NamedTemporaryFile(dir=self.__directory, suffix='.tmp', delete=False)
+        try:
+            np.savez(tmp_file, **state)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+            tmp_file.close()
+            os.rename(tmp_file.name, self.__filename)
+        except BaseException:
+            tmp_file.close()
+            os.remove(tmp_file.name)
+            raise
+
+    def load(self):
+        '''
+        Returns the saved state as a dict and restores the random number
+        generator, or returns None if not resuming or nothing was saved.
+        '''
+        if not self.resuming:
+            return None
+        with np.load(self.__filename) as saved:
+            state = {key: saved[key] for key in saved.files}
+        npr.set_state(('MT19937', state.pop('rng_keys'), int(state.pop('rng_pos')),
+                       int(state.pop('rng_has_gauss')), float(state.pop('rng_cached_gaussian'))))
+        return state
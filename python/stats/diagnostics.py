@@ -1,3 +1,4 @@
+import numpy as np
 from matplotlib import pyplot
     
 def stationarity_plot(data,ylab=None,filename=None):
@@ -63,3 +64,54 @@ def stationarity_plot(data,ylab=None,filename=None):
     else:
         pyplot.show()
 
+
+def gelman_rubin(chains):
+    '''
+    Potential scale reduction factor (R-hat) of a scalar parameter.
+
+    :attr:`chains` is a m x n array holding n post-burnin draws from each of m chains.
+    Values close to 1 indicate the chains have mixed.
+    '''
+    chains = np.asarray(chains, dtype=np.double)
+    if len(chains.shape) != 2 or chains.shape[0] < 2 or chains.shape[1] < 2:
+        raise ValueError('Require at least 2 chains of at least 2 draws')
+    n = chains.shape[1]
+
+    within = np.mean(np.var(chains, axis=1, ddof=1))
+    between = n * np.var(np.mean(chains, axis=1), ddof=1)
+    if within == 0:
+        return 1.0 if between == 0 else np.inf
+    var_hat = (n - 1.0) / n * within + between / n
+    return np.sqrt(var_hat / within)
+
+
+def effective_sample_size(draws):
+    '''
+    Effective number of independent draws in a single chain of a scalar
+    parameter, n / (1 + 2 * sum of autocorrelations), with the sum cut
+    off at the first pair of lags whose autocorrelations add up to a
+    negative number (Geyer's initial positive sequence).
+
+    :attr:`draws` is a 1-D array of post-burnin draws.
+    '''
+    draws = np.asarray(draws, dtype=np.double)
+    n = len(draws)
+    if n < 4:
+        raise ValueError('Require at least 4 draws')
+    centred = draws - draws.mean()
+    if not np.any(centred):
+        return float(n)
+    #autocovariance at every lag through a zero-padded FFT
+    size = 1 << int(np.ceil(np.log2(2 * n)))
+    spectrum = np.fft.rfft(centred, size)
+    autocovariance = np.fft.irfft(spectrum * np.conjugate(spectrum), size)[:n]
+    autocorrelation = autocovariance / autocovariance[0]
+
+    total = 0.0
+    for lag in xrange(1, n - 1, 2):
+        pair = autocorrelation[lag] + autocorrelation[lag + 1]
+        if pair < 0:
+            break
+        total += pair
+    return n / (1.0 + 2.0 * total)
+
@@ -0,0 +1,66 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import numpy.random as npr
+
+from faithful.bayesfmm import GaussianFiniteMixtureModel
+from stats.checkpoint import Checkpoint
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_save_and_resume(self):
+        npr.seed(10)
+        checkpoint = Checkpoint(self.tmp_dir, 'test', every=5)
+        self.assertTrue(checkpoint.due(10))
+        self.assertFalse(checkpoint.due(11))
+
+        checkpoint.save(iteration=3, theta=np.arange(6.0).reshape((2, 3)))
+        expected = npr.normal(size=4)
+
+        self.assertIsNone(checkpoint.load())
+
+        resumed = Checkpoint(self.tmp_dir, 'test', every=5, resume=True)
+        self.assertTrue(resumed.resuming)
+        state = resumed.load()
+        self.assertEqual(3, state['iteration'])
+        self.assertTrue(np.array_equal(np.arange(6.0).reshape((2, 3)), state['theta']))
+        self.assertTrue(np.array_equal(expected, npr.normal(size=4)))
+
+        self.assertFalse(Checkpoint(self.tmp_dir, 'other', resume=True).resuming)
+
+    def test_resume_gaussian_mixture(self):
+        class Interrupted(Exception):
+            pass
+
+        class InterruptingCheckpoint(Checkpoint):
+            def save(self, **state):
+                Checkpoint.save(self, **state)
+                if state['iteration'] == 10:
+                    raise Interrupted()
+
+        npr.seed(3)
+        data = np.vstack([npr.normal(2.0, 0.3, size=(20, 2)), npr.normal(4.0, 0.3, size=(20, 2))])
+
+        npr.seed(4)
+        expected = GaussianFiniteMixtureModel().run(data, 2, iterations=25)
+
+        npr.seed(4)
+        with self.assertRaises(Interrupted):
+            GaussianFiniteMixtureModel().run(data, 2, iterations=25,
+                                             checkpoint=InterruptingCheckpoint(self.tmp_dir, 'run',
+                                                                               every=5))
+
+        npr.seed(99)
+        resumed = GaussianFiniteMixtureModel().run(data, 2, iterations=25,
+                                                   checkpoint=Checkpoint(self.tmp_dir, 'run',
+                                                                         every=5, resume=True))
+        for expected_trace, resumed_trace in zip(expected, resumed):
+            self.assertTrue(np.array_equal(expected_trace, resumed_trace))
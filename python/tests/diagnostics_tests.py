@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+import numpy.random as npr
+
+from stats.diagnostics import effective_sample_size, gelman_rubin
+
+class GelmanRubinTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_mixed_chains(self):
+        npr.seed(0)
+        chains = npr.normal(size=(4, 2000))
+        self.assertAlmostEqual(1.0, gelman_rubin(chains), places=2)
+
+    def test_separated_chains(self):
+        npr.seed(0)
+        chains = npr.normal(size=(4, 2000)) + np.arange(4).reshape((4, 1)) * 10
+        self.assertGreater(gelman_rubin(chains), 2.0)
+
+        self.assertEqual(1.0, gelman_rubin(np.ones((3, 10))))
+        with self.assertRaises(ValueError):
+            gelman_rubin(np.ones(10))
+
+
+class EffectiveSampleSizeTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_independent_and_correlated_draws(self):
+        npr.seed(0)
+        draws = npr.normal(size=20000)
+        self.assertAlmostEqual(1.0, effective_sample_size(draws) / 20000, places=1)
+
+        #AR(1) with coefficient 0.5 has an effective sample size of n / 3
+        correlated = np.zeros(20000)
+        for i in xrange(1, 20000):
+            correlated[i] = 0.5 * correlated[i-1] + draws[i]
+        self.assertAlmostEqual(1.0, 3 * effective_sample_size(correlated) / 20000, places=1)
+
+        self.assertEqual(10, effective_sample_size(np.ones(10)))
+        with self.assertRaises(ValueError):
+            effective_sample_size([1.0, 2.0])
+
@@ -0,0 +1,23 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import run_community_detection
+from chess_social.tests.test_label_sampler import make_graph
+
+class RunCommunityDetectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_nothing_left_after_pruning(self):
+        graph_file = os.path.join(self.tmp_dir, 'graph.npz')
+        graph = make_graph()
+        graph.save(graph_file)
+        #no player of the two triangles has three opponents left in a 3-core
+        self.assertEqual(1, run_community_detection.main(graph_file, 10, self.tmp_dir, None,
+                                                         0.8, 0.2, 0, k_core=3))
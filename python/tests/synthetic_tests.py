@@ -0,0 +1,73 @@
+from __future__ import division
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from benchmarks.synthetic import planted_games, planted_graph, write_synthetic_pgn
+from chess_social.graph import ChessGraph
+from chess_social.pgn_file import PgnFile
+
+class SyntheticPgnTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_planted_games(self):
+        white, black, labels = planted_games(200, 10, communities=4, p_in_community=0.9)
+
+        self.assertEqual(1000, len(white))
+        self.assertFalse(np.any(white == black))
+        self.assertEqual([50] * 4, np.bincount(labels).tolist())
+        inside = np.mean(labels[white] == labels[black])
+        self.assertTrue(0.85 < inside < 0.97)
+
+        with self.assertRaises(ValueError):
+            planted_games(6, 10, communities=4)
+
+    def test_write_synthetic_pgn(self):
+        filenames = [os.path.join(self.tmp_dir, name) for name in ('one.pgn', 'two.pgn')]
+        for filename in filenames:
+            labels = write_synthetic_pgn(filename, 100, 8, moves=30, communities=5, seed=3)
+        with open(filenames[0]) as one, open(filenames[1]) as two:
+            self.assertEqual(one.read(), two.read())
+
+        with PgnFile(filenames[0]) as pgnfile:
+            games = list(pgnfile)
+        with PgnFile(filenames[0], fast=True) as pgnfile:
+            self.assertEqual(games, list(pgnfile))
+        self.assertEqual(400, len(games))
+
+        graph = ChessGraph(games)
+        self.assertEqual(100, graph.number_of_nodes)
+        one, two, _ = graph.edges
+        self.assertTrue(np.mean(labels[one] == labels[two]) > 0.8)
+
+    def test_planted_graph(self):
+        graph, labels = planted_graph([40, 60, 100], 0.2, 0.01, seed=5)
+
+        self.assertEqual(200, graph.number_of_nodes)
+        self.assertEqual([40, 60, 100], np.bincount(labels).tolist())
+        one, two, games = graph.edges
+        self.assertTrue(np.all(one < two))
+        self.assertEqual(graph.number_of_edges, len(np.unique(one * 200 + two)))
+        self.assertTrue(np.all(games == 1))
+
+        inside = labels[one] == labels[two]
+        pairs_inside = (40 * 39 + 60 * 59 + 100 * 99) // 2
+        pairs_between = 200 * 199 // 2 - pairs_inside
+        self.assertTrue(abs(inside.sum() / pairs_inside - 0.2) < 0.03)
+        self.assertTrue(abs((~inside).sum() / pairs_between - 0.01) < 0.005)
+
+        #dense blocks are enumerated rather than drawn by rejection
+        graph, labels = planted_graph([5, 5], 1.0, 0.0)
+        self.assertEqual(20, graph.number_of_edges)
+
+        same_graph, _ = planted_graph([40, 60, 100], 0.2, 0.01, seed=5)
+        self.assertTrue(np.array_equal(one, same_graph.edges[0]))
@@ -1,16 +1,18 @@
 #!/usr/bin/env python
+from __future__ import print_function
 
-import os
+import argparse
+import sys
 import urllib
-import zipfile
 
 from bs4 import BeautifulSoup
 
+from chess_social.twic import download_pgn
+
+TWIC_URL = 'http://www.theweekinchess.com/twic'
 
-def main():
-    twic = urllib.urlopen('http://www.theweekinchess.com/twic')
-    twic_html = twic.read()
 
+def find_pgn_urls(twic_html):
     soup = BeautifulSoup(twic_html)
 
     pgn_urls = []
@@ -19,31 +21,32 @@ def main():
             for a in table.find_all('a'):
                 if a.string == 'PGN':
                     pgn_urls.append(a.get('href'))
+    return pgn_urls
 
-    zpgn_files = []
-    for url in pgn_urls:
-        zpgn_filename = url.split('/')[-1]
-        zpgn_files.append(zpgn_filename)
-        urllib.urlretrieve(url, zpgn_filename)
 
-    pgn_data = []
-    for zpgn_file in zpgn_files:
-        zfile = zipfile.ZipFile(zpgn_file)
-        zfile.extractall()
-        pgn_filename = zpgn_file.replace('g.zip', '.pgn')
-        with open(pgn_filename) as pgn_file:
-            pgn = pgn_file.read()
-            pgn_data.append(pgn)
-
-    pgn_data = '\n\n'.join(pgn_data)
+def main(output_file_name, concurrency, retries):
+    twic = urllib.urlopen(TWIC_URL)
+    twic_html = twic.read()
 
-    with open('twic_chess_data.pgn', 'w+') as pgn_outfile:
-        pgn_outfile.write(pgn_data)
+    pgn_urls = find_pgn_urls(twic_html)
+    pgn_files = download_pgn(pgn_urls, output_file_name, concurrency=concurrency,
+                             retries=retries)
+    print('Wrote', pgn_files, 'pgn files to', output_file_name)
 
-    for zpgn_file in zpgn_files:
-        os.remove(zpgn_file)
-        pgn_filename = zpgn_file.replace('g.zip', '.pgn')
-        os.remove(pgn_filename)
+    return 0
 
 if __name__ == '__main__':
-    main()
+    cmdline_parser = argparse.ArgumentParser()
+    cmdline_parser.add_argument('--output', action='store', default='twic_chess_data.pgn')
+    cmdline_parser.add_argument('--concurrency', action='store', type=int, default=4)
+    cmdline_parser.add_argument('--retries', action='store', type=int, default=3)
+
+    parsed_args = cmdline_parser.parse_args()
+
+    if parsed_args.concurrency < 1:
+        print('Invalid number of concurrent downloads: {0}'.format(parsed_args.concurrency))
+        sys.exit(1)
+
+    sys.exit(main(parsed_args.output,
+                  parsed_args.concurrency,
+                  parsed_args.retries))
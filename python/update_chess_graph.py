@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+
+from chess_social.pgn_file import PgnFile
+from chess_social.graph import ChessGraph
+from chess_social.graph_cache import save_graph
+
+DEFAULT_MIN_ELO = 2500
+
+def main(graph_file_name, pgn_file_names, min_elo):
+
+    if os.path.exists(graph_file_name):
+        graph = ChessGraph.load(graph_file_name)
+        if min_elo is not None and graph.min_elo != min_elo:
+            print('{0} holds the players rated at least {1}, not {2}'.format(
+                graph_file_name, graph.min_elo, min_elo))
+            return 1
+        print('Updating graph of', graph.number_of_nodes, 'players and',
+              graph.number_of_edges, 'games')
+    else:
+        if min_elo is None:
+            min_elo = DEFAULT_MIN_ELO
+        graph = ChessGraph((), min_elo=min_elo)
+
+    for pgn_file_name in pgn_file_names:
+        with PgnFile(pgn_file_name, fast=True, hash_games=True) as pgnfile:
+            added = graph.append(pgnfile)
+        print('Added', added, 'new games from', pgn_file_name)
+
+    save_graph(graph, graph_file_name)
+
+    return 0
+
+
+if __name__ == '__main__':
+    cmdline_parser = argparse.ArgumentParser(
+        description='Add new pgn files (e.g. the latest TWIC issue) to a saved chess graph')
+    cmdline_parser.add_argument('graph_file', metavar='graphfile')
+    cmdline_parser.add_argument('pgn_files', metavar='pgnfile', nargs='+')
+    cmdline_parser.add_argument('--min_elo', action='store', type=int, default=None)
+
+    parsed_args = cmdline_parser.parse_args()
+
+    if parsed_args.min_elo is not None and parsed_args.min_elo < 1000:
+        print('Invalid minimum ELO rating: {0}'.format(parsed_args.min_elo))
+        sys.exit(1)
+
+    sys.exit(main(parsed_args.graph_file,
+                  parsed_args.pgn_files,
+                  parsed_args.min_elo))